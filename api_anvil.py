@@ -1,5 +1,5 @@
 import anvil.server
-from groq import Groq  # Certifique-se de que a biblioteca Groq está instalada e disponível
+from groq_client import get_groq_client  # Cliente Groq compartilhado (pool de conexões)
 
 @anvil.server.http_endpoint("/prompt", methods=["POST"])
 def prompt():
@@ -12,8 +12,8 @@ def prompt():
         return {"status": "error", "message": "Parâmetro 'text' não encontrado"}
     
     print(f"Texto recebido: {prompt}")
-  # Inicialize o cliente Groq
-    client = Groq(api_key=groq_api_key)
+  # Reutiliza o cliente Groq compartilhado entre as requisições
+    client = get_groq_client(groq_api_key)
 
     # Crie a chamada de conclusão de chat
     completion = client.chat.completions.create(
@@ -37,8 +37,8 @@ def prompt():
 # Defina o endpoint GET
 @anvil.server.http_endpoint("/hello", methods=["GET"])
 def hello(prompt=""):
-  # Inicialize o cliente Groq
-    client = Groq(api_key=groq_api_key)
+  # Reutiliza o cliente Groq compartilhado entre as requisições
+    client = get_groq_client(groq_api_key)
 
     # Crie a chamada de conclusão de chat
     completion = client.chat.completions.create(
@@ -1,14 +1,42 @@
-from groq import Groq  # Certifique-se de ter instalado a biblioteca correta
+from groq_client import get_groq_client
+import itertools
 import logging
+import os
+import time
 import streamlit as st
-from typing import Optional
+from typing import Iterator, Optional
+from llm_cache import get_response_cache, make_cache_key
+from rate_limiter import DEADLINE_SECONDS, call_with_retry, get_rate_limiter, limiter_metrics
+from metrics import record_llm_call
+from singleflight import SingleFlight
+from text_utils import CHARS_PER_TOKEN, estimate_tokens
 
 # Configuração do logger
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Parâmetros fixos da chamada de chat (também compõem a chave do cache)
+SYSTEM_MESSAGE = "Você é um especialista em educação, focado em criar planos de aula detalhados e personalizados."
+TEMPERATURE = 0.7
+MAX_TOKENS = 4096
+TOP_P = 1
+
+# Chamadas à API em andamento, por chave do cache (compartilhadas entre sessões)
+llm_flights = SingleFlight("llm")
+
+
+class IncompleteResponseError(Exception):
+    """A chamada à API não produziu uma resposta completa (interrompida ou plano genérico)."""
+
 def load_api_key() -> Optional[str]:
-    """Carrega a chave da API do arquivo .streamlit/secrets.toml."""
+    """
+    Carrega a chave da API do arquivo .streamlit/secrets.toml.
+
+    A variável de ambiente GROQ_API_KEY, se definida, tem precedência (usada em
+    scripts de lote e benchmarks fora do Streamlit).
+    """
+    if os.environ.get("GROQ_API_KEY"):
+        return os.environ["GROQ_API_KEY"]
     try:
         logger.debug("Tentando acessar a API key diretamente do secrets.toml...")
         api_key = st.secrets["groq_api_key"]
@@ -25,75 +53,179 @@ def load_api_key() -> Optional[str]:
         logger.error(f"Erro ao carregar API key: {e}")
         return None
 
-def call_api(prompt: str, model: str = "llama-3.2-1b-preview") -> Optional[str]:
+def stream_api(prompt: str, model: str = "llama-3.2-1b-preview", use_cache: bool = True,
+               call: dict = None) -> Iterator[str]:
     """
-    Processa o prompt usando a API Groq e retorna uma resposta ou um plano genérico em caso de falha.
+    Gera a resposta da API Groq em partes, à medida que os tokens chegam.
+
+    Cada chamada passa pelo limitador de taxa compartilhado; erros passageiros antes do
+    primeiro token são repetidos com backoff dentro do prazo DEADLINE_SECONDS. Se ainda
+    assim a chamada falhar antes do primeiro token, gera o plano genérico; se falhar depois,
+    levanta IncompleteResponseError ao final das partes já entregues. Respostas completas
+    ficam no cache persistente; use_cache=False força uma nova geração (a resposta nova
+    substitui a anterior no cache). Enquanto uma chamada para o mesmo modelo, prompt e
+    parâmetros estiver em andamento, novas chamadas recebem as partes dela em vez de
+    repetir a requisição (llm_flights).
+
+    Se `call` for informado, recebe as marcas "cache_hit", "fallback" e "interrupted" da chamada.
+
+    Latência, tempo até a primeira parte, tamanhos e uso do cache/plano genérico de cada
+    chamada vão para o registro de métricas (metrics.registry). Os tempos incluem o tempo
+    que o chamador leva para consumir cada parte.
+    """
+    start = time.perf_counter()
+    call = call if call is not None else {}
+    call.update(cache_hit=False, fallback=False, interrupted=False)
+    ttft = None
+    completion_chars = 0
+    try:
+        for part in _stream_parts(prompt, model, use_cache, call):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            completion_chars += len(part)
+            yield part
+    finally:
+        record_llm_call(
+            "stream_api",
+            time.perf_counter() - start,
+            ttft=ttft,
+            prompt_chars=len(prompt),
+            completion_chars=completion_chars,
+            completion_tokens=completion_chars // CHARS_PER_TOKEN,
+            cache_hit=call["cache_hit"],
+            fallback=call["fallback"],
+            interrupted=call["interrupted"],
+        )
+
+def _stream_parts(prompt: str, model: str, use_cache: bool, call: dict) -> Iterator[str]:
+    """Corpo de stream_api; marca em `call` se a resposta veio do cache, do plano genérico ou foi interrompida."""
+    logger.debug(f"Iniciando chamada à função stream_api com o modelo: {model}")
+    cache = get_response_cache()
+    cache_key = make_cache_key(model, SYSTEM_MESSAGE, prompt, TEMPERATURE, MAX_TOKENS, TOP_P)
+    if use_cache:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            logger.info("Resposta recuperada do cache.")
+            call["cache_hit"] = True
+            yield cached_response
+            return
+
+    # Pedidos idênticos em andamento compartilham a mesma chamada à API
+    flight = llm_flights.join_stream(
+        cache_key, lambda flight: _upstream_parts(prompt, model, cache_key, flight.meta)
+    )
+    yield from flight.subscribe()
+    call["fallback"] = flight.meta.get("fallback", False)
+    # Todos os pedidos que compartilharam a chamada recebem o mesmo aviso de interrupção
+    if flight.meta.get("interrupted", False):
+        call["interrupted"] = True
+        raise IncompleteResponseError("A resposta da API foi interrompida antes do fim.")
+
+def _upstream_parts(prompt: str, model: str, cache_key: str, outcome: dict) -> Iterator[str]:
     """
-    logger.debug(f"Iniciando chamada à função call_api com o modelo: {model}")
+    Faz a chamada à API e grava a resposta no cache.
+
+    Marca em `outcome` o uso do plano genérico ("fallback") ou a interrupção da resposta
+    depois das primeiras partes ("interrupted").
+    """
+    cache = get_response_cache()
+    # Partes já recebidas (juntadas uma única vez no final)
+    parts = []
     try:
         api_key = load_api_key()
         if not api_key:
             logger.error("API key não disponível. Abandonando chamada à API.")
-            return generate_generic_plan()
+            outcome["fallback"] = True
+            yield generate_generic_plan()
+            return
+
+        # Reutiliza o cliente Groq compartilhado (conexões keep-alive entre chamadas)
+        client = get_groq_client(api_key)
+        limiter = get_rate_limiter()
+        deadline = time.monotonic() + DEADLINE_SECONDS
+        prompt_tokens = estimate_tokens(SYSTEM_MESSAGE) + estimate_tokens(prompt)
 
-        # Inicialize o cliente Groq com a chave da API
-        client = Groq(api_key=api_key)
+        def open_stream():
+            # Cada tentativa passa pelo limitador e só conta como bem-sucedida quando o
+            # primeiro chunk chega; erros até esse ponto ainda podem ser repetidos
+            limiter.acquire(prompt_tokens, deadline)
+            completion = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SYSTEM_MESSAGE
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                top_p=TOP_P,
+                stream=True,  # Streaming de respostas
+                stop=None
+            )
+            chunks = iter(completion)
+            first_chunk = next(chunks, None)
+            return itertools.chain([first_chunk] if first_chunk is not None else [], chunks)
 
         logger.info("Enviando requisição para a API Groq...")
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Você é um especialista em educação, focado em criar planos de aula detalhados e personalizados."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=4096,
-            top_p=1,
-            stream=True,  # Streaming de respostas
-            stop=None
-        )
+        completion = call_with_retry(open_stream, deadline)
 
         logger.debug("Recebendo resposta da API com streaming.")
-        
-        # Armazena todo o conteúdo da resposta
-        response_content = ""
         for chunk in completion:
             part = chunk.choices[0].delta.content or ""
-            response_content += part  # Concatena a resposta sem exibir no loop
-
-        # Exibe o conteúdo final limpo uma única vez
-        if response_content.strip():
-            cleaned_response = clean_response(response_content)
-            logger.info("Resposta da API processada com sucesso.")
-            return cleaned_response
-        else:
-            logger.error("❌ O retorno da API foi nulo ou vazio.")
-            return generate_generic_plan()
+            if part:
+                parts.append(part)
+                yield part
 
     except Exception as e:
         logger.error(f"Erro ao fazer a chamada à API Groq: {e}")
-        return generate_generic_plan()
+        if parts:
+            # Uma resposta interrompida no meio não vai para o cache
+            outcome["interrupted"] = True
+        else:
+            outcome["fallback"] = True
+            yield generate_generic_plan()
+        return
 
-def clean_response(response: str) -> str:
-    """
-    Limpa a resposta da API removendo quebras de linha e múltiplos espaços.
-    """
-    cleaned_response = response.replace('\n', ' ').replace('\r', '').strip()
-    cleaned_response = ' '.join(cleaned_response.split())
-    return cleaned_response
+    response_content = "".join(parts)
+    # Os tokens da resposta também contam para o limite de tokens por minuto
+    get_rate_limiter().record_usage(estimate_tokens(response_content))
+    if response_content.strip():
+        cache.set(cache_key, response_content)
+        logger.info("Resposta da API processada com sucesso.")
+    else:
+        logger.error("❌ O retorno da API foi nulo ou vazio.")
+        outcome["fallback"] = True
+        yield generate_generic_plan()
 
-def generate_generic_plan() -> str:
+def call_api(prompt: str, model: str = "llama-3.2-1b-preview", use_cache: bool = True,
+             strict: bool = False) -> Optional[str]:
     """
-    Gera um plano de aula genérico formatado para exibição.
+    Processa o prompt usando a API Groq e retorna uma resposta ou um plano genérico em caso de falha.
+
+    Consome stream_api por completo; para exibir a resposta progressivamente, use stream_api.
+    As quebras de linha são preservadas (títulos, listas e blocos HTML dependem delas).
+    Uma resposta interrompida no meio nunca é devolvida pela metade: vira o plano genérico
+    ou, com strict=True, IncompleteResponseError (também levantada no lugar do plano genérico).
     """
-    logger.warning("Retornando plano de aula genérico devido a erro.")
-    return """
+    call = {}
+    try:
+        response = "".join(stream_api(prompt, model=model, use_cache=use_cache, call=call)).strip()
+    except IncompleteResponseError as e:
+        if strict:
+            raise
+        logger.error(f"{e} Usando o plano genérico.")
+        return generate_generic_plan().strip()
+    if strict and call["fallback"]:
+        raise IncompleteResponseError("A API falhou ou não retornou conteúdo (plano genérico).")
+    return response
+
+# Plano de aula exibido quando a API falha ou não retorna conteúdo
+GENERIC_PLAN = """
     # Plano de Aula Genérico
 
     ## Informações Gerais 📋
@@ -126,6 +258,14 @@ def generate_generic_plan() -> str:
     - Observação direta e registro do progresso dos alunos.
     """
 
+def generate_generic_plan() -> str:
+    """
+    Gera um plano de aula genérico formatado para exibição.
+    """
+    logger.warning("Retornando plano de aula genérico devido a erro.")
+    limiter_metrics.record_fallback()
+    return GENERIC_PLAN
+
 # Código para exibição no Streamlit, garantindo que a resposta seja exibida apenas uma vez:
 def display_response(response: Optional[str]):
     if response:
@@ -1,10 +1,21 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import matplotlib.pyplot as plt
-from api_requests import call_api  # Importando a função da API
-from prompt_dicas import generate_prompt_for_analysis
-from prompt_aula import generate_prompt_for_activity
+import time
+from charts import hypothesis_pie_png, hypothesis_pie_spec
+from api_requests import IncompleteResponseError, generate_generic_plan, stream_api  # Importando as funções da API
+from prompt_aula import COMPONENTES, OBJETIVOS_POR_UNIDADE, UNIDADES_TEMATICAS, generate_prompt_for_activity
+from llm_executor import submit, submit_stream
+from formatting import format_lesson_plan, format_tips_as_html
+from tips_scheduler import class_fingerprint, generate_tips, get_tips_store, start_tips_scheduler
+from markdown_stream import StreamingMarkdownFormatter
+from data_loader import load_versioned_class_data
+from exports import save_plan_to_json
+from plan_store import format_created_at, get_plan_store
+from hypothesis_cube import HypothesisCube, get_cube
+from student_table import render_student_table
+from student_search import StudentSearchIndex, get_search_index
+from progression import Progression, get_progression
 import logging
 from PIL import Image
 
@@ -15,6 +26,11 @@ st.set_page_config(page_title="Painel da Classe e Gerador de Aulas", layout="wid
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Intervalo mínimo (em segundos) entre atualizações do plano exibido durante o streaming
+STREAM_RENDER_INTERVAL = 0.15
+# Gráfico de hipóteses: "png" (Matplotlib, memoizado no servidor) ou "vega" (desenhado no navegador)
+CHART_BACKEND = "png"
+
 # Adicionar as imagens
 # Exibe o logo do AlfaTutor (imagem maior)
 image_logo = Image.open("AlfaTutor.png")
@@ -42,22 +58,20 @@ def configure_ui():
 def get_user_inputs(data):
     """Captura as entradas de dados do usuário."""
     st.sidebar.header("Configurações da Atividade")
-    turmas = data['class_name'].unique()
+    turmas = data['class_name'].unique().tolist()
     turma = st.sidebar.selectbox("Escolha a turma:", turmas)
-    componente = st.sidebar.selectbox("Escolha o componente:", ["Língua Portuguesa", "Matemática"])
-    unidade_tematica = st.sidebar.selectbox("Escolha a unidade temática:", ["Leitura", "Escrita", "Produção de Texto"])
-    objetivos_map = {
-        "Leitura": ["Compreensão em Leitura"],
-        "Escrita": ["Produção de Textos"],
-        "Oralidade": ["Contação de Histórias"]
-    }
-    objetivo_conhecimento = st.sidebar.selectbox("Objetivo de Conhecimento", objetivos_map[unidade_tematica])
+    componente = st.sidebar.selectbox("Escolha o componente:", COMPONENTES)
+    unidade_tematica = st.sidebar.selectbox("Escolha a unidade temática:", UNIDADES_TEMATICAS)
+    objetivo_conhecimento = st.sidebar.selectbox("Objetivo de Conhecimento", OBJETIVOS_POR_UNIDADE[unidade_tematica])
     
     return turma, componente, unidade_tematica, objetivo_conhecimento
 
-def display_class_data(data: pd.DataFrame, turma: str, nome_busca: str = ""):
+def display_class_data(data: pd.DataFrame, turma: str, nome_busca: str = "", cube: HypothesisCube = None,
+                       search_index: StudentSearchIndex = None):
     """Exibe os dados da turma, como gráfico e tabela de hipóteses."""
     data = data[data['class_name'] == turma]
+    cube = cube or HypothesisCube.from_frame(data)
+    search_index = search_index or StudentSearchIndex.from_frame(data)
     
     # Início da explicação das hipóteses de escrita
     st.write("### Explicação das Hipóteses de Escrita")
@@ -92,99 +106,115 @@ def display_class_data(data: pd.DataFrame, turma: str, nome_busca: str = ""):
     # Agora, exibe o gráfico de pizza
     st.subheader("Veja a distribuição dos seus alunos por hipótese")
 
-    # Contagem e exibição dos gráficos
-    hypothesis_counts = data['hypothesis_name'].value_counts(normalize=True) * 100
-    labels = hypothesis_counts.index
-    sizes = hypothesis_counts.values
-    color_map = {
-        'Alfabética': '#86E085',
-        'Silábico-alfabética': '#C8FFBB',
-        'Silábica c/ valor': '#FFF6A1',
-        'Silábica s/ valor': '#FFC9A3',
-        'Pré-silábica': '#FFA9B8'
-    }
-    colors = [color_map.get(label, '#FFFFFF') for label in labels]
-
-    # Gráfico de pizza
-    fig1, ax1 = plt.subplots(figsize=(3, 2))
-    wedges, texts, autotexts = ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=70, colors=colors)
-
-    # Ajusta o tamanho dos rótulos (labels)
-    plt.setp(texts, size=4)  # Diminui o tamanho dos rótulos
-    plt.setp(autotexts, size=3)  # Diminui o tamanho dos percentuais
-
-    st.pyplot(fig1)
+    # Distribuição consultada no cubo de hipóteses (sem reagregar os dados)
+    hypothesis_distribution = cube.distribution(turma)
+
+    # Gráfico de pizza (renderizado uma única vez por turma e distribuição)
+    if CHART_BACKEND == "vega":
+        st.vega_lite_chart(hypothesis_pie_spec(hypothesis_distribution), use_container_width=True)
+    else:
+        st.image(hypothesis_pie_png(turma, hypothesis_distribution), use_column_width=True)
 
     # Campo de busca por nome logo abaixo do gráfico
     nome_busca = st.text_input("Buscar por nome do aluno:", key=f"nome_busca_{turma}")
     if nome_busca:
-        data = data[data['student_name'].str.contains(nome_busca, case=False, na=False)]
+        # Busca sem diferenciar acentos (JOAO encontra JOÃO), com correspondência aproximada
+        data = data[data['student_name'].isin(search_index.search(nome_busca))]
 
     st.subheader('Veja as informações de cada um dos seus alunos')
 
-    # Formatação da tabela com cores
-    def highlight_hypothesis(val):
-        color = color_map.get(val, "#FFFFFF")
-        return f'background-color: {color}'
+    # Tabela paginada, com as cores das hipóteses calculadas por categoria
+    render_student_table(data, key=f"alunos_{turma}")
 
-    styled_data = data.style.apply(
-        lambda x: [highlight_hypothesis(v) for v in x], subset=['hypothesis_name']
-    )
-    st.dataframe(styled_data, width=1500)
+def display_progression(progression: Progression, turma: str):
+    """Exibe a evolução da turma entre duas sondagens: matriz de transição, taxas e alunos estagnados."""
+    months = progression.months_of(turma)
+    if len(months) < 2:
+        return
 
-def clean_response(response: str) -> str:
-    """
-    Limpa a resposta da API removendo quebras de linha e múltiplos espaços.
-    """
-    cleaned_response = response.replace('\n', ' ').replace('\r', '').strip()
-    cleaned_response = ' '.join(cleaned_response.split())
-    return cleaned_response
+    st.subheader("Evolução dos alunos entre sondagens 📈")
+    col_inicio, col_fim = st.columns(2)
+    with col_inicio:
+        from_month = st.selectbox("De (mês):", months[:-1], key=f"evolucao_de_{turma}")
+    with col_fim:
+        to_options = [month for month in months if month > from_month]
+        to_month = st.selectbox("Até (mês):", to_options, index=len(to_options) - 1, key=f"evolucao_ate_{turma}")
+
+    rates = progression.progression_rates(from_month, to_month)
+    if turma in rates.index:
+        class_rates = rates.loc[turma]
+        st.write(
+            f"- **Avançaram:** {int(class_rates['avancaram'])} de {int(class_rates['alunos'])} alunos "
+            f"({class_rates['taxa_progressao'] * 100:.1f}%), avanço médio de {class_rates['avanco_medio']:.1f} níveis\n"
+            f"- **Mantiveram a hipótese:** {int(class_rates['mantiveram'])} alunos\n"
+            f"- **Regrediram:** {int(class_rates['regrediram'])} alunos"
+        )
 
-def format_tips_as_html(tips: str) -> str:
-    """
-    Formata as dicas como uma lista ordenada (HTML), onde cada dica é um item numerado.
-    
-    Parâmetros:
-    tips (str): Dicas em formato de string. Cada dica pode ser separada por uma quebra de linha.
-    
-    Retorna:
-    str: Dicas formatadas como lista HTML.
-    """
-    # Divida as dicas por linha e remova linhas vazias ou espaços extras
-    dicas = [dica.strip() for dica in tips.split("\n") if dica.strip()]
-    
-    # Inicia a lista HTML
-    formatted_tips = "<ol>"  # Usando <ol> para uma lista numerada
-    
-    # Adiciona cada dica como um item de lista <li>
-    for dica in dicas:
-        formatted_tips += f"<li>{dica}</li>"
-    
-    # Fecha a lista HTML
-    formatted_tips += "</ol>"
-    
-    return formatted_tips
+    # Linhas: hipótese no primeiro mês; colunas: hipótese no segundo
+    st.write("Alunos por hipótese em cada sondagem (linhas: primeiro mês; colunas: segundo mês):")
+    st.dataframe(progression.transition_matrix(from_month, to_month, turma), use_container_width=True)
+
+    stagnant = progression.stagnant_students(turma)
+    if not stagnant.empty:
+        st.write("Alunos sem avanço nas últimas sondagens:")
+        st.dataframe(stagnant.set_index("student_name")[["hypothesis_name"]], use_container_width=True)
 
-def analyze_class_data(data):
+def analyze_class_data(data, cube=None):
     """
     Analisa os dados da turma e retorna dicas formatadas.
+    Usa as dicas pré-calculadas para esta versão dos dados, se houver; senão, gera e guarda.
     """
-    prompt = generate_prompt_for_analysis(data)
-    logger.info(f"Prompt gerado para análise: {prompt}")
-    tips = call_api(prompt, model="llama3-8b-8192")
+    store = get_tips_store()
+    fingerprint = class_fingerprint(data)
+    tips = store.get(fingerprint)
+    if tips is None:
+        logger.info("Dicas da turma ainda não pré-calculadas; gerando sob demanda.")
+        tips = generate_tips(data, cube, fingerprint, store)
     if tips:
         logger.debug(f"Resposta da API (antes de limpar): {repr(tips)}")
-        cleaned_response = clean_response(tips)
-        formatted_tips = format_tips_as_html(cleaned_response)  # Formata como HTML
+        formatted_tips = format_tips_as_html(tips)  # Formata como HTML (uma dica por linha)
         logger.debug(f"Resposta da API (depois de limpar e formatar): {repr(formatted_tips)}")
         return formatted_tips
     else:
         logger.error("❌ O retorno da API foi nulo ou vazio.")
         return "Nenhuma dica foi retornada."
 
-def generate_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, current_month, perfis_turma):
+def display_plan_history(turma: str):
+    """Lista os planos salvos da turma (do mais recente para o mais antigo) e exibe o escolhido."""
+    try:
+        plans = get_plan_store().history(turma=str(turma))
+    except Exception as e:
+        logger.error(f"Erro ao ler o histórico de planos: {e}")
+        return
+    if not plans:
+        return
+    with st.expander(f"📚 Planos salvos da turma {turma}"):
+        options = {
+            f"{format_created_at(plan)} · {plan['componente']} · {plan['objetivo_conhecimento']} (#{plan['id']})": plan
+            for plan in plans
+        }
+        escolha = st.selectbox("Plano salvo:", list(options), key=f"historico_{turma}")
+        render_lesson_plan(st.empty(), options[escolha]["conteudo"])
+
+def render_lesson_plan(placeholder, plano_aula: str):
+    """Exibe o plano de aula (completo ou parcial) no espaço reservado da página."""
+    # O plano fica entre linhas em branco, sem recuo, para ser interpretado como Markdown
+    placeholder.markdown(
+        '<div style="background-color:#f9f9f9; padding:20px; border-radius:10px; border:1px solid #e0e0e0; margin-top:20px;">\n'
+        '<h3 style="color:#2a9d8f; font-size:24px;">Plano de Aula Gerado! </h3>\n'
+        '<p style="font-size:16px; color:#333333;">Aqui está o plano de aula detalhado para a sua turma:</p>\n'
+        '<div style="font-size:16px; color:#333333;">\n\n'
+        f"{plano_aula}\n\n"
+        "</div>\n</div>",
+        unsafe_allow_html=True
+    )
+
+def stream_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, current_month, perfis_turma, use_cache=True):
     """
-    Gera e formata o plano de aula com base nos dados fornecidos.
+    Gera o plano de aula em partes, à medida que a IA responde.
+
+    A chamada roda no pool de chamadas à LLM (llm_executor), em paralelo com as dicas da turma;
+    a thread do script só formata e exibe as partes.
     """
     prompt = generate_prompt_for_activity(
         componente,
@@ -194,115 +224,173 @@ def generate_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, cu
         perfis_turma
     )
     logger.info(f"Prompt gerado para o plano de aula: {prompt}")
-    plano_aula = call_api(prompt, model="llama3-8b-8192")
-    if plano_aula:
-        formatted_plan = format_lesson_plan(clean_response(plano_aula))
+    return submit_stream(stream_api(prompt, model="llama3-8b-8192", use_cache=use_cache))
+
+def show_tips(placeholder, tips: str):
+    """Exibe as dicas formatadas no espaço reservado."""
+    if tips:
+        placeholder.markdown(
+            f"""
+            <div style="background-color:#f0f8ff; padding:15px; border-radius:10px;">
+            <h3 style="color:#2a9d8f;">💡 Dicas da IA 🦙:</h3>
+            {tips}
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+    else:
+        placeholder.warning("Nenhuma dica foi retornada pela API.")
+
+def render_tips(placeholder, tips_future):
+    """Aguarda as dicas geradas em segundo plano e as exibe no espaço reservado."""
+    try:
+        show_tips(placeholder, tips_future.result())
+    except Exception as e:
+        placeholder.error(f"Erro ao analisar os dados com a IA: {e}")
+        logger.error(f"Erro ao analisar os dados com a IA: {e}")
+
+def generate_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, current_month, perfis_turma, use_cache=True, placeholder=None):
+    """
+    Gera e formata o plano de aula com base nos dados fornecidos.
+    Com use_cache=False, ignora o cache de respostas e pede um plano novo à IA.
+    Se um placeholder do Streamlit for informado, o plano é exibido progressivamente nele.
+    Se a resposta da IA for interrompida no meio, avisa e retorna o plano genérico.
+    """
+    # Cada parte é formatada uma única vez, assim que chega
+    formatter = StreamingMarkdownFormatter()
+    last_render = 0.0
+    try:
+        for part in stream_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, current_month, perfis_turma, use_cache):
+            formatter.feed(part)
+            if placeholder is not None and time.monotonic() - last_render >= STREAM_RENDER_INTERVAL:
+                render_lesson_plan(placeholder, formatter.text)
+                last_render = time.monotonic()
+    except IncompleteResponseError as e:
+        logger.error(f"Plano de aula incompleto: {e}")
+        st.warning("⚠️ A resposta da IA foi interrompida. Exibindo um plano de aula genérico; tente gerar novamente.")
+        return format_lesson_plan(generate_generic_plan())
+
+    formatted_plan = formatter.finish()
+    if formatted_plan.strip():
         logger.info("Plano de aula gerado com sucesso pela IA.")
         return formatted_plan
     else:
         logger.error("❌ O retorno da API foi nulo ou vazio. Verifique o prompt e a resposta.")
         return "Não foi possível gerar o plano de aula. Verifique os dados e tente novamente."
 
-def format_lesson_plan(plan: str) -> str:
-    """
-    Formata o plano de aula em Markdown com seções e listas bem definidas.
-    """
-    formatted_plan = plan.replace("\n", " ").replace("\r", "").strip()
-    formatted_plan = ' '.join(formatted_plan.split())
-    formatted_plan = formatted_plan.replace("# Plano de Aula", "\n# Plano de Aula")
-    formatted_plan = formatted_plan.replace("## ", "\n\n## ").replace("### ", "\n\n## ")
-    formatted_plan = formatted_plan.replace("- ", "\n- ")
-    return formatted_plan
-
 def main():
     configure_ui()
     try:
-        data = pd.read_csv('dados.csv')
+        # DataFrame compartilhado entre sessões; relido apenas quando o arquivo muda. A versão
+        # é a do DataFrame lido e chaveia os caches abaixo
+        version, data = load_versioned_class_data('dados.csv')
     except Exception as e:
         st.error(f"Erro ao carregar os dados do CSV: {e}")
         logger.error(f"Erro ao carregar dados: {e}")
         return
 
+    # Contagens turma × mês × hipótese, construídas uma única vez por versão dos dados
+    cube = get_cube(data, version)
+    # Trajetórias dos alunos entre as sondagens (matriz aluno × mês)
+    progression = get_progression(data, version)
+    # Dicas de todas as turmas geradas em segundo plano sempre que dados.csv muda
+    start_tips_scheduler('dados.csv')
+
     turma, componente, unidade_tematica, objetivo_conhecimento = get_user_inputs(data)
+    # Índice de busca por nome dos alunos da turma, também compartilhado entre as sessões
+    search_index = get_search_index(data, version, turma)
 
     st.subheader("Resumo do Nível de Alfabetização da Turma 📊")
 
     # Count the number of students and percentages
-    hypothesis_counts = data['hypothesis_name'].value_counts()
-    total_students = hypothesis_counts.sum()
-    hypothesis_percentages = (hypothesis_counts / total_students) * 100
+    hypothesis_counts = cube.counts(turma)
+    total_students = sum(hypothesis_counts.values())
 
     # Display each hypothesis with the number of students and percentage
     for hypothesis, count in hypothesis_counts.items():
-        percentage = hypothesis_percentages[hypothesis]
+        percentage = count / total_students * 100
         st.write(f"- **{hypothesis}:** {count} alunos ({percentage:.1f}%)")
 
-    try:
-        tips = analyze_class_data(data)
-        if tips:
-            st.markdown(
-                f"""
-                <div style="background-color:#f0f8ff; padding:15px; border-radius:10px;">
-                <h3 style="color:#2a9d8f;">💡 Dicas da IA 🦙:</h3>
-                {tips}
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-        else:
-            st.warning("Nenhuma dica foi retornada pela API.")
-    except Exception as e:
-        st.error(f"Erro ao analisar os dados com a IA: {e}")
-        logger.error(f"Erro ao analisar os dados com a IA: {e}")
+    # Analisa apenas a turma selecionada, não o arquivo inteiro. Dicas já pré-calculadas
+    # são exibidas na hora; senão, a chamada roda em segundo plano enquanto o restante da
+    # página (gráfico, tabela, plano) é montado.
+    class_rows = data[data['class_name'] == turma]
+    stored_tips = get_tips_store().get(class_fingerprint(class_rows))
+    tips_placeholder = st.empty()
+    tips_future = None
+    if stored_tips is not None:
+        show_tips(tips_placeholder, format_tips_as_html(stored_tips))
+    else:
+        tips_future = submit(analyze_class_data, class_rows, cube)
+        tips_placeholder.info("💡 Gerando dicas da IA para a sua turma...")
 
     tab_dados, tab_atividade = st.tabs(["📊 Detalhamento da Turma", "📝 Gerar Aula"])
 
     with tab_dados:
                # Chama a função para exibir os dados da turma com a busca por nome incluída
-        display_class_data(data, turma)
+        display_class_data(data, turma, cube=cube, search_index=search_index)
+        display_progression(progression, turma)
 
     with tab_atividade:
         st.subheader("Agora vamos preparar a sua próxima aula! 📝")
+
+        # Permite ignorar o cache e pedir uma versão nova do plano
+        gerar_novo = st.checkbox("Gerar uma nova versão do plano (ignorar planos já gerados)")
         
         # Botão para gerar a aula
         if st.button("Gerar Aula"):
             try:
                 current_month = datetime.datetime.now().strftime("%B de %Y")  # Obtém o mês atual
-                perfis_turma = "Perfil detalhado da turma aqui."  # Substitua com informações reais da turma
-                plano_aula = generate_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, current_month, perfis_turma)
+                # Mistura de hipóteses da turma (também orienta a busca de referências pedagógicas)
+                perfis_turma = ", ".join(f"{hypothesis}: {count} alunos" for hypothesis, count in cube.counts(turma).items())
+                # O plano aparece aos poucos neste espaço enquanto a IA responde
+                plano_placeholder = st.empty()
+                plano_aula = generate_lesson_plan(
+                    componente, unidade_tematica, objetivo_conhecimento, current_month, perfis_turma,
+                    use_cache=not gerar_novo, placeholder=plano_placeholder
+                )
                 
                 # Verifica se o plano de aula foi gerado
                 if plano_aula:
-                    st.markdown(
-                        f"""
-                        <div style="background-color:#f9f9f9; padding:20px; border-radius:10px; border:1px solid #e0e0e0; margin-top:20px;">
-                            <h3 style="color:#2a9d8f; font-size:24px;">Plano de Aula Gerado! </h3>
-                            <p style="font-size:16px; color:#333333;">Aqui está o plano de aula detalhado para a sua turma:</p>
-                            <div style="font-size:16px; color:#333333;">
-                                {plano_aula}  <!-- Aqui é onde o conteúdo do plano de aula gerado será exibido -->
-                            </div>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
+                    render_lesson_plan(plano_placeholder, plano_aula)
+                    # Guardado na sessão: o clique em "Salvar" roda o script de novo, sem este botão
+                    st.session_state["plano_gerado"] = {
+                        "conteudo": plano_aula,
+                        "turma": str(turma),
+                        "componente": componente,
+                        "unidade_tematica": unidade_tematica,
+                        "objetivo_conhecimento": objetivo_conhecimento,
+                        "data_aula": current_month,
+                    }
                     
                     # Opções de ação com botões
-                    col1, col2, col3 = st.columns(3)
+                    col1, col2 = st.columns(2)
                     with col1:
                         if st.button("📥 Baixar PDF"):
                             st.info("Funcionalidade de download em desenvolvimento.")
                     with col2:
                         if st.button("✏️ Editar Plano"):
                             st.info("Funcionalidade de edição em desenvolvimento.")
-                    with col3:
-                        if st.button("💾 Salvar"):
-                            st.info("Funcionalidade de salvamento em desenvolvimento.")
                 else:
                     st.error("❌ Não foi possível gerar o plano de aula. Tente novamente.")
                     
             except Exception as e:
                 st.error(f"Erro ao gerar o plano de aula: {e}")
 
+        # Último plano gerado nesta sessão para a turma, salvo no histórico com turma e componente
+        plano_gerado = st.session_state.get("plano_gerado")
+        if plano_gerado and plano_gerado["turma"] == str(turma):
+            if st.button("💾 Salvar"):
+                save_plan_to_json(
+                    plano_gerado["conteudo"],
+                    **{field: value for field, value in plano_gerado.items() if field != "conteudo"}
+                )
+        display_plan_history(turma)
+
+    # Exibe as dicas assim que a chamada em segundo plano terminar
+    if tips_future is not None:
+        render_tips(tips_placeholder, tips_future)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,949 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import data_loader
+from fake_groq_server import SAMPLE_PLAN, FakeGroqServer
+from hypotheses import HYPOTHESIS_ORDER
+from metrics import summarize_latencies
+from retrieval_index import BM25Index
+
+# Meses de sondagem usados nos dados sintéticos
+SYNTHETIC_MONTHS = [3, 6, 9, 11]
+# Alunos por turma nos dados sintéticos
+STUDENTS_PER_CLASS = 25
+
+
+def make_synthetic_sondagem(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Gera dados de sondagem sintéticos no formato de dados.csv.
+
+    Cada aluno aparece uma vez por mês de sondagem, e a hipótese tende a avançar ao
+    longo dos meses, como nos dados reais.
+    """
+    rng = np.random.default_rng(seed)
+    months = len(SYNTHETIC_MONTHS)
+    students = max(rows // months, 1)
+
+    student_ids = np.arange(students)
+    start = rng.integers(0, 3, size=students)
+    steps = rng.integers(0, 2, size=(students, months)).cumsum(axis=1)
+    codes = np.minimum(start[:, None] + steps, len(HYPOTHESIS_ORDER) - 1)
+
+    data = pd.DataFrame({
+        "class_name": np.repeat([f"{(i // STUDENTS_PER_CLASS) % 5 + 1}° ano {i // STUDENTS_PER_CLASS}" for i in student_ids], months),
+        "month": np.tile(SYNTHETIC_MONTHS, students),
+        "student_name": np.repeat([f"ALUNO {i:07d}" for i in student_ids], months),
+        "hypothesis_name": np.asarray(HYPOTHESIS_ORDER)[codes.ravel()],
+    })
+    return data.head(rows)
+
+
+def _elapsed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_data_loading(sizes=(1_000, 100_000, 1_000_000)) -> list:
+    """
+    Compara a carga fria (CSV e sidecar Parquet) com a carga quente (cache em memória).
+
+    cold_csv_s mede só a leitura do CSV; a primeira carga com sidecar (leitura + gravação do
+    Parquet) aparece à parte, em cold_csv_sidecar_write_s.
+    """
+    results = []
+    original_sidecar_dir = data_loader.SIDECAR_DIR
+    with tempfile.TemporaryDirectory() as workdir:
+        data_loader.SIDECAR_DIR = workdir
+        try:
+            for rows in sizes:
+                path = os.path.join(workdir, f"dados_{rows}.csv")
+                make_synthetic_sondagem(rows).to_csv(path, index=False)
+
+                data_loader.clear_cache()
+                pandas_default = _elapsed(lambda: pd.read_csv(path))
+                cold_csv = _elapsed(lambda: data_loader.load_class_data(path, use_sidecar=False))
+
+                data_loader.clear_cache()
+                cold_csv_sidecar_write = _elapsed(lambda: data_loader.load_class_data(path))
+
+                data_loader.clear_cache()
+                cold_sidecar = _elapsed(lambda: data_loader.load_class_data(path))
+                warm = _elapsed(lambda: data_loader.load_class_data(path))
+
+                frame = data_loader.load_class_data(path)
+                results.append({
+                    "benchmark": "data_loading",
+                    "rows": rows,
+                    "read_csv_object_s": pandas_default,
+                    "cold_csv_s": cold_csv,
+                    "cold_csv_sidecar_write_s": cold_csv_sidecar_write,
+                    "cold_sidecar_s": cold_sidecar,
+                    "warm_s": warm,
+                    "memory_object_mb": pd.read_csv(path).memory_usage(deep=True).sum() / 2**20,
+                    "memory_typed_mb": frame.memory_usage(deep=True).sum() / 2**20,
+                })
+        finally:
+            data_loader.SIDECAR_DIR = original_sidecar_dir
+            data_loader.clear_cache()
+    return results
+
+
+def make_synthetic_documents(count: int, vocabulary_size: int = 20_000, length: int = 80, seed: int = 0) -> list:
+    """Gera documentos sintéticos com distribuição de termos de Zipf, como textos reais."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.asarray([f"termo{i}" for i in range(vocabulary_size)])
+    terms = np.minimum(rng.zipf(1.3, size=(count, length)) - 1, vocabulary_size - 1)
+    return [
+        {"titulo": f"Plano {i}", "trecho": "", "texto": " ".join(vocabulary[row])}
+        for i, row in enumerate(terms)
+    ]
+
+
+def bench_retrieval(sizes=(6_000, 100_000), queries: int = 200) -> list:
+    """Mede construção, consulta top-k e atualização incremental do índice de referências."""
+    results = []
+    rng = np.random.default_rng(1)
+    for count in sizes:
+        documents = make_synthetic_documents(count)
+        index = BM25Index()
+        build = _elapsed(lambda: index.add_documents(documents))
+
+        latencies = []
+        for _ in range(queries):
+            query = " ".join(f"termo{term}" for term in np.minimum(rng.zipf(1.3, size=6) - 1, 19_999))
+            latencies.append(_elapsed(lambda: index.search(query, k=3)))
+
+        extra = make_synthetic_documents(100, seed=2)
+        update = _elapsed(lambda: index.add_documents(extra))
+        results.append({
+            "benchmark": "retrieval",
+            "documents": count,
+            "terms": len(index.vocabulary),
+            "build_s": build,
+            "query_p50_ms": float(np.percentile(latencies, 50)) * 1000,
+            "query_p95_ms": float(np.percentile(latencies, 95)) * 1000,
+            "add_100_docs_s": update,
+        })
+    return results
+
+
+def _allocations(fn) -> dict:
+    """Executa fn() sob o tracemalloc e retorna o pico e o total de memória alocada (MB)."""
+    tracemalloc.start()
+    try:
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_mb": peak / 2**20, "alloc_retained_mb": current / 2**20}
+
+
+def _latency_result(benchmark: str, case: str, latencies: list, **extra) -> dict:
+    result = {"benchmark": benchmark, "case": case}
+    result.update(summarize_latencies(latencies))
+    result.update(extra)
+    return result
+
+
+@contextlib.contextmanager
+def _groq_environment(base_url: str, workdir: str):
+    """
+    Aponta o cliente Groq para o servidor falso durante o bloco.
+
+    Define GROQ_BASE_URL e GROQ_API_KEY, troca o limitador de taxa do processo por um sem
+    limites práticos e o cache de respostas por um novo em `workdir`, para que só a API falsa
+    seja medida. Ao sair, variáveis, limitador e cache voltam ao que eram e os clientes
+    ligados ao servidor falso são fechados.
+    """
+    import groq_client
+    import llm_cache
+    import rate_limiter
+
+    previous = {name: os.environ.get(name) for name in ("GROQ_BASE_URL", "GROQ_API_KEY")}
+    previous_limiter, previous_cache = rate_limiter._limiter, llm_cache._cache
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ["GROQ_API_KEY"] = "chave-do-benchmark"
+    groq_client.close_groq_clients()
+    rate_limiter.configure_rate_limiter(requests_per_minute=1_000_000, tokens_per_minute=1_000_000_000)
+    llm_cache.configure_response_cache(os.path.join(workdir, "respostas.sqlite3"))
+    try:
+        yield
+    finally:
+        groq_client.close_groq_clients()
+        # None volta a criar o padrão sob demanda (get_rate_limiter / get_response_cache)
+        with rate_limiter._limiter_lock:
+            rate_limiter._limiter = previous_limiter
+        with llm_cache._cache_lock:
+            llm_cache._cache = previous_cache
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def bench_llm(calls: int = 20, concurrency: int = 4, ttft: float = 0.2,
+              tokens_per_second: float = 500, error_rate: float = 0.05) -> list:
+    """
+    Mede call_api, stream_api e logs.process_with_groq contra o servidor falso da Groq.
+
+    O cliente Groq é apontado para o servidor local via GROQ_BASE_URL; o limitador de taxa
+    e o cache de respostas do processo são substituídos para que só a API falsa seja medida.
+    """
+    import api_requests
+    import logs
+    import rate_limiter
+
+    results = []
+    prompt = "Crie um plano de aula de Língua Portuguesa sobre Leitura para uma turma do 2° ano."
+    with FakeGroqServer(ttft, tokens_per_second, error_rate) as server, tempfile.TemporaryDirectory() as workdir, \
+            _groq_environment(server.base_url, workdir):
+
+        def timed_call(number=None) -> float:
+            # Prompts distintos nas chamadas concorrentes: idênticos seriam agrupados numa só chamada
+            text = prompt if number is None else f"{prompt} (chamada {number})"
+            return _elapsed(lambda: api_requests.call_api(text, use_cache=False))
+
+        latencies = [timed_call() for _ in range(calls)]
+        results.append(_latency_result("llm", "call_api_sequencial", latencies,
+                                       **_allocations(timed_call)))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed_call, range(calls)))
+        elapsed = time.perf_counter() - start
+        results.append(_latency_result("llm", f"call_api_concorrente_{concurrency}", latencies,
+                                       calls_per_minute=calls / elapsed * 60))
+
+        ttfts = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            stream = api_requests.stream_api(prompt, use_cache=False)
+            next(stream)
+            ttfts.append(time.perf_counter() - start)
+            for _ in stream:
+                pass
+        results.append(_latency_result("llm", "stream_api_ttft", ttfts))
+
+        results.append(_latency_result("llm", "call_api_cache_quente", [
+            _elapsed(lambda: api_requests.call_api(prompt)) for _ in range(calls)
+        ]))
+        latencies = [
+            _elapsed(lambda: logs.process_with_groq("chave-do-benchmark", prompt, "Língua Portuguesa", "Leitura"))
+            for _ in range(calls)
+        ]
+        results.append(_latency_result("llm", "process_with_groq", latencies))
+
+        results[0]["server_errors"] = server.stats["errors"]
+        results[0].update({f"limiter_{key}": value for key, value in rate_limiter.limiter_metrics.snapshot().items()})
+    return results
+
+
+def bench_prompts(repeats: int = 50, synthetic_rows: int = 100_000) -> list:
+    """Mede a montagem dos prompts do plano de aula e da análise da turma."""
+    from prompt_aula import generate_prompt_for_activity
+    from prompt_dicas import generate_prompt_for_analysis
+
+    results = []
+    activity = lambda: generate_prompt_for_activity(
+        "Língua Portuguesa", "Leitura", "Compreensão em Leitura", "março de 2025",
+        "Pré-silábica: 4 alunos, Silábica s/ valor: 6 alunos, Alfabética: 10 alunos",
+    )
+    activity()  # Carrega o índice de referências fora da medição
+    results.append(_latency_result("prompts", "atividade", [_elapsed(activity) for _ in range(repeats)],
+                                   **_allocations(activity)))
+
+    frames = {"dados.csv": data_loader.load_class_data(data_loader.CSV_PATH)}
+    synthetic = make_synthetic_sondagem(synthetic_rows)
+    # O app analisa uma turma por vez
+    frames["sintetico"] = synthetic[synthetic["class_name"] == synthetic["class_name"].iloc[0]]
+    for name, frame in frames.items():
+        analysis = lambda: generate_prompt_for_analysis(frame)
+        results.append(_latency_result("prompts", f"analise_{name}", [_elapsed(analysis) for _ in range(repeats)],
+                                       rows=len(frame), **_allocations(analysis)))
+    return results
+
+
+# Referência fixa do benchmark de formatação: reprodução da cadeia anterior (clean_response +
+# str.replace), que não existe mais no app. Os casos "cadeia_antiga_*" medem esta cópia, não
+# código distribuído.
+def _legacy_clean_response(response: str) -> str:
+    # Limpeza que a cadeia anterior aplicava à resposta: remove quebras de linha e múltiplos espaços
+    cleaned_response = response.replace('\n', ' ').replace('\r', '').strip()
+    return ' '.join(cleaned_response.split())
+
+
+def _legacy_format_chain(plan: str) -> str:
+    # Cadeia anterior: call_api e app achatavam as quebras de linha e format_lesson_plan
+    # tentava reconstruir títulos e listas com str.replace
+    flattened = _legacy_clean_response(_legacy_clean_response(plan))
+    flattened = flattened.replace("# Plano de Aula", "\n# Plano de Aula")
+    flattened = flattened.replace("## ", "\n\n## ").replace("### ", "\n\n## ")
+    return flattened.replace("- ", "\n- ")
+
+
+def bench_formatting(repeats: int = 50, plan_tokens: int = 4_000, chunk_chars: int = 4, render_every: int = 40) -> list:
+    """
+    Compara a cadeia antiga de formatação com o formatador incremental em planos de 4 mil tokens.
+
+    "final" formata a resposta completa; "streaming" também simula a exibição parcial a cada
+    render_every partes (a cadeia antiga refazia a formatação do texto inteiro a cada vez).
+    A cadeia antiga é uma reprodução mantida só neste arquivo (campo implementacao=reproducao).
+    """
+    from markdown_stream import StreamingMarkdownFormatter
+
+    plan = (SAMPLE_PLAN * (plan_tokens // 200 + 1))[:plan_tokens * 4]
+    chunks = [plan[i:i + chunk_chars] for i in range(0, len(plan), chunk_chars)]
+
+    def legacy_streaming():
+        parts = []
+        for number, chunk in enumerate(chunks):
+            parts.append(chunk)
+            if number % render_every == 0:
+                _legacy_format_chain("".join(parts))
+        return _legacy_format_chain("".join(parts))
+
+    def incremental_streaming(render=True):
+        formatter = StreamingMarkdownFormatter()
+        for number, chunk in enumerate(chunks):
+            formatter.feed(chunk)
+            if render and number % render_every == 0:
+                _ = formatter.text  # Texto que seria exibido no placeholder
+        return formatter.finish()
+
+    cases = (
+        ("cadeia_antiga_final", "reproducao", lambda: _legacy_format_chain(plan)),
+        ("formatador_final", "markdown_stream", lambda: incremental_streaming(render=False)),
+        ("cadeia_antiga_streaming", "reproducao", legacy_streaming),
+        ("formatador_streaming", "markdown_stream", incremental_streaming),
+    )
+    results = []
+    for name, implementation, call in cases:
+        results.append(_latency_result("formatting", name, [_elapsed(call) for _ in range(repeats)],
+                                       implementacao=implementation, chars=len(plan), **_allocations(call)))
+    return results
+
+
+def bench_logging(events: int = 20_000, max_bytes: int = 1 * 2**20) -> list:
+    """
+    Compara a latência de registrar um evento na thread da requisição com o handler de
+    arquivo síncrono e com o pipeline assíncrono (fila + listener) de logs.py.
+
+    Os eventos chegam em rajada e o arquivo rotaciona (com gzip) durante a medição.
+    """
+    from logs import build_file_handler, start_async_logging
+
+    results = []
+    line = json.dumps({"event": "api_request", "api": "Groq", "component": "Língua Portuguesa",
+                       "theme": "Leitura", "prompt_chars": 1834}, ensure_ascii=False)
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in ("sincrono", "assincrono"):
+            logger = logging.getLogger(f"benchmarks.logging.{mode}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = build_file_handler(os.path.join(workdir, f"{mode}.log"), max_bytes=max_bytes)
+            listener = None
+            if mode == "sincrono":
+                logger.addHandler(handler)
+            else:
+                listener = start_async_logging(logger, [handler], stop_at_exit=False)
+
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(events):
+                latencies.append(_elapsed(lambda: logger.info(line)))
+            burst = time.perf_counter() - start
+            # Tempo até o listener gravar tudo o que ficou na fila
+            drain = _elapsed(listener.stop) if listener else 0.0
+            handler.close()
+            logger.handlers.clear()
+
+            micros = np.asarray(latencies) * 1e6
+            result = {
+                "benchmark": "logging",
+                "case": mode,
+                "events": events,
+                "p50_us": float(np.percentile(micros, 50)),
+                "p95_us": float(np.percentile(micros, 95)),
+                "p99_us": float(np.percentile(micros, 99)),
+                "max_us": float(micros.max()),
+                "events_per_second": events / burst,
+                "drain_s": drain,
+            }
+            result["rotated_files"] = sum(name.endswith(".gz") and name.startswith(mode) for name in os.listdir(workdir))
+            results.append(result)
+    return results
+
+
+def bench_charts(reruns: int = 300) -> list:
+    """
+    Simula reexecuções do painel: gráfico de pizza com pyplot sem fechar a figura (como
+    antes) contra o PNG memoizado de charts.py. Mede tempo por reexecução e memória retida.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import charts
+
+    distribution = {"Pré-silábica": 4, "Silábica s/ valor": 6, "Silábica c/ valor": 5,
+                    "Silábico-alfabética": 3, "Alfabética": 7}
+
+    def pyplot_rerun():
+        figure, axes = plt.subplots(figsize=charts.PIE_FIGSIZE)
+        axes.pie(list(distribution.values()), labels=list(distribution), autopct='%1.1f%%', startangle=70)
+        figure.savefig(io.BytesIO(), format="png", dpi=charts.PIE_DPI)
+
+    results = []
+    charts.get_chart_cache().clear()
+    cases = (
+        ("pyplot_sem_fechar", pyplot_rerun),
+        ("png_memoizado", lambda: charts.hypothesis_pie_png("1° ano A", distribution)),
+        ("vega_lite", lambda: charts.hypothesis_pie_spec(distribution)),
+    )
+    for name, rerun in cases:
+        latencies = []
+        tracemalloc.start()
+        for _ in range(reruns):
+            latencies.append(_elapsed(rerun))
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append(_latency_result("charts", name, latencies, retained_mb=retained / 2**20,
+                                       open_figures=len(plt.get_fignums())))
+        plt.close("all")
+    return results
+
+
+def bench_student_table(sizes=(1_000, 10_000, 100_000, 1_000_000), max_full_render: int = 10_000) -> list:
+    """
+    Compara o estilo por célula da tabela inteira (como antes) com a página estilizada de
+    student_table. Mede tempo de renderização e tamanho do HTML gerado (payload).
+    """
+    import student_table
+    from hypotheses import DEFAULT_COLOR, HYPOTHESIS_COLORS
+
+    def per_cell_style(data):
+        return data.style.apply(
+            lambda x: [f"background-color: {HYPOTHESIS_COLORS.get(v, DEFAULT_COLOR)}" for v in x],
+            subset=['hypothesis_name'],
+        )
+
+    results = []
+    for rows in sizes:
+        data = make_synthetic_sondagem(rows).astype({"hypothesis_name": "category"})
+        cases = [("pagina", lambda: student_table.style_page(student_table.get_page(data, 2)).to_html())]
+        if rows <= max_full_render:
+            cases.insert(0, ("tabela_inteira", lambda: per_cell_style(data).to_html()))
+        for name, render in cases:
+            start = time.perf_counter()
+            html = render()
+            results.append({
+                "benchmark": "student_table",
+                "case": name,
+                "rows": rows,
+                "render_s": time.perf_counter() - start,
+                "payload_kb": len(html.encode("utf-8")) / 1024,
+            })
+    return results
+
+
+def bench_student_search(sizes=(10_000, 1_000_000), queries: int = 200) -> list:
+    """Compara str.contains (como antes) com as buscas do índice de nomes de alunos."""
+    from student_search import StudentSearchIndex
+
+    results = []
+    rng = np.random.default_rng(3)
+    for rows in sizes:
+        data = make_synthetic_sondagem(rows).astype({"student_name": "category"})
+        start = time.perf_counter()
+        index = StudentSearchIndex.from_frame(data)
+        build = time.perf_counter() - start
+        students = len(index.names)
+        # Trechos do número do aluno (4 a 7 dígitos), como alguém digitando parte do nome
+        terms = [f"{number:07d}"[-rng.integers(4, 8):] for number in rng.integers(0, students, size=queries)]
+        cases = {
+            "str_contains": lambda term: data[data["student_name"].str.contains(term, case=False, na=False)],
+            "prefixo": index.prefix,
+            "substring": index.substring,
+            "aproximada": lambda term: index.fuzzy(f"alnuo {term}"),
+        }
+        for name, search in cases.items():
+            latencies = [_elapsed(lambda: search(term)) for term in terms[:20 if name == "str_contains" else queries]]
+            results.append({
+                "benchmark": "student_search",
+                "case": name,
+                "rows": rows,
+                "students": students,
+                "build_s": build,
+                "query_p50_ms": float(np.percentile(latencies, 50)) * 1000,
+                "query_p95_ms": float(np.percentile(latencies, 95)) * 1000,
+            })
+    return results
+
+
+def bench_pdf_export(plans: int = 200, workers: int = None) -> list:
+    """
+    Compara a exportação antiga (gravar plano_aula.pdf e reler o arquivo) com a renderização
+    em memória, o cache por hash do conteúdo e o lote em pool de processos.
+    """
+    import exports
+    from exportar_pdfs_lote import export_batch
+    from fpdf import FPDF
+
+    contents = [f"{SAMPLE_PLAN}\nVersão {i}" for i in range(plans)]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        def disk_round_trip(content):
+            pdf = FPDF()
+            pdf.set_auto_page_break(auto=True, margin=15)
+            pdf.add_page()
+            pdf.set_font("Arial", size=12)
+            pdf.multi_cell(0, 10, content.encode("latin-1", "ignore").decode("latin-1"))
+            path = os.path.join(workdir, "plano_aula.pdf")
+            pdf.output(path)
+            with open(path, "rb") as file:
+                return file.read()
+
+        cases = (
+            ("disco_e_releitura", disk_round_trip, contents),
+            ("memoria", exports.render_pdf, contents),
+            ("cache_quente", exports.generate_pdf, [contents[0]] * plans),
+        )
+        exports.generate_pdf(contents[0])
+        for name, render, inputs in cases:
+            start = time.perf_counter()
+            latencies = [_elapsed(lambda: render(content)) for content in inputs]
+            elapsed = time.perf_counter() - start
+            results.append(_latency_result("pdf", name, latencies, pdfs_per_second=plans / elapsed))
+
+        report = export_batch([(str(i), content) for i, content in enumerate(contents)],
+                              os.path.join(workdir, "lote"), workers)
+        results.append({"benchmark": "pdf", "case": "lote_processos", "count": report["exported"],
+                        "elapsed_s": report["elapsed_s"], "pdfs_per_second": report["pdfs_per_second"]})
+    return results
+
+
+def bench_plan_store(plans: int = 100_000, writers: int = 8, saves_per_writer: int = 200) -> list:
+    """Mede salvamentos concorrentes, o plano mais recente da turma e o histórico paginado."""
+    from plan_store import PlanStore
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        store = PlanStore(os.path.join(workdir, "planos.sqlite3"))
+        connection = store._connection()
+        connection.execute("BEGIN")
+        connection.executemany(
+            "INSERT INTO planos (professor, turma, componente, conteudo, criado_em) VALUES (?, ?, ?, ?, ?)",
+            ((f"Prof. {i % 40}", f"Turma {i % 500}", "Língua Portuguesa", SAMPLE_PLAN, time.time()) for i in range(plans)),
+        )
+        connection.execute("COMMIT")
+
+        def writer(number):
+            return [_elapsed(lambda: store.save(SAMPLE_PLAN, turma=f"Turma {i % 500}", professor=f"Prof. {number}"))
+                    for i in range(saves_per_writer)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as executor:
+            latencies = [latency for batch in executor.map(writer, range(writers)) for latency in batch]
+        elapsed = time.perf_counter() - start
+        results.append(_latency_result("plan_store", f"salvar_{writers}_escritores", latencies, rows=plans,
+                                       saves_per_second=len(latencies) / elapsed))
+
+        latencies = [_elapsed(lambda: store.latest(turma=f"Turma {i}")) for i in range(500)]
+        results.append(_latency_result("plan_store", "mais_recente_da_turma", latencies, rows=plans))
+
+        def page_through(professor):
+            page = store.history(professor=professor)
+            while page:
+                page = store.history(professor=professor, before_id=page[-1]["id"])
+
+        latencies = [_elapsed(lambda: page_through(f"Prof. {i}")) for i in range(10)]
+        results.append(_latency_result("plan_store", "historico_do_professor_completo", latencies, rows=plans))
+    return results
+
+
+def bench_gateway(clients: int = 50, requests_per_client: int = 4, ttft: float = 0.2,
+                  tokens_per_second: float = 500, response_tokens: int = 200) -> list:
+    """
+    Teste de carga do gateway assíncrono contra o servidor falso da Groq: muitos clientes
+    simultâneos em /prompt (resposta completa e SSE) e /hello, com requisições/s e latências
+    de cauda. Um cliente extra acima do limite por cliente mede a rejeição com 429. Cada
+    cliente usa um prompt próprio, para que pedidos idênticos não sejam agrupados.
+    """
+    import asyncio
+    import httpx
+    from gateway import MAX_CONCURRENT_PER_CLIENT, Gateway
+
+    async def run(base_url: str) -> list:
+        gateway = Gateway(api_key="chave-do-benchmark", base_url=base_url)
+        server = await gateway.start("127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        results = []
+        limits = httpx.Limits(max_connections=clients * 2, max_keepalive_connections=clients * 2)
+        async with server, httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as http:
+            async def prompt_full(client_id):
+                response = await http.post("/prompt", json={"prompt": f"Plano de aula ({client_id})"}, headers={"X-Client-Id": client_id})
+                return response.status_code
+
+            async def prompt_sse(client_id):
+                async with http.stream("POST", "/prompt?stream=1", json={"prompt": f"Plano de aula ({client_id})"},
+                                       headers={"X-Client-Id": client_id}) as response:
+                    async for _ in response.aiter_bytes():
+                        pass
+                return response.status_code
+
+            async def hello(client_id):
+                response = await http.get("/hello", params={"prompt": f"Olá ({client_id})"}, headers={"X-Client-Id": client_id})
+                return response.status_code
+
+            for name, call in (("prompt", prompt_full), ("prompt_sse", prompt_sse), ("hello", hello)):
+                latencies, statuses = [], []
+
+                async def client(number):
+                    for _ in range(requests_per_client):
+                        start = time.perf_counter()
+                        statuses.append(await call(f"cliente-{number}"))
+                        latencies.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(client(number) for number in range(clients)))
+                elapsed = time.perf_counter() - start
+                result = _latency_result("gateway", name, latencies, clients=clients,
+                                         requests_per_second=len(latencies) / elapsed,
+                                         errors=sum(status != 200 for status in statuses))
+                result["p99_s"] = float(np.percentile(latencies, 99))
+                results.append(result)
+
+            # Um único cliente com o dobro do limite de gerações simultâneas
+            statuses = await asyncio.gather(*(prompt_full("cliente-insistente")
+                                              for _ in range(MAX_CONCURRENT_PER_CLIENT * 2)))
+            results.append({"benchmark": "gateway", "case": "limite_por_cliente",
+                            "accepted": statuses.count(200), "rejected_429": statuses.count(429)})
+        await gateway.close()
+        return results
+
+    with FakeGroqServer(ttft, tokens_per_second, response_tokens=response_tokens) as fake:
+        return asyncio.run(run(fake.base_url))
+
+
+def bench_tips(rows: int = 2_500, lookups: int = 200, ttft: float = 0.2, tokens_per_second: float = 500,
+               response_tokens: int = 150) -> list:
+    """
+    Dicas da IA na carga da página: leitura do banco pré-calculado (impressão digital da turma
+    + consulta) contra a geração sob demanda, e o custo do pré-cálculo de todas as turmas.
+    """
+    import llm_cache
+    from tips_scheduler import TipsStore, class_fingerprint, generate_tips, precompute_tips
+
+    data = make_synthetic_sondagem(rows)
+    classes = data["class_name"].unique()
+    results = []
+    with FakeGroqServer(ttft, tokens_per_second, response_tokens=response_tokens) as server, \
+            tempfile.TemporaryDirectory() as workdir, _groq_environment(server.base_url, workdir):
+        store = TipsStore(os.path.join(workdir, "dicas.sqlite3"))
+
+        precompute_time = _elapsed(lambda: precompute_tips(data, store=store))
+        results.append({"benchmark": "dicas", "case": "pre_calculo", "rows": rows, "classes": len(classes),
+                        "seconds": precompute_time, "upstream_requests": server.stats["requests"]})
+
+        samples = [data[data["class_name"] == classes[i % len(classes)]] for i in range(lookups)]
+        results.append(_latency_result("dicas", "pagina_banco", [
+            _elapsed(lambda: store.get(class_fingerprint(class_rows))) for class_rows in samples
+        ], rows=rows))
+        # Sob demanda: como na carga da página antes do pré-cálculo (sem o cache de respostas)
+        def on_demand(class_rows):
+            llm_cache.get_response_cache().clear()
+            return _elapsed(lambda: generate_tips(class_rows, store=store))
+
+        results.append(_latency_result("dicas", "pagina_sob_demanda",
+                                       [on_demand(class_rows) for class_rows in samples[:10]], rows=rows))
+    return results
+
+
+def bench_change_detection(sizes=(100_000, 1_000_000), changed_rows: int = 100) -> list:
+    """
+    Detecção de partições (turma, mês) alteradas e atualização incremental do cubo, depois
+    da chegada de um novo mês de sondagem e depois de correções pontuais em poucas linhas.
+    """
+    import hypothesis_cube
+    from change_detection import ChangeSet, partition_fingerprints
+
+    results = []
+    for rows in sizes:
+        data = make_synthetic_sondagem(rows)
+        data = data.astype({"class_name": "category", "student_name": "category",
+                            "hypothesis_name": "category", "month": "int8"})
+        corrected = data.copy()
+        corrected.loc[corrected.index[:changed_rows], "hypothesis_name"] = HYPOTHESIS_ORDER[-1]
+        scenarios = (
+            ("novo_mes", data[data["month"] < SYNTHETIC_MONTHS[-1]], data),
+            ("correcoes", data, corrected),
+        )
+        for case, before, after in scenarios:
+            hypothesis_cube._cubes.clear()
+            hypothesis_cube._fingerprints.clear()
+            hypothesis_cube.get_cube(before, "anterior")
+            changes = ChangeSet(partition_fingerprints(before), partition_fingerprints(after))
+            results.append({
+                "benchmark": "particoes", "case": case, "rows": rows,
+                "fingerprint_s": _elapsed(lambda: partition_fingerprints(after)),
+                "cube_full_s": _elapsed(lambda: hypothesis_cube.HypothesisCube.from_frame(after)),
+                "cube_incremental_s": _elapsed(lambda: hypothesis_cube.get_cube(after, "atual")),
+                **changes.summary(),
+            })
+        hypothesis_cube._cubes.clear()
+        hypothesis_cube._fingerprints.clear()
+    return results
+
+
+def bench_progression(sizes=(1_000_000, 5_000_000), baseline_max_rows: int = 1_000_000) -> list:
+    """
+    Trajetórias, matrizes de transição por turma, taxas de progressão e estagnação em escala
+    de rede (milhões de linhas), comparadas a um pivot_table + crosstab do pandas.
+    """
+    from progression import Progression, encode_hypotheses
+
+    results = []
+    first, last = SYNTHETIC_MONTHS[0], SYNTHETIC_MONTHS[-1]
+    for rows in sizes:
+        data = make_synthetic_sondagem(rows).astype({"class_name": "category", "student_name": "category",
+                                                     "hypothesis_name": "category", "month": "int8"})
+        progression = Progression.from_frame(data)
+        result = {
+            "benchmark": "progressao", "case": "vetorizado", "rows": rows, "students": progression.students,
+            "build_s": _elapsed(lambda: Progression.from_frame(data)),
+            "transition_matrices_s": _elapsed(lambda: progression.transition_matrices(first, last)),
+            "progression_rates_s": _elapsed(lambda: progression.progression_rates(first, last)),
+            "stagnation_s": _elapsed(progression.stagnation_flags),
+        }
+        results.append(result)
+
+        if rows <= baseline_max_rows:
+            def pandas_baseline():
+                codes = data.assign(code=encode_hypotheses(data["hypothesis_name"]))
+                wide = codes.pivot_table(index=["class_name", "student_name"], columns="month",
+                                         values="code", aggfunc="last", observed=True)
+                wide = wide.dropna(subset=[first, last]).reset_index()
+                return pd.crosstab([wide["class_name"], wide[first]], wide[last])
+
+            results.append({"benchmark": "progressao", "case": "pandas_pivot", "rows": rows,
+                            "transition_matrices_s": _elapsed(pandas_baseline)})
+    return results
+
+
+def bench_database(sizes=(100_000, 1_000_000), queries: int = 20) -> list:
+    """
+    Consultas do painel no substituto SQLite do banco de sondagens: filtros e agregação
+    executados pelo banco (pushdown) contra carregar a tabela inteira e filtrar no pandas.
+    """
+    import db_access
+    from hypothesis_cube import HypothesisCube
+
+    results = []
+    for rows in sizes:
+        data = make_synthetic_sondagem(rows)
+        with tempfile.TemporaryDirectory() as workdir:
+            repository = db_access.sqlite_standin(os.path.join(workdir, "sondagens.sqlite3"))
+            insert_s = _elapsed(lambda: repository.insert_frame(data))
+            classes = repository.classes()
+            samples = [classes[i * len(classes) // queries] for i in range(queries)]
+            last_month = SYNTHETIC_MONTHS[-1]
+
+            def full_load_class(class_name):
+                full = repository.load()
+                return full[full["class_name"] == class_name]
+
+            def full_load_counts(class_name):
+                full = repository.load()
+                return full[full["class_name"] == class_name].groupby(
+                    ["class_name", "month", "hypothesis_name"], observed=True).size()
+
+            full_samples = samples[:3]
+            cases = (
+                ("turma_pushdown", lambda class_name: repository.load(class_name), samples),
+                ("turma_tabela_inteira", full_load_class, full_samples),
+                ("turma_mes_pushdown", lambda class_name: repository.load(class_name, [last_month]), samples),
+                ("contagens_pushdown", lambda class_name: repository.hypothesis_counts(class_name), samples),
+                ("contagens_tabela_inteira", full_load_counts, full_samples),
+            )
+            for case, query, names in cases:
+                results.append(_latency_result("banco", case, [_elapsed(lambda: query(name)) for name in names],
+                                               rows=rows))
+            results.append({
+                "benchmark": "banco", "case": "cubo", "rows": rows, "insert_s": insert_s,
+                "cube_group_by_s": _elapsed(repository.cube),
+                "cube_full_load_s": _elapsed(lambda: HypothesisCube.from_frame(repository.load())),
+            })
+            db_access.dispose_engines()
+    return results
+
+
+def bench_singleflight(bursts=(1, 10, 50), ttft: float = 0.2, tokens_per_second: float = 500,
+                       response_tokens: int = 200) -> list:
+    """
+    Rajadas de pedidos idênticos simultâneos (mesmo modelo, prompt e parâmetros) em
+    stream_api e no gateway: conta as requisições que chegam ao servidor falso da Groq e as
+    chamadas poupadas pelo agrupamento.
+    """
+    import asyncio
+    import threading
+    import api_requests
+    from gateway import PROMPT_MODEL, Gateway
+
+    results = []
+    with FakeGroqServer(ttft, tokens_per_second, response_tokens=response_tokens) as server, \
+            tempfile.TemporaryDirectory() as workdir, _groq_environment(server.base_url, workdir):
+
+        for burst in bursts:
+            prompt = f"Crie um plano de aula sobre Leitura (rajada de {burst})."
+            barrier = threading.Barrier(burst)
+
+            def timed_call(_) -> float:
+                barrier.wait()
+                return _elapsed(lambda: api_requests.call_api(prompt, use_cache=False))
+
+            requests_before = server.stats["requests"]
+            with ThreadPoolExecutor(max_workers=burst) as executor:
+                latencies = list(executor.map(timed_call, range(burst)))
+            upstream = server.stats["requests"] - requests_before
+            results.append(_latency_result("singleflight", f"stream_api_rajada_{burst}", latencies,
+                                           callers=burst, upstream_requests=upstream,
+                                           saved_requests=burst - upstream))
+
+        async def gateway_burst(burst: int) -> dict:
+            gateway = Gateway(api_key="chave-do-benchmark", base_url=server.base_url)
+
+            async def timed_collect() -> float:
+                start = time.perf_counter()
+                await gateway._collect(PROMPT_MODEL, f"Plano de aula (rajada de {burst})")
+                return time.perf_counter() - start
+
+            requests_before = server.stats["requests"]
+            latencies = await asyncio.gather(*(timed_collect() for _ in range(burst)))
+            upstream = server.stats["requests"] - requests_before
+            await gateway.close()
+            return _latency_result("singleflight", f"gateway_rajada_{burst}", list(latencies),
+                                   callers=burst, upstream_requests=upstream, saved_requests=burst - upstream)
+
+        for burst in bursts:
+            results.append(asyncio.run(gateway_burst(burst)))
+    return results
+
+
+BENCHMARKS = {
+    "alunos": bench_student_search,
+    "banco": bench_database,
+    "dicas": bench_tips,
+    "gateway": bench_gateway,
+    "historico": bench_plan_store,
+    "dados": bench_data_loading,
+    "particoes": bench_change_detection,
+    "pdf": bench_pdf_export,
+    "tabela": bench_student_table,
+    "graficos": bench_charts,
+    "formatacao": bench_formatting,
+    "llm": bench_llm,
+    "logs": bench_logging,
+    "progressao": bench_progression,
+    "prompts": bench_prompts,
+    "singleflight": bench_singleflight,
+    "referencias": bench_retrieval,
+}
+
+
+def run_metadata() -> dict:
+    """Identifica a execução (versão do código e ambiente) para comparar resultados entre versões."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "executado_em": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+# Campos que identificam o cenário medido (os demais são métricas)
+RESULT_KEY_FIELDS = ("benchmark", "case", "rows", "documents", "chars")
+
+
+def _result_key(result: dict) -> tuple:
+    return tuple(result.get(field) for field in RESULT_KEY_FIELDS)
+
+
+def compare_results(baseline: list, results: list) -> list:
+    """Retorna a variação percentual de cada métrica em relação aos mesmos cenários do baseline."""
+    previous = {_result_key(result): result for result in baseline}
+    comparisons = []
+    for result in results:
+        before = previous.get(_result_key(result))
+        if before is None:
+            continue
+        deltas = {
+            key: (value - before[key]) / before[key] * 100
+            for key, value in result.items()
+            if isinstance(value, float) and isinstance(before.get(key), float) and before[key]
+        }
+        comparisons.append({"benchmark": result["benchmark"], "case": result.get("case", ""), "deltas_pct": deltas})
+    return comparisons
+
+
+def print_results(results: list):
+    """Exibe os resultados em formato de tabela."""
+    for result in results:
+        fields = ", ".join(
+            f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+        )
+        print(fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de desempenho do AlfaTutor.")
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks a executar (padrão: todos). Opções: {', '.join(sorted(BENCHMARKS))}.")
+    parser.add_argument("--saida", help="Arquivo JSON onde gravar os resultados.")
+    parser.add_argument("--comparar", help="Arquivo JSON de uma execução anterior, para exibir as variações.")
+    args = parser.parse_args()
+    # Sem o log em DEBUG que api_requests ativa ao ser importado (mediria a escrita no console)
+    logging.basicConfig(level=logging.WARNING, force=True)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Benchmarks desconhecidos: {', '.join(sorted(unknown))}")
+
+    results = []
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        print(f"🔍 Executando benchmark: {name}")
+        results += BENCHMARKS[name]()
+
+    print_results(results)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as file:
+            baseline = json.load(file)
+        print(f"🔍 Variação em relação a {args.comparar} (commit {baseline['metadata'].get('commit')}):")
+        for comparison in compare_results(baseline["results"], results):
+            deltas = ", ".join(f"{key}={delta:+.1f}%" for key, delta in comparison["deltas_pct"].items())
+            print(f"{comparison['benchmark']} {comparison['case']}: {deltas}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as file:
+            json.dump({"metadata": run_metadata(), "results": results}, file, ensure_ascii=False, indent=2)
+        print(f"✅ Resultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Diretório dos manifestos (impressões digitais da última execução de cada etapa)
+MANIFEST_DIR = ".cache"
+# Colunas que definem uma partição e as que definem o seu conteúdo
+PARTITION_COLUMNS = ["class_name", "month"]
+FINGERPRINT_COLUMNS = ["month", "student_name", "hypothesis_name"]
+
+
+def row_hashes(data: pd.DataFrame) -> pd.Series:
+    """Hash de cada linha de sondagem (aluno, mês e hipótese)."""
+    # month em int64: o hash não pode depender do tipo compacto com que o CSV foi lido
+    return pd.util.hash_pandas_object(
+        data[FINGERPRINT_COLUMNS].astype({"month": "int64"}), index=False
+    )
+
+
+def partition_fingerprints(data: pd.DataFrame) -> dict:
+    """
+    Retorna {(turma, mês): impressão digital} para todas as partições, numa única passada.
+
+    A impressão é o par (soma dos hashes das linhas módulo 2**64, número de linhas): não
+    depende da ordem das linhas e muda sempre que um aluno ou hipótese da partição muda.
+    """
+    grouped = row_hashes(data).groupby([data[column] for column in PARTITION_COLUMNS], observed=True)
+    sums, sizes = grouped.sum(), grouped.size()
+    return {
+        (class_name, int(month)): fingerprint
+        for (class_name, month), fingerprint in zip(sums.index, zip(sums.tolist(), sizes.tolist()))
+    }
+
+
+class ChangeSet:
+    """Diferença entre as partições (turma, mês) de duas versões dos dados."""
+
+    def __init__(self, previous: dict, current: dict):
+        self.current = current
+        self.added = current.keys() - previous.keys()
+        self.removed = previous.keys() - current.keys()
+        self.changed = {key for key in current.keys() & previous.keys() if current[key] != previous[key]}
+        self.unchanged = len(current) - len(self.added) - len(self.changed)
+
+    @property
+    def dirty(self) -> set:
+        """Partições a recalcular (novas, alteradas ou removidas)."""
+        return self.added | self.changed | self.removed
+
+    def dirty_classes(self) -> set:
+        """Turmas com ao menos uma partição nova, alterada ou removida."""
+        return {class_name for class_name, _ in self.dirty}
+
+    def dirty_rows(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Linhas das partições novas ou alteradas."""
+        keys = self.added | self.changed
+        if not keys:
+            return data.iloc[:0]
+        index = pd.MultiIndex.from_arrays([data[column] for column in PARTITION_COLUMNS])
+        return data[index.isin(list(keys))]
+
+    def summary(self) -> dict:
+        """Quantas partições foram puladas (inalteradas) e quantas precisam ser recalculadas."""
+        return {
+            "partitions": len(self.current),
+            "skipped": self.unchanged,
+            "recomputed": len(self.dirty),
+            "added": len(self.added),
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+        }
+
+
+class ChangeDetector:
+    """
+    Compara as partições dos dados com as da última execução bem-sucedida de uma etapa.
+
+    Cada etapa (dicas, planos em lote...) tem o seu manifesto em MANIFEST_DIR, atualizado
+    com commit() somente depois que o trabalho das partições alteradas foi concluído.
+    """
+
+    def __init__(self, name: str, manifest_dir: str = MANIFEST_DIR):
+        self.name = name
+        self.path = os.path.join(manifest_dir, f"particoes_{name}.json")
+
+    def load(self) -> dict:
+        """Retorna as impressões digitais da última execução (vazio se não houver manifesto)."""
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                entries = json.load(file)["particoes"]
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Manifesto de partições inválido ({self.path}): {e}")
+            return {}
+        return {(class_name, month): (hash_sum, rows) for class_name, month, hash_sum, rows in entries}
+
+    def detect(self, data: pd.DataFrame) -> ChangeSet:
+        changes = ChangeSet(self.load(), partition_fingerprints(data))
+        summary = changes.summary()
+        logger.info(
+            f"Partições ({self.name}): {summary['recomputed']} a recalcular "
+            f"({summary['added']} novas, {summary['changed']} alteradas, {summary['removed']} removidas), "
+            f"{summary['skipped']} inalteradas."
+        )
+        return changes
+
+    def commit(self, changes: ChangeSet):
+        """Grava as impressões digitais atuais como referência da próxima execução."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        entries = [[str(class_name), month, hash_sum, rows]
+                   for (class_name, month), (hash_sum, rows) in changes.current.items()]
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"particoes": entries}, file, ensure_ascii=False)
+        os.replace(temporary, self.path)
@@ -0,0 +1,126 @@
+import collections
+import hashlib
+import io
+import json
+import logging
+import threading
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from hypotheses import DEFAULT_COLOR, HYPOTHESIS_COLORS
+
+logger = logging.getLogger(__name__)
+
+# Gráficos renderizados mantidos em memória (LRU)
+MAX_CACHED_CHARTS = 256
+PIE_FIGSIZE = (3, 2)
+PIE_DPI = 200
+
+
+def distribution_fingerprint(distribution: dict) -> str:
+    """Identifica uma distribuição de hipóteses (rótulos, contagens e ordem)."""
+    payload = json.dumps(list(distribution.items()), ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def render_hypothesis_pie(distribution: dict) -> bytes:
+    """
+    Renderiza o gráfico de pizza das hipóteses como PNG.
+
+    Usa a API orientada a objetos do Matplotlib (Figure + FigureCanvasAgg) em vez do pyplot:
+    a figura não entra no registro global de figuras e é liberada ao fim da função.
+    """
+    labels = list(distribution)
+    sizes = list(distribution.values())
+    colors = [HYPOTHESIS_COLORS.get(label, DEFAULT_COLOR) for label in labels]
+
+    figure = Figure(figsize=PIE_FIGSIZE)
+    FigureCanvasAgg(figure)
+    try:
+        axes = figure.subplots()
+        wedges, texts, autotexts = axes.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=70, colors=colors)
+        for text in texts:
+            text.set_fontsize(4)  # Diminui o tamanho dos rótulos
+        for autotext in autotexts:
+            autotext.set_fontsize(3)  # Diminui o tamanho dos percentuais
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png", dpi=PIE_DPI)
+        return buffer.getvalue()
+    finally:
+        figure.clear()
+
+
+def hypothesis_pie_spec(distribution: dict) -> dict:
+    """
+    Especificação Vega-Lite do gráfico de pizza das hipóteses.
+
+    O gráfico é desenhado no navegador, sem custo de renderização no servidor.
+    """
+    labels = list(distribution)
+    return {
+        "data": {"values": [{"hipotese": label, "alunos": count} for label, count in distribution.items()]},
+        "mark": {"type": "arc", "tooltip": True},
+        "encoding": {
+            "theta": {"field": "alunos", "type": "quantitative", "stack": "normalize"},
+            "color": {
+                "field": "hipotese",
+                "type": "nominal",
+                "title": "Hipótese",
+                "sort": labels,
+                "scale": {"domain": labels, "range": [HYPOTHESIS_COLORS.get(label, DEFAULT_COLOR) for label in labels]},
+            },
+            "order": {"field": "alunos", "type": "quantitative", "sort": "descending"},
+        },
+        "view": {"stroke": None},
+    }
+
+
+class ChartCache:
+    """Cache LRU de gráficos renderizados, compartilhado por todas as sessões do processo."""
+
+    def __init__(self, max_entries: int = MAX_CACHED_CHARTS):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._charts = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """Retorna o gráfico da chave, renderizando-o com render() apenas na primeira vez."""
+        with self._lock:
+            chart = self._charts.get(key)
+            if chart is not None:
+                self._charts.move_to_end(key)
+                self.hits += 1
+                return chart
+            self.misses += 1
+
+        # Renderiza fora do lock: outras sessões continuam sendo atendidas pelo cache
+        chart = render()
+        with self._lock:
+            self._charts[key] = chart
+            self._charts.move_to_end(key)
+            while len(self._charts) > self.max_entries:
+                self._charts.popitem(last=False)
+        return chart
+
+    def clear(self):
+        with self._lock:
+            self._charts.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._charts)}
+
+
+_chart_cache = ChartCache()
+
+
+def hypothesis_pie_png(turma: str, distribution: dict) -> bytes:
+    """PNG do gráfico de pizza da turma, memoizado por (turma, impressão digital da distribuição)."""
+    key = (turma, distribution_fingerprint(distribution))
+    return _chart_cache.get_or_render(key, lambda: render_hypothesis_pie(distribution))
+
+
+def get_chart_cache() -> ChartCache:
+    return _chart_cache
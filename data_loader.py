@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import os
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CSV_PATH = "dados.csv"
+# Diretório onde ficam as cópias Parquet (sidecars) do CSV
+SIDECAR_DIR = ".cache"
+
+# Colunas com poucos valores distintos, armazenadas como categorias do pandas
+CSV_DTYPES = {
+    "class_name": "category",
+    "month": "int8",
+    "student_name": "category",
+    "hypothesis_name": "category",
+}
+
+# Cache em memória compartilhado por todas as sessões: caminho -> (versão, DataFrame)
+_frames = {}
+_frames_lock = threading.Lock()
+
+
+def data_version(path: str = CSV_PATH, use_hash: bool = False) -> str:
+    """
+    Retorna a versão do arquivo de dados, usada para invalidar os caches.
+
+    Por padrão usa data de modificação e tamanho; com use_hash=True inclui também o hash
+    do conteúdo (mais lento, mas imune a cópias que preservam a data de modificação).
+    """
+    stat = os.stat(path)
+    version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    if use_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        version += "-" + digest.hexdigest()[:16]
+    return version
+
+
+def sidecar_path(path: str, version: str) -> str:
+    """Caminho da cópia Parquet do CSV para uma versão específica dos dados."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(SIDECAR_DIR, f"{stem}-{version}.parquet")
+
+
+def read_class_csv(path: str = CSV_PATH) -> pd.DataFrame:
+    """Lê o CSV de sondagens com tipos compactos (categorias e inteiros pequenos)."""
+    return pd.read_csv(path, dtype=CSV_DTYPES)
+
+
+def _read_sidecar(sidecar: str):
+    try:
+        return pd.read_parquet(sidecar)
+    except ImportError:
+        logger.debug("pyarrow não instalado; leitura do sidecar Parquet desativada.")
+    except Exception as e:
+        logger.warning(f"Sidecar Parquet inválido ({sidecar}): {e}")
+    return None
+
+
+def _write_sidecar(data: pd.DataFrame, path: str, sidecar: str):
+    """Grava o sidecar da versão atual e remove os das versões anteriores."""
+    try:
+        if not os.path.exists(SIDECAR_DIR):
+            os.makedirs(SIDECAR_DIR)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for name in os.listdir(SIDECAR_DIR):
+            if name.startswith(f"{stem}-") and name.endswith(".parquet"):
+                os.remove(os.path.join(SIDECAR_DIR, name))
+        temporary = sidecar + ".tmp"
+        data.to_parquet(temporary, index=False)
+        os.replace(temporary, sidecar)
+    except ImportError:
+        logger.debug("pyarrow não instalado; sidecar Parquet não será gravado.")
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o sidecar Parquet: {e}")
+
+
+def load_class_data(path: str = CSV_PATH, use_sidecar: bool = True, use_hash: bool = False) -> pd.DataFrame:
+    """
+    Carrega os dados de sondagem, reaproveitando o DataFrame já lido enquanto o arquivo não mudar.
+
+    O DataFrame retornado é compartilhado entre sessões e não deve ser alterado no lugar.
+    Na primeira leitura de uma versão, tenta o sidecar Parquet antes de interpretar o CSV.
+    """
+    return load_versioned_class_data(path, use_sidecar, use_hash)[1]
+
+
+def load_versioned_class_data(path: str = CSV_PATH, use_sidecar: bool = True, use_hash: bool = False) -> tuple:
+    """
+    Como load_class_data, mas retorna (versão, DataFrame) com a versão que foi de fato lida.
+
+    Use para chavear caches por versão: chamar data_version separadamente pode pegar uma
+    versão mais nova que a do DataFrame, se o arquivo mudar entre as duas chamadas.
+    """
+    version = data_version(path, use_hash=use_hash)
+    cached = _frames.get(path)
+    if cached is not None and cached[0] == version:
+        return cached
+
+    with _frames_lock:
+        cached = _frames.get(path)
+        if cached is not None and cached[0] == version:
+            return cached
+
+        data = None
+        sidecar = sidecar_path(path, version)
+        if use_sidecar and os.path.exists(sidecar):
+            data = _read_sidecar(sidecar)
+            if data is not None:
+                logger.info(f"Dados carregados do sidecar Parquet ({len(data)} linhas).")
+
+        if data is None:
+            data = read_class_csv(path)
+            logger.info(f"Dados carregados do CSV ({len(data)} linhas).")
+            if use_sidecar:
+                _write_sidecar(data, path, sidecar)
+
+        _frames[path] = (version, data)
+        return version, data
+
+def clear_cache():
+    """Descarta os DataFrames mantidos em memória."""
+    with _frames_lock:
+        _frames.clear()
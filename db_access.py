@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+import pandas as pd
+import streamlit as st
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, create_engine, func, select
+from sqlalchemy.engine import URL, Engine, make_url
+from data_loader import CSV_DTYPES
+from hypothesis_cube import HypothesisCube
+
+logger = logging.getLogger(__name__)
+
+# Configuração padrão do pool de conexões com o banco de sondagens
+POOL_SIZE = 5  # Conexões mantidas abertas por processo
+MAX_OVERFLOW = 10  # Conexões extras permitidas em picos
+POOL_TIMEOUT = 10.0  # Segundos de espera por uma conexão livre
+POOL_RECYCLE = 1800  # Segundos até reabrir uma conexão (o MySQL encerra conexões ociosas)
+DEFAULT_DRIVER = "mysql+pymysql"
+# Linhas por lote ao gravar sondagens no banco
+INSERT_BATCH_SIZE = 10_000
+
+metadata = MetaData()
+
+# Mesmas colunas de dados.csv
+sondagens = Table(
+    "sondagens",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("class_name", String(100), nullable=False),
+    Column("month", Integer, nullable=False),
+    Column("student_name", String(200), nullable=False),
+    Column("hypothesis_name", String(50), nullable=False),
+    # Filtros do painel (turma, turma + mês) e a agregação por hipótese usam o mesmo índice
+    Index("idx_sondagens_turma_mes_hipotese", "class_name", "month", "hypothesis_name"),
+)
+
+SONDAGEM_COLUMNS = ["class_name", "month", "student_name", "hypothesis_name"]
+
+
+def database_url(secrets=None) -> URL:
+    """
+    Monta a URL do banco a partir da seção [database] do secrets.toml (DB_USER, DB_PASSWORD,
+    DB_HOST, DB_NAME e, opcionais, DB_PORT e DB_DRIVER).
+
+    A variável de ambiente DATABASE_URL, se definida, tem precedência (usada em scripts e
+    benchmarks fora do Streamlit).
+    """
+    if os.environ.get("DATABASE_URL"):
+        return make_url(os.environ["DATABASE_URL"])
+    settings = (secrets if secrets is not None else st.secrets)["database"]
+    return URL.create(
+        settings.get("DB_DRIVER", DEFAULT_DRIVER),
+        username=settings["DB_USER"],
+        password=settings["DB_PASSWORD"],
+        host=settings["DB_HOST"],
+        port=int(settings["DB_PORT"]) if settings.get("DB_PORT") else None,
+        database=settings["DB_NAME"],
+    )
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(url=None, pool_size: int = POOL_SIZE, max_overflow: int = MAX_OVERFLOW) -> Engine:
+    """
+    Retorna o engine compartilhado para a URL informada (ou a do secrets.toml).
+
+    O engine e o seu pool de conexões são criados uma única vez por processo e reutilizados
+    por todas as sessões do Streamlit. Conexões são testadas antes do uso (pool_pre_ping).
+    """
+    url = make_url(url) if url is not None else database_url()
+    registry_key = (url.render_as_string(hide_password=False), pool_size, max_overflow)
+    engine = _engines.get(registry_key)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(registry_key)
+        if engine is None:
+            if url.get_backend_name() == "sqlite":
+                # SQLite (substituto local) usa o pool padrão do driver
+                engine = create_engine(url, connect_args={"check_same_thread": False})
+            else:
+                engine = create_engine(
+                    url,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_timeout=POOL_TIMEOUT,
+                    pool_recycle=POOL_RECYCLE,
+                    pool_pre_ping=True,
+                )
+            _engines[registry_key] = engine
+            logger.info(f"Novo engine de banco criado ({url.get_backend_name()}, pool de {pool_size} conexões).")
+    return engine
+
+
+def dispose_engines():
+    """Fecha todos os engines do registro e as conexões dos seus pools."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _filters(query, class_name=None, months=None):
+    if class_name is not None:
+        query = query.where(sondagens.c.class_name == class_name)
+    if months is not None:
+        query = query.where(sondagens.c.month.in_([int(month) for month in months]))
+    return query
+
+
+class SondagemRepository:
+    """
+    Acesso às sondagens no banco, com filtros e agregações executados pelo próprio banco.
+
+    Em vez de trazer a tabela inteira para o pandas, cada consulta devolve só as linhas da
+    turma/meses pedidos ou as contagens já agrupadas por hipótese.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def create_schema(self):
+        metadata.create_all(self.engine)
+
+    def insert_frame(self, data: pd.DataFrame, batch_size: int = INSERT_BATCH_SIZE) -> int:
+        """Grava as linhas de um DataFrame no formato de dados.csv e retorna quantas gravou."""
+        records = data[SONDAGEM_COLUMNS].astype({"class_name": str, "month": int, "student_name": str,
+                                                 "hypothesis_name": str}).to_dict("records")
+        with self.engine.begin() as connection:
+            for start in range(0, len(records), batch_size):
+                connection.execute(sondagens.insert(), records[start:start + batch_size])
+        return len(records)
+
+    def classes(self) -> list:
+        """Lista as turmas, em ordem alfabética."""
+        query = select(sondagens.c.class_name).distinct().order_by(sondagens.c.class_name)
+        with self.engine.connect() as connection:
+            return list(connection.execute(query).scalars())
+
+    def months(self, class_name: str = None) -> list:
+        """Lista os meses de sondagem (de uma turma, se informada) em ordem crescente."""
+        query = _filters(select(sondagens.c.month).distinct(), class_name).order_by(sondagens.c.month)
+        with self.engine.connect() as connection:
+            return list(connection.execute(query).scalars())
+
+    def load(self, class_name: str = None, months: list = None) -> pd.DataFrame:
+        """
+        Retorna as sondagens da turma e/ou dos meses informados, com os tipos de dados.csv.
+
+        Sem filtros, traz a tabela inteira (evite no painel: prefira filtrar ou agregar).
+        """
+        columns = [sondagens.c[column] for column in SONDAGEM_COLUMNS]
+        query = _filters(select(*columns), class_name, months)
+        with self.engine.connect() as connection:
+            data = pd.DataFrame(connection.execute(query).all(), columns=SONDAGEM_COLUMNS)
+        return data.astype(CSV_DTYPES)
+
+    def hypothesis_counts(self, class_name: str = None, months: list = None) -> pd.Series:
+        """
+        Quantidade de alunos por (turma, mês, hipótese), agrupada pelo banco (GROUP BY).
+
+        Retorna uma Series com índice (class_name, month, hypothesis_name).
+        """
+        keys = [sondagens.c.class_name, sondagens.c.month, sondagens.c.hypothesis_name]
+        query = _filters(select(*keys, func.count().label("alunos")), class_name, months).group_by(*keys)
+        with self.engine.connect() as connection:
+            rows = connection.execute(query).all()
+        index = pd.MultiIndex.from_tuples([row[:3] for row in rows], names=["class_name", "month", "hypothesis_name"])
+        return pd.Series([row[3] for row in rows], index=index, dtype="int64", name="alunos")
+
+    def cube(self, class_name: str = None, months: list = None) -> HypothesisCube:
+        """Cubo de hipóteses montado a partir das contagens agrupadas pelo banco."""
+        return HypothesisCube.from_counts(self.hypothesis_counts(class_name, months))
+
+
+def sqlite_standin(path: str, data: pd.DataFrame = None) -> SondagemRepository:
+    """
+    Banco SQLite local no lugar do MySQL/PostgreSQL, para testes e benchmarks.
+
+    Cria a tabela de sondagens no arquivo informado e, se `data` for informado, grava as linhas.
+    """
+    repository = SondagemRepository(get_engine(f"sqlite:///{path}"))
+    repository.create_schema()
+    if data is not None:
+        repository.insert_frame(data)
+    return repository
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> SondagemRepository:
+    """Retorna o repositório de sondagens do banco configurado no secrets.toml."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = SondagemRepository(get_engine())
+    return _repository
@@ -0,0 +1,80 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from exports import render_pdf
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Planos enviados de uma vez a cada processo (reduz o custo de comunicação entre processos)
+CHUNK_SIZE = 8
+
+
+def read_plans(path: str, field: str = "plano") -> list:
+    """
+    Lê os planos de um arquivo JSON Lines (ex.: os resultados de gerar_planos_lote.py).
+
+    Retorna pares (identificador, texto); linhas com status diferente de "ok" ou sem
+    texto são ignoradas.
+    """
+    plans = []
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Linha {number} ignorada: JSON inválido.")
+                continue
+            if record.get("status", "ok") == "ok" and record.get(field):
+                plans.append((str(record.get("job_id", number)), record[field]))
+    return plans
+
+
+def export_plan(plan: tuple, output_dir: str) -> int:
+    """Renderiza um plano e grava o PDF em output_dir; retorna o tamanho em bytes."""
+    plan_id, content = plan
+    pdf_bytes = render_pdf(content)
+    with open(os.path.join(output_dir, f"{plan_id}.pdf"), "wb") as file:
+        file.write(pdf_bytes)
+    return len(pdf_bytes)
+
+
+def export_batch(plans: list, output_dir: str, workers: int = None) -> dict:
+    """
+    Renderiza os planos em paralelo num pool de processos (a renderização do FPDF é
+    Python puro e não se beneficia de threads).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(export_plan, plans, [output_dir] * len(plans), chunksize=CHUNK_SIZE))
+    elapsed = time.perf_counter() - start
+    return {
+        "exported": len(sizes),
+        "elapsed_s": elapsed,
+        "pdfs_per_second": len(sizes) / elapsed if elapsed > 0 else 0.0,
+        "total_mb": sum(sizes) / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta planos de aula em PDF, em lote.")
+    parser.add_argument("planos", help="Arquivo JSON Lines com os planos (ex.: resultados de gerar_planos_lote.py).")
+    parser.add_argument("saida", help="Diretório onde gravar os PDFs (um por plano).")
+    parser.add_argument("--campo", default="plano", help="Campo com o texto do plano.")
+    parser.add_argument("--processos", type=int, default=None, help="Processos no pool (padrão: um por CPU).")
+    args = parser.parse_args()
+
+    plans = read_plans(args.planos, args.campo)
+    report = export_batch(plans, args.saida, args.processos)
+    print(f"✅ {report['exported']} PDFs gravados em {args.saida} ({report['total_mb']:.1f} MB)")
+    print(f"Vazão: {report['pdfs_per_second']:.1f} PDFs/segundo em {report['elapsed_s']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,32 @@
 import streamlit as st
-import json
+import collections
+import hashlib
 import datetime
+import sqlite3
+import threading
 from fpdf import FPDF
+from plan_store import get_plan_store
 
-# Caminho do arquivo JSON para armazenar os planos
-JSON_FILE = "plano_aula.json"
+# Função para salvar o plano de aula no histórico de planos
+def save_plan_to_json(plan: str, **fields):
+    """
+    Salva o plano no histórico (plan_store), sem sobrescrever os anteriores.
 
-# Função para salvar o plano de aula em JSON
-def save_plan_to_json(plan: str):
+    fields: professor, turma, componente, unidade_tematica, objetivo_conhecimento, data_aula.
+    """
     try:
-        with open(JSON_FILE, "w") as file:
-            json.dump({"plano_aula": plan}, file)
+        get_plan_store().save(plan, **fields)
         st.success("Plano de aula salvo com sucesso!")
     except Exception as e:
         st.error(f"Erro ao salvar o plano: {e}")
 
-# Função para carregar o último plano de aula do arquivo JSON
-def load_last_plan():
+# Função para carregar o último plano de aula salvo (da turma, se informada)
+def load_last_plan(turma: str = None, componente: str = None):
     try:
-        with open(JSON_FILE, "r") as file:
-            data = json.load(file)
-            return data.get("plano_aula", "")
-    except FileNotFoundError:
-        return ""  # Se o arquivo não existir, retorna uma string vazia
-    except json.JSONDecodeError:
-        return ""  # Se o JSON estiver corrompido, retorna uma string vazia
+        plan = get_plan_store().latest(turma=turma, componente=componente)
+    except sqlite3.Error:
+        return ""  # Se o histórico não puder ser lido, retorna uma string vazia
+    return plan["conteudo"] if plan else ""
 
 # Função para gerar o plano de aula formatado
 def generate_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, current_month, perfis_turma):
@@ -47,8 +49,21 @@ def generate_lesson_plan(componente, unidade_tematica, objetivo_conhecimento, cu
     """
     return plan
 
-# Função para gerar o PDF do plano de aula
-def generate_pdf(content: str):
+# Nome sugerido para o download do PDF
+PDF_FILENAME = "plano_aula.pdf"
+# PDFs mantidos em memória, indexados pelo hash do conteúdo (LRU)
+MAX_CACHED_PDFS = 64
+
+_pdf_cache = collections.OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+
+def render_pdf(content: str) -> bytes:
+    """
+    Renderiza o plano de aula como PDF diretamente em memória.
+
+    As fontes padrão do FPDF só cobrem Latin-1: caracteres fora dele (como emojis) são omitidos.
+    """
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -56,27 +71,55 @@ def generate_pdf(content: str):
     pdf.set_font("Arial", size=12)
     
     # Adiciona o conteúdo ao PDF
-    pdf.multi_cell(0, 10, content)
-    
-    # Salva o PDF com o nome do arquivo
-    pdf_filename = "plano_aula.pdf"
-    pdf.output(pdf_filename)
+    pdf.multi_cell(0, 10, content.encode("latin-1", "ignore").decode("latin-1"))
+
+    output = pdf.output(dest="S")
+    # fpdf 1.x devolve str (Latin-1); o fpdf2 devolve bytearray
+    if isinstance(output, str):
+        return output.encode("latin-1")
+    return bytes(output)
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# Função para gerar o PDF do plano de aula
+def generate_pdf(content: str) -> bytes:
+    """
+    Retorna o PDF do plano de aula (bytes), renderizando-o só se o conteúdo ainda não
+    estiver no cache.
+
+    Nada é gravado em disco, então exportações simultâneas não interferem entre si.
+    """
+    key = content_hash(content)
+    with _pdf_cache_lock:
+        pdf_bytes = _pdf_cache.get(key)
+        if pdf_bytes is not None:
+            _pdf_cache.move_to_end(key)
+            return pdf_bytes
 
-    return pdf_filename
+    pdf_bytes = render_pdf(content)
+    with _pdf_cache_lock:
+        _pdf_cache[key] = pdf_bytes
+        while len(_pdf_cache) > MAX_CACHED_PDFS:
+            _pdf_cache.popitem(last=False)
+    return pdf_bytes
 
 # Função principal para exibir os botões
 def main():
     st.title("Gerador de Plano de Aula")
     
     # Exemplo de entrada de dados para o plano de aula
+    turma = st.text_input("Turma", "")
     componente = "Matemática"
     unidade_tematica = "Leitura"
     objetivo_conhecimento = "Compreensão em Leitura"
     current_month = datetime.datetime.now().strftime("%B de %Y")
     perfis_turma = "Perfil detalhado da turma"
     
-    # Carrega o último plano de aula salvo
-    plano_aula = load_last_plan()
+    # Carrega o último plano de aula salvo da turma (de qualquer turma, se não informada)
+    plano_aula = load_last_plan(turma=turma or None, componente=componente)
     
     if not plano_aula:
         # Se não houver um plano salvo, gera um plano padrão
@@ -93,14 +136,20 @@ def main():
     # Botão para baixar o PDF
     if st.button("📥 Baixar PDF"):
         # Salvar o conteúdo do plano de aula gerado em PDF
-        pdf_filename = generate_pdf(plano_aula_editado)
-        with open(pdf_filename, "rb") as pdf_file:
-            st.download_button("Baixar PDF", pdf_file, file_name=pdf_filename)
+        st.download_button("Baixar PDF", generate_pdf(plano_aula_editado), file_name=PDF_FILENAME,
+                           mime="application/pdf")
         st.success("PDF gerado com sucesso!")
     
     # Botão para salvar o plano de aula em um arquivo JSON
     if st.button("💾 Salvar"):
-        save_plan_to_json(plano_aula_editado)
+        save_plan_to_json(
+            plano_aula_editado,
+            turma=turma,
+            componente=componente,
+            unidade_tematica=unidade_tematica,
+            objetivo_conhecimento=objetivo_conhecimento,
+            data_aula=current_month,
+        )
     
     # Exibindo o botão para download do arquivo de texto
     st.download_button("Baixar Plano de Aula em Texto", plano_aula_editado, file_name="plano_aula.txt")
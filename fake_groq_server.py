@@ -0,0 +1,216 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Resposta usada pelo servidor falso: um plano no mesmo formato pedido por prompt_aula
+SAMPLE_PLAN = """# Plano de Aula de Língua Portuguesa para Leitura
+
+## Informações Gerais 📋
+- **Duração Total:** 40 minutos
+- **Componente Curricular:** Língua Portuguesa
+- **Unidade Temática:** Leitura
+
+## Objetivo Geral 🎯
+Ampliar a compreensão leitora a partir de listas e textos conhecidos pela turma.
+
+## Etapas da Aula ⏱️
+
+### 1. Abertura e Sensibilização (10 minutos)
+- **Atividade:** Leitura compartilhada de uma parlenda conhecida.
+- **Objetivo:** Ativar o repertório oral da turma.
+- **Estratégias por Nível:**
+<div style="background-color:#f0f8ff; padding:15px; border-radius:10px;">
+<h3 style="color:#2a9d8f;">💡 Estratégias Diferenciadas:</h3>
+<ul style="font-size:16px; color:#264653;">
+    <li><strong>Pré-silábicos:</strong> Apontar as palavras enquanto recitam.</li>
+    <li><strong>Silábicos com valor sonoro:</strong> Localizar palavras que começam igual.</li>
+</ul>
+</div>
+
+## Materiais Necessários 📚
+- Cartazes com a parlenda
+- Letras móveis
+"""
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """Responde a /openai/v1/chat/completions como a API Groq, com streaming SSE."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Silencia o log de acesso padrão do http.server
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        config = self.server.config
+        with self.server.lock:
+            self.server.requests += 1
+        if random.random() < config["error_rate"]:
+            with self.server.lock:
+                self.server.errors += 1
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                            headers={"retry-after": "0"})
+            return
+
+        tokens = self._response_tokens(body.get("max_tokens"))
+        if body.get("stream"):
+            self._stream(body.get("model", ""), tokens)
+        else:
+            time.sleep(config["ttft"] + len(tokens) / config["tokens_per_second"])
+            self._send_json(200, self._completion(body.get("model", ""), "".join(tokens)))
+
+    def _response_tokens(self, max_tokens) -> list:
+        # Aproxima tokens por palavras (mantendo espaços e quebras de linha)
+        words = self.server.config["response"].split(" ")
+        tokens = [word + " " for word in words[:-1]] + words[-1:]
+        repeat = self.server.config["response_tokens"]
+        tokens = (tokens * (repeat // len(tokens) + 1))[:repeat]
+        return tokens[:max_tokens] if max_tokens else tokens
+
+    def _send_json(self, status: int, payload: dict, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, model: str, tokens: list):
+        config = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        interval = 1 / config["tokens_per_second"]
+        time.sleep(config["ttft"])
+        next_token_at = time.monotonic()
+        for token in tokens:
+            delay = next_token_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_token_at += interval
+            self._write_chunk(self._event(completion_id, created, model, {"content": token}, None))
+        self._write_chunk(self._event(completion_id, created, model, {}, "stop"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    @staticmethod
+    def _event(completion_id, created, model, delta, finish_reason) -> bytes:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+    @staticmethod
+    def _completion(model: str, content: str) -> dict:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+        }
+
+
+class FakeGroqServer:
+    """
+    Servidor local que imita a API de chat da Groq, para benchmarks sem rede.
+
+    Parâmetros configuráveis: tempo até o primeiro token (ttft, em segundos), tokens por
+    segundo, taxa de erros 429 e tamanho da resposta em tokens.
+    """
+
+    def __init__(self, ttft: float = 0.2, tokens_per_second: float = 500, error_rate: float = 0.0,
+                 response_tokens: int = 400, response: str = SAMPLE_PLAN, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), FakeGroqHandler)
+        self._server.daemon_threads = True
+        self._server.lock = threading.Lock()
+        self._server.requests = 0
+        self._server.errors = 0
+        self._server.config = {
+            "ttft": ttft,
+            "tokens_per_second": tokens_per_second,
+            "error_rate": error_rate,
+            "response_tokens": response_tokens,
+            "response": response,
+        }
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """URL a ser usada como base_url (ou GROQ_BASE_URL) do cliente Groq."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> dict:
+        return {"requests": self._server.requests, "errors": self._server.errors}
+
+    def serve_forever(self):
+        """Atende requisições na thread atual até stop() ser chamado."""
+        self._server.serve_forever()
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API de chat da Groq.")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Segundos até o primeiro token.")
+    parser.add_argument("--tokens-por-segundo", type=float, default=500)
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração das requisições respondidas com 429.")
+    parser.add_argument("--tokens", type=int, default=400, help="Tokens por resposta.")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(args.ttft, args.tokens_por_segundo, args.taxa_erro, args.tokens, port=args.porta)
+    print(f"✅ Servidor falso da Groq em {server.base_url} (use GROQ_BASE_URL={server.base_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import re
+from markdown_stream import format_markdown
+
+# Numeração ou marcador que a IA às vezes coloca no início de cada dica
+_TIP_MARKER = re.compile(r"^(?:[-*+•]|\d{1,2}[.)])\s+")
+
+def format_tips_as_html(tips: str) -> str:
+    """
+    Formata as dicas como uma lista ordenada (HTML), onde cada dica é um item numerado.
+    
+    Parâmetros:
+    tips (str): Dicas em formato de string. Cada dica pode ser separada por uma quebra de linha.
+    
+    Retorna:
+    str: Dicas formatadas como lista HTML.
+    """
+    # Divida as dicas por linha e remova linhas vazias ou espaços extras
+    dicas = [_TIP_MARKER.sub("", dica.strip()) for dica in tips.split("\n") if dica.strip()]
+    
+    # Inicia a lista HTML
+    formatted_tips = "<ol>"  # Usando <ol> para uma lista numerada
+    
+    # Adiciona cada dica como um item de lista <li>
+    for dica in dicas:
+        formatted_tips += f"<li>{dica}</li>"
+    
+    # Fecha a lista HTML
+    formatted_tips += "</ol>"
+    
+    return formatted_tips
+
+def format_lesson_plan(plan: str) -> str:
+    """
+    Formata o plano de aula em Markdown com seções e listas bem definidas.
+
+    Mantém títulos, listas e os blocos HTML de estratégias; para formatar durante o
+    streaming, use markdown_stream.StreamingMarkdownFormatter.
+    """
+    return format_markdown(plan)
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+import urllib.parse
+import httpx
+from groq import AsyncGroq
+from api_requests import load_api_key
+from metrics import record_llm_call, registry
+from singleflight import AsyncSingleFlight
+from text_utils import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Mesmos modelos e parâmetros dos endpoints de api_anvil
+PROMPT_MODEL = "llama-3.2-90b-text-preview"
+HELLO_MODEL = "llama-3.2-3b-preview"
+TEMPERATURE = 1
+MAX_TOKENS = 1024
+# Gerações simultâneas permitidas por cliente (cabeçalho X-Client-Id ou IP) e no processo
+MAX_CONCURRENT_PER_CLIENT = 4
+MAX_IN_FLIGHT = 256
+MAX_BODY_BYTES = 1 * 2**20
+# Segundos de espera pela próxima requisição numa conexão keep-alive
+IDLE_TIMEOUT = 30.0
+POOL_SIZE = 100
+# Rotas que geram respostas e contam para os limites de concorrência
+LIMITED_PATHS = {"/prompt", "/hello"}
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 502: "Bad Gateway",
+           503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        url = urllib.parse.urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(urllib.parse.parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+    def wants_stream(self) -> bool:
+        """Streaming sob demanda: ?stream=1 ou Accept: text/event-stream."""
+        return (self.query.get("stream", "").lower() in ("1", "true", "sim")
+                or "text/event-stream" in self.headers.get("accept", ""))
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body or b"{}")
+        except (ValueError, RecursionError):
+            # ValueError cobre JSONDecodeError e UnicodeDecodeError; RecursionError, aninhamento excessivo
+            raise HttpError(400, "Corpo da requisição não é um JSON válido")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Corpo da requisição deve ser um objeto JSON")
+        return data
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Lê uma requisição HTTP/1.1; retorna None se o cliente fechou a conexão."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Linha de requisição inválida")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Content-Length inválido")
+    if length < 0:
+        raise HttpError(400, "Content-Length inválido")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Corpo da requisição muito grande")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+class ResponseWriter:
+    """Escreve respostas completas ou em partes (Transfer-Encoding: chunked)."""
+
+    def __init__(self, writer: asyncio.StreamWriter, keep_alive: bool):
+        self._writer = writer
+        self.keep_alive = keep_alive
+        self.started = False
+
+    def _head(self, status: int, content_type: str, headers: dict) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                 f"Connection: {'keep-alive' if self.keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send(self, status: int, body, content_type: str = "application/json; charset=utf-8",
+                   headers: dict = None):
+        if not isinstance(body, bytes):
+            body = (body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)).encode("utf-8")
+        headers = dict(headers or {}, **{"Content-Length": len(body)})
+        self.started = True
+        self._writer.write(self._head(status, content_type, headers) + body)
+        await self._writer.drain()
+
+    async def start_stream(self, content_type: str):
+        self.started = True
+        headers = {"Transfer-Encoding": "chunked", "Cache-Control": "no-cache"}
+        self._writer.write(self._head(200, content_type, headers))
+        await self._writer.drain()
+
+    async def write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self._writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        await self._writer.drain()
+
+    async def end_stream(self):
+        self._writer.write(b"0\r\n\r\n")
+        await self._writer.drain()
+
+
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class Gateway:
+    """
+    Gateway HTTP assíncrono com os contratos de api_anvil (/prompt e /hello).
+
+    Cada geração é uma corrotina aguardando a API Groq (AsyncGroq), então um processo
+    atende muitas gerações ao mesmo tempo. Clientes acima de MAX_CONCURRENT_PER_CLIENT
+    gerações simultâneas recebem 429; acima de MAX_IN_FLIGHT no processo, 503. Pedidos
+    idênticos (modelo e prompt) em andamento compartilham a mesma chamada à API.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, client: AsyncGroq = None,
+                 max_per_client: int = MAX_CONCURRENT_PER_CLIENT, max_in_flight: int = MAX_IN_FLIGHT):
+        self.client = client or AsyncGroq(
+            api_key=api_key or load_api_key(),
+            base_url=base_url,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
+        self.max_per_client = max_per_client
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._per_client = {}
+        self.flights = AsyncSingleFlight("gateway")
+        self.routes = {
+            ("POST", "/prompt"): self.prompt,
+            ("GET", "/hello"): self.hello,
+            ("GET", "/metrics"): self.metrics,
+        }
+
+    async def generate(self, model: str, prompt: str):
+        """
+        Gera a resposta em partes, à medida que a API Groq as envia.
+
+        Lê os eventos SSE da resposta bruta e extrai só o texto de cada parte: montar o
+        objeto tipado do SDK para cada chunk custa mais CPU do que todo o resto do gateway.
+        """
+        async with self.client.chat.completions.with_streaming_response.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            top_p=1,
+            stream=True,
+            stop=None,
+        ) as response:
+            async for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"].get("message", "Erro na API Groq"))
+                choices = chunk.get("choices")
+                part = choices[0].get("delta", {}).get("content") if choices else None
+                if part:
+                    yield part
+
+    async def _collect(self, model: str, prompt: str) -> str:
+        return "".join([part async for part in self._observed(model, prompt)])
+
+    async def _observed(self, model: str, prompt: str):
+        # Mesmas métricas de stream_api (latência, primeiro token, tamanhos)
+        start = time.perf_counter()
+        ttft = None
+        completion_chars = 0
+        try:
+            flight = self.flights.join_stream((model, prompt, TEMPERATURE, MAX_TOKENS),
+                                              lambda: self.generate(model, prompt))
+            async for part in flight.subscribe():
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                completion_chars += len(part)
+                yield part
+        except Exception:
+            registry.counter("gateway_errors_total", model=model).inc()
+            raise
+        record_llm_call("gateway", time.perf_counter() - start, ttft, len(prompt), completion_chars,
+                        completion_chars // CHARS_PER_TOKEN)
+
+    def _acquire(self, client_id: str):
+        if self.in_flight >= self.max_in_flight:
+            registry.counter("gateway_rejected_total", reason="processo").inc()
+            raise HttpError(503, "Gateway sobrecarregado, tente novamente", {"Retry-After": "1"})
+        if self._per_client.get(client_id, 0) >= self.max_per_client:
+            registry.counter("gateway_rejected_total", reason="cliente").inc()
+            raise HttpError(429, "Muitas gerações simultâneas para este cliente", {"Retry-After": "1"})
+        self.in_flight += 1
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+
+    def _release(self, client_id: str):
+        self.in_flight -= 1
+        remaining = self._per_client[client_id] - 1
+        if remaining:
+            self._per_client[client_id] = remaining
+        else:
+            del self._per_client[client_id]
+
+    async def prompt(self, request: Request, response: ResponseWriter):
+        """POST /prompt {"prompt": ...} → {"status": "success", "received_text": ...}."""
+        prompt = request.json().get("prompt")
+        if prompt is None:
+            await response.send(200, {"status": "error", "message": "Parâmetro 'text' não encontrado"})
+            return
+        if not isinstance(prompt, str):
+            raise HttpError(400, "Parâmetro 'prompt' deve ser um texto")
+        if not request.wants_stream():
+            text = await self._collect(PROMPT_MODEL, prompt)
+            await response.send(200, {"status": "success", "received_text": text})
+            return
+
+        await response.start_stream("text/event-stream; charset=utf-8")
+        parts = []
+        try:
+            async for part in self._observed(PROMPT_MODEL, prompt):
+                parts.append(part)
+                await response.write_chunk(sse_event({"delta": part}))
+            await response.write_chunk(sse_event({"status": "success", "received_text": "".join(parts)}, "done"))
+        except ConnectionError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro durante a geração em streaming: {e}")
+            await response.write_chunk(sse_event({"status": "error", "message": str(e)}, "error"))
+        await response.end_stream()
+
+    async def hello(self, request: Request, response: ResponseWriter):
+        """GET /hello?prompt=... → texto da resposta (em partes, com ?stream=1)."""
+        prompt = request.query.get("prompt", "")
+        if not request.wants_stream():
+            await response.send(200, await self._collect(HELLO_MODEL, prompt), "text/plain; charset=utf-8")
+            return
+        await response.start_stream("text/plain; charset=utf-8")
+        try:
+            async for part in self._observed(HELLO_MODEL, prompt):
+                await response.write_chunk(part)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro durante a geração em streaming: {e}")
+            await response.write_chunk(f"\n[erro: {e}]")
+        await response.end_stream()
+
+    async def metrics(self, request: Request, response: ResponseWriter):
+        """GET /metrics → métricas do processo no formato do Prometheus."""
+        await response.send(200, registry.to_prometheus(), "text/plain; version=0.0.4")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HttpError as e:
+                    await ResponseWriter(writer, keep_alive=False).send(e.status, {"status": "error", "message": e.message})
+                    return
+                if request is None:
+                    return
+                response = ResponseWriter(writer, request.keep_alive)
+                await self.dispatch(request, response, request.headers.get("x-client-id") or (peer[0] if peer else "?"))
+                if not response.keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request, response: ResponseWriter, client_id: str):
+        handler = self.routes.get((request.method, request.path))
+        try:
+            if handler is None:
+                known_path = any(path == request.path for _, path in self.routes)
+                raise HttpError(405 if known_path else 404, "Rota não encontrada")
+            if request.path not in LIMITED_PATHS:
+                await handler(request, response)
+                return
+            self._acquire(client_id)
+            try:
+                await handler(request, response)
+            finally:
+                self._release(client_id)
+        except HttpError as e:
+            await response.send(e.status, {"status": "error", "message": e.message}, headers=e.headers)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao atender {request.method} {request.path}: {e}")
+            if not response.started:
+                await response.send(502, {"status": "error", "message": str(e)})
+            else:
+                # Resposta já começou e não pode ser concluída: fecha a conexão para o
+                # cliente não ficar esperando o fim do corpo
+                response.keep_alive = False
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+    async def close(self):
+        await self.client.close()
+
+
+async def serve(host: str, port: int, **gateway_options):
+    gateway = Gateway(**gateway_options)
+    server = await gateway.start(host, port)
+    logger.info(f"Gateway ouvindo em http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await gateway.close()
+
+
+def main():
+    # force=True: api_requests já configura o log raiz em DEBUG ao ser importado, o que
+    # registraria cada evento do httpcore
+    logging.basicConfig(level=logging.INFO, force=True)
+    parser = argparse.ArgumentParser(description="Gateway HTTP assíncrono para /prompt e /hello.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--por-cliente", type=int, default=MAX_CONCURRENT_PER_CLIENT,
+                        help="Gerações simultâneas permitidas por cliente.")
+    parser.add_argument("--maximo", type=int, default=MAX_IN_FLIGHT, help="Gerações simultâneas no processo.")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.porta, max_per_client=args.por_cliente, max_in_flight=args.maximo))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from api_requests import IncompleteResponseError, call_api
+from prompt_aula import COMPONENTES, OBJETIVOS_POR_UNIDADE, generate_prompt_for_activity
+from metrics import registry, summarize_latencies
+from data_loader import load_class_data
+from hypothesis_cube import HypothesisCube
+from change_detection import ChangeDetector
+
+logger = logging.getLogger(__name__)
+
+MODEL = "llama3-8b-8192"
+
+
+def job_id_for(job: dict) -> str:
+    """
+    Identificador estável de um job, derivado dos campos que definem o plano.
+
+    Inclui a mistura de hipóteses da turma: quando os dados da turma mudam, o job muda de id
+    e é executado de novo, mesmo com o arquivo de resultados de uma execução anterior.
+    """
+    # str(): os campos vêm de JSON Lines escritos à mão e podem ser números ou null
+    fields = [job.get(key) for key in ("turma", "componente", "unidade_tematica", "objetivo_conhecimento", "data", "perfis_turma")]
+    fields = ["" if value is None else str(value) for value in fields]
+    return hashlib.sha1("|".join(fields).encode("utf-8")).hexdigest()[:12]
+
+
+def read_jobs(path: str) -> list:
+    """Lê a lista de jobs (JSON Lines); jobs sem job_id recebem um identificador estável."""
+    jobs = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                job = json.loads(line)
+                job.setdefault("job_id", job_id_for(job))
+                jobs.append(job)
+    return jobs
+
+
+def completed_job_ids(output_path: str) -> set:
+    """Retorna os jobs já concluídos com sucesso no arquivo de resultados (para retomar)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha truncada por uma interrupção: o job será refeito
+                continue
+            if result.get("status") == "ok":
+                done.add(result["job_id"])
+    return done
+
+
+def build_jobs(data_path: str = "dados.csv", data: str = "", classes: set = None) -> list:
+    """
+    Gera um job para cada turma × componente × unidade temática × objetivo.
+
+    Com `classes`, gera apenas os jobs dessas turmas (ex.: as que tiveram sondagens alteradas).
+    """
+    cube = HypothesisCube.from_frame(load_class_data(data_path))
+    jobs = []
+    for turma in cube.classes():
+        if classes is not None and turma not in classes:
+            continue
+        perfis_turma = ", ".join(f"{hypothesis}: {count} alunos" for hypothesis, count in cube.counts(turma).items())
+        for componente in COMPONENTES:
+            for unidade_tematica, objetivos in OBJETIVOS_POR_UNIDADE.items():
+                for objetivo in objetivos:
+                    job = {
+                        "turma": turma,
+                        "componente": componente,
+                        "unidade_tematica": unidade_tematica,
+                        "objetivo_conhecimento": objetivo,
+                        "data": data,
+                        "perfis_turma": perfis_turma,
+                    }
+                    job["job_id"] = job_id_for(job)
+                    jobs.append(job)
+    return jobs
+
+
+def run_job(job: dict, use_cache: bool = True) -> dict:
+    """Gera o plano de aula de um job e retorna o registro de resultado."""
+    start = time.perf_counter()
+    prompt = generate_prompt_for_activity(
+        job["componente"],
+        job["unidade_tematica"],
+        job["objetivo_conhecimento"],
+        job.get("data", ""),
+        job.get("perfis_turma", ""),
+    )
+    # Respostas interrompidas ou substituídas pelo plano genérico não contam como concluídas
+    # (ficam como erro e são refeitas na próxima execução)
+    error = None
+    try:
+        plano = call_api(prompt, model=MODEL, use_cache=use_cache, strict=True)
+    except IncompleteResponseError as e:
+        plano, error = "", str(e)
+    latency = time.perf_counter() - start
+
+    status = "erro" if error else "ok"
+    result = {
+        "job_id": job["job_id"],
+        "status": status,
+        "turma": job.get("turma", ""),
+        "componente": job["componente"],
+        "unidade_tematica": job["unidade_tematica"],
+        "objetivo_conhecimento": job["objetivo_conhecimento"],
+        "plano": plano,
+        "latencia_s": round(latency, 3),
+        "concluido_em": datetime.datetime.now().isoformat(),
+    }
+    if error:
+        result["erro"] = error
+    return result
+
+
+def run_batch(jobs: list, output_path: str, concurrency: int = 4, use_cache: bool = True) -> dict:
+    """
+    Executa os jobs com no máximo `concurrency` chamadas simultâneas.
+
+    Cada resultado é acrescentado ao arquivo JSON Lines assim que fica pronto; jobs já
+    concluídos com sucesso em execuções anteriores são pulados.
+    """
+    done = completed_job_ids(output_path)
+    pending = [job for job in jobs if job["job_id"] not in done]
+    logger.info(f"{len(jobs)} jobs, {len(done)} já concluídos, {len(pending)} a executar.")
+
+    write_lock = threading.Lock()
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(run_job, job, use_cache): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Erro no job {job['job_id']}: {e}")
+                result = {"job_id": job["job_id"], "status": "erro", "erro": str(e),
+                          "concluido_em": datetime.datetime.now().isoformat()}
+            if result["status"] == "ok":
+                latencies.append(result["latencia_s"])
+            else:
+                failures += 1
+            with write_lock:
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+                os.fsync(output.fileno())
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "skipped": len(done),
+        "completed": len(latencies),
+        "failed": failures,
+        "elapsed_s": elapsed,
+        "plans_per_minute": len(latencies) / elapsed * 60 if elapsed > 0 else 0.0,
+    }
+    report.update(summarize_latencies(latencies))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geração de planos de aula em lote.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    jobs_parser = subparsers.add_parser("jobs", help="Cria a lista de jobs com todas as combinações das turmas.")
+    jobs_parser.add_argument("saida", help="Arquivo JSON Lines onde gravar os jobs.")
+    jobs_parser.add_argument("--dados", default="dados.csv", help="CSV de sondagens.")
+    jobs_parser.add_argument("--data", default="", help="Data a constar nos planos (ex.: 'março de 2025').")
+    jobs_parser.add_argument("--alteradas", action="store_true",
+                             help="Só as turmas com sondagens (turma × mês) novas ou alteradas desde o último uso desta opção.")
+
+    run_parser = subparsers.add_parser("executar", help="Executa uma lista de jobs.")
+    run_parser.add_argument("jobs", help="Arquivo JSON Lines com os jobs.")
+    run_parser.add_argument("resultados", help="Arquivo JSON Lines (somente acréscimo) com os resultados.")
+    run_parser.add_argument("--concorrencia", type=int, default=4, help="Máximo de chamadas simultâneas à API.")
+    run_parser.add_argument("--sem-cache", action="store_true", help="Ignora o cache e gera planos novos.")
+    run_parser.add_argument("--metricas", help="Arquivo JSON Lines onde acrescentar as métricas da execução.")
+    args = parser.parse_args()
+    # force=True: api_requests já configura o log raiz em DEBUG ao ser importado
+    logging.basicConfig(level=logging.INFO, force=True)
+
+    if args.comando == "jobs":
+        classes, changes = None, None
+        if args.alteradas:
+            detector = ChangeDetector("planos_lote")
+            changes = detector.detect(load_class_data(args.dados))
+            classes = changes.dirty_classes()
+            summary = changes.summary()
+            print(f"🔍 Partições (turma × mês): {summary['recomputed']} alteradas, {summary['skipped']} inalteradas.")
+        jobs = build_jobs(args.dados, args.data, classes)
+        with open(args.saida, "w", encoding="utf-8") as file:
+            for job in jobs:
+                file.write(json.dumps(job, ensure_ascii=False) + "\n")
+        if changes is not None:
+            # Os jobs gravados cobrem as alterações; a execução pode ser retomada a partir deles
+            detector.commit(changes)
+        print(f"✅ {len(jobs)} jobs gravados em {args.saida}")
+        return
+
+    report = run_batch(read_jobs(args.jobs), args.resultados, args.concorrencia, use_cache=not args.sem_cache)
+    print(
+        f"✅ {report['completed']} planos gerados, {report['failed']} falhas, {report['skipped']} pulados "
+        f"(já concluídos)."
+    )
+    print(
+        f"Vazão: {report['plans_per_minute']:.1f} planos/minuto | "
+        f"Latência p50: {report['p50_s']:.2f} s | p95: {report['p95_s']:.2f} s"
+    )
+    if args.metricas:
+        registry.export_jsonl(args.metricas)
+        print(f"✅ Métricas gravadas em {args.metricas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import threading
+
+import httpx
+from groq import Groq
+
+logger = logging.getLogger(__name__)
+
+# Configuração padrão do pool de conexões HTTP com a API Groq
+POOL_SIZE = 20  # Máximo de conexões simultâneas por cliente
+KEEPALIVE_CONNECTIONS = 10  # Conexões mantidas abertas entre requisições
+KEEPALIVE_EXPIRY = 60.0  # Segundos que uma conexão ociosa permanece aberta
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 60.0  # Tempo máximo entre dois chunks do streaming
+
+
+class ConnectionMetrics:
+    """Contadores de reutilização de conexões, alimentados pelos eventos de trace do httpcore."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def trace(self, event_name: str, info: dict):
+        """Callback de trace do httpcore, chamado em cada etapa da requisição."""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+        elif event_name.endswith("send_request_headers.started"):
+            with self._lock:
+                self.requests += 1
+
+    def attach(self, request: httpx.Request):
+        """Hook de requisição do httpx que ativa o trace nesta requisição."""
+        request.extensions["trace"] = self.trace
+
+    def snapshot(self) -> dict:
+        """Retorna os contadores atuais e a taxa de reutilização de conexões."""
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+connection_metrics = ConnectionMetrics()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_groq_client(api_key: str, pool_size: int = POOL_SIZE,
+                    keepalive_connections: int = KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry: float = KEEPALIVE_EXPIRY,
+                    connect_timeout: float = CONNECT_TIMEOUT,
+                    read_timeout: float = READ_TIMEOUT) -> Groq:
+    """
+    Retorna o cliente Groq compartilhado para a chave e a configuração informadas.
+
+    O cliente é criado uma única vez por processo e reutilizado por todas as sessões do
+    Streamlit, preservando as conexões keep-alive e as sessões TLS entre chamadas.
+    """
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    registry_key = (key_hash, pool_size, keepalive_connections, keepalive_expiry,
+                    connect_timeout, read_timeout)
+
+    client = _clients.get(registry_key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(registry_key)
+        if client is None:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                event_hooks={"request": [connection_metrics.attach]},
+            )
+            # As novas tentativas ficam a cargo de rate_limiter.call_with_retry
+            client = Groq(api_key=api_key, http_client=http_client, max_retries=0)
+            _clients[registry_key] = client
+            logger.info(f"Novo cliente Groq criado (pool de {pool_size} conexões).")
+    return client
+
+
+def close_groq_clients():
+    """Fecha todos os clientes do registro e suas conexões abertas."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,21 @@
+# Escala das hipóteses de escrita, da menos para a mais avançada
+HYPOTHESIS_ORDER = [
+    'Pré-silábica',
+    'Silábica s/ valor',
+    'Silábica c/ valor',
+    'Silábico-alfabética',
+    'Alfabética',
+]
+
+# Código inteiro de cada hipótese na escala (0 = Pré-silábica)
+HYPOTHESIS_CODES = {name: code for code, name in enumerate(HYPOTHESIS_ORDER)}
+
+# Cor de cada hipótese no gráfico e na tabela de alunos
+HYPOTHESIS_COLORS = {
+    'Alfabética': '#86E085',
+    'Silábico-alfabética': '#C8FFBB',
+    'Silábica c/ valor': '#FFF6A1',
+    'Silábica s/ valor': '#FFC9A3',
+    'Pré-silábica': '#FFA9B8',
+}
+DEFAULT_COLOR = '#FFFFFF'
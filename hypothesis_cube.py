@@ -0,0 +1,193 @@
+import logging
+import threading
+import pandas as pd
+from change_detection import ChangeSet, partition_fingerprints
+from hypotheses import HYPOTHESIS_CODES
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de versões dos dados mantidas em memória
+MAX_CACHED_VERSIONS = 4
+# Acima desta fração de partições alteradas, reconstruir o cubo sai mais barato que atualizá-lo
+MAX_DIRTY_SHARE = 0.5
+
+
+def _scale_order(hypothesis: str) -> int:
+    return HYPOTHESIS_CODES.get(hypothesis, len(HYPOTHESIS_CODES))
+
+
+class HypothesisCube:
+    """
+    Contagens materializadas turma × mês × hipótese.
+
+    Além das células, mantém os totais por (turma, mês), por turma, por mês e gerais, de
+    modo que qualquer consulta do painel é uma busca em dicionário, sem varrer os dados.
+    """
+
+    def __init__(self):
+        self._by_class_month = {}
+        self._by_class = {}
+        self._by_month = {}
+        self._overall = {}
+        self._class_months = {}
+        self.rows = 0
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> "HypothesisCube":
+        """Constrói o cubo a partir de um DataFrame no formato de dados.csv."""
+        cube = cls()
+        cube.append(data)
+        return cube
+
+    @classmethod
+    def from_counts(cls, counts: pd.Series) -> "HypothesisCube":
+        """Constrói o cubo a partir de contagens já agrupadas (índice turma, mês, hipótese)."""
+        cube = cls()
+        cube._add_counts(counts, sign=1)
+        return cube
+
+    def append(self, rows: pd.DataFrame):
+        """Soma ao cubo as contagens de novas linhas de sondagem (atualização incremental)."""
+        counts = rows.groupby(['class_name', 'month', 'hypothesis_name'], observed=True).size()
+        self._add_counts(counts, sign=1)
+
+    def remove(self, rows: pd.DataFrame):
+        """Subtrai do cubo as contagens de linhas que deixaram de existir."""
+        counts = rows.groupby(['class_name', 'month', 'hypothesis_name'], observed=True).size()
+        self._add_counts(counts, sign=-1)
+
+    def copy(self) -> "HypothesisCube":
+        cube = HypothesisCube()
+        for name in ("_by_class_month", "_by_class", "_by_month", "_overall"):
+            setattr(cube, name, {key: dict(cell) for key, cell in getattr(self, name).items()})
+        cube._class_months = {class_name: set(months) for class_name, months in self._class_months.items()}
+        cube.rows = self.rows
+        return cube
+
+    def replace_partitions(self, partitions, rows: pd.DataFrame):
+        """
+        Substitui as contagens das partições (turma, mês) informadas pelas das linhas novas.
+
+        `rows` deve conter todas as linhas atuais dessas partições (e nenhuma outra); partições
+        sem linhas são removidas do cubo.
+        """
+        old = {
+            (class_name, month, hypothesis): count
+            for class_name, month in partitions
+            for hypothesis, count in self._by_class_month.get((class_name, int(month)), {}).items()
+        }
+        self._add_counts(pd.Series(old, dtype="int64"), sign=-1)
+        self.append(rows)
+
+    def apply_changes(self, data: pd.DataFrame, changes: ChangeSet):
+        """Atualiza o cubo apenas nas partições novas, alteradas ou removidas de `data`."""
+        self.replace_partitions(changes.dirty, changes.dirty_rows(data))
+
+    def _add_counts(self, counts: pd.Series, sign: int):
+        for (class_name, month, hypothesis), count in counts.items():
+            if count == 0:
+                continue
+            delta = sign * int(count)
+            month = int(month)
+            for marginal, key in (
+                (self._by_class_month, (class_name, month)),
+                (self._by_class, class_name),
+                (self._by_month, month),
+                (self._overall, None),
+            ):
+                cell = marginal.setdefault(key, {})
+                cell[hypothesis] = cell.get(hypothesis, 0) + delta
+                if cell[hypothesis] <= 0:
+                    del cell[hypothesis]
+                    if not cell:
+                        del marginal[key]
+            if (class_name, month) in self._by_class_month:
+                self._class_months.setdefault(class_name, set()).add(month)
+            elif class_name in self._class_months:
+                self._class_months[class_name].discard(month)
+                if not self._class_months[class_name]:
+                    del self._class_months[class_name]
+            self.rows += delta
+
+    def counts(self, class_name=None, month=None) -> dict:
+        """
+        Retorna {hipótese: quantidade} para a turma e/ou o mês informados, na ordem da escala.
+
+        Sem filtros, retorna as contagens gerais.
+        """
+        if class_name is not None and month is not None:
+            cell = self._by_class_month.get((class_name, int(month)), {})
+        elif class_name is not None:
+            cell = self._by_class.get(class_name, {})
+        elif month is not None:
+            cell = self._by_month.get(int(month), {})
+        else:
+            cell = self._overall.get(None, {})
+        return {hypothesis: cell[hypothesis] for hypothesis in sorted(cell, key=_scale_order)}
+
+    def distribution(self, class_name=None, month=None) -> dict:
+        """Retorna {hipótese: percentual} para a turma e/ou o mês informados."""
+        counts = self.counts(class_name, month)
+        total = sum(counts.values())
+        return {hypothesis: count / total * 100 for hypothesis, count in counts.items()} if total else {}
+
+    def classes(self) -> list:
+        """Lista as turmas presentes no cubo."""
+        return sorted(self._by_class)
+
+    def months(self, class_name=None) -> list:
+        """Lista os meses de sondagem (de uma turma, se informada) em ordem crescente."""
+        if class_name is None:
+            return sorted(self._by_month)
+        return sorted(self._class_months.get(class_name, ()))
+
+
+# versão -> cubo; as impressões digitais das partições ficam em _fingerprints
+_cubes = {}
+_fingerprints = {}
+_cubes_lock = threading.Lock()
+
+
+def _build_cube(data: pd.DataFrame, version: str) -> HypothesisCube:
+    fingerprints = partition_fingerprints(data)
+    previous = next(reversed(_cubes), None)
+    if previous is not None:
+        changes = ChangeSet(_fingerprints[previous], fingerprints)
+        if len(changes.dirty) <= MAX_DIRTY_SHARE * max(len(fingerprints), 1):
+            # Nova versão derivada da anterior: só as partições alteradas são recontadas
+            cube = _cubes[previous].copy()
+            cube.apply_changes(data, changes)
+            summary = changes.summary()
+            logger.info(
+                f"Cubo de hipóteses atualizado para a versão {version}: {summary['recomputed']} partições "
+                f"recalculadas, {summary['skipped']} reaproveitadas."
+            )
+            _fingerprints[version] = fingerprints
+            return cube
+    cube = HypothesisCube.from_frame(data)
+    logger.info(f"Cubo de hipóteses construído para a versão {version} ({cube.rows} linhas).")
+    _fingerprints[version] = fingerprints
+    return cube
+
+
+def get_cube(data: pd.DataFrame, version: str) -> HypothesisCube:
+    """
+    Retorna o cubo da versão informada dos dados, construindo-o uma única vez por versão.
+
+    Se houver um cubo de uma versão anterior em memória, o novo é derivado dele recontando só
+    as partições (turma, mês) alteradas. O cubo é compartilhado entre as sessões do Streamlit
+    e não deve ser alterado pelos chamadores.
+    """
+    cube = _cubes.get(version)
+    if cube is not None:
+        return cube
+    with _cubes_lock:
+        cube = _cubes.get(version)
+        if cube is None:
+            cube = _build_cube(data, version)
+            _cubes[version] = cube
+            while len(_cubes) > MAX_CACHED_VERSIONS:
+                oldest = next(iter(_cubes))
+                del _cubes[oldest]
+                _fingerprints.pop(oldest, None)
+    return cube
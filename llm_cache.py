@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuração padrão do cache de respostas da LLM
+CACHE_PATH = os.path.join(".cache", "llm_responses.sqlite3")
+MAX_ENTRIES = 500  # Limite de respostas armazenadas (LRU)
+TTL_SECONDS = 7 * 24 * 60 * 60  # Cada resposta vale por uma semana
+
+
+def make_cache_key(model: str, system_message: str, prompt: str,
+                   temperature: float, max_tokens: int, top_p: float) -> str:
+    """
+    Gera a chave do cache a partir do conteúdo da requisição.
+
+    Duas chamadas com os mesmos parâmetros geram a mesma chave, independentemente
+    da sessão do Streamlit que as originou.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "system": system_message,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Cache persistente (SQLite) das respostas da LLM, com despejo LRU e TTL por entrada."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES,
+                 ttl_seconds: float = TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                conteudo TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                expira_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (ultimo_acesso)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna a resposta armazenada para a chave ou None em caso de miss/expiração."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT conteudo, expira_em FROM respostas WHERE chave = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            content, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM respostas WHERE chave = ?", (key,))
+                self._conn.commit()
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return content
+
+    def set(self, key: str, content: str, ttl_seconds: Optional[float] = None):
+        """Armazena uma resposta e despeja as entradas menos usadas se o limite for excedido."""
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO respostas (chave, conteudo, criado_em, expira_em, ultimo_acesso)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, content, now, now + ttl, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Remove entradas expiradas e, em seguida, as menos acessadas além do limite."""
+        cursor = self._conn.execute("DELETE FROM respostas WHERE expira_em <= ?", (time.time(),))
+        self.expirations += max(cursor.rowcount, 0)
+
+        (total,) = self._conn.execute("SELECT COUNT(*) FROM respostas").fetchone()
+        excess = total - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                """
+                DELETE FROM respostas WHERE chave IN (
+                    SELECT chave FROM respostas ORDER BY ultimo_acesso ASC LIMIT ?
+                )
+                """,
+                (excess,),
+            )
+            self.evictions += excess
+            logger.debug(f"Cache LLM: {excess} entradas despejadas (LRU).")
+
+    def clear(self):
+        """Remove todas as respostas armazenadas."""
+        with self._lock:
+            self._conn.execute("DELETE FROM respostas")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Retorna as estatísticas de uso do cache."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM respostas").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_response_cache(path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES,
+                             ttl_seconds: float = TTL_SECONDS) -> ResponseCache:
+    """Substitui o cache compartilhado por um com outro arquivo ou outros limites."""
+    global _cache
+    with _cache_lock:
+        _cache = ResponseCache(path, max_entries, ttl_seconds)
+    return _cache
+
+
+def get_response_cache() -> ResponseCache:
+    """Retorna a instância compartilhada do cache (uma por processo, comum a todas as sessões)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
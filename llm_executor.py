@@ -0,0 +1,67 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import SimpleQueue
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Chamadas à LLM executadas em paralelo por processo (compartilhado entre sessões)
+MAX_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Retorna o pool de threads compartilhado para as chamadas à LLM."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="llm")
+    return _executor
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """
+    Agenda uma chamada à LLM em segundo plano e retorna o Future correspondente.
+
+    A função agendada não deve chamar elementos de interface do Streamlit (st.write,
+    st.markdown...): o resultado deve ser exibido pela thread do script, via future.result().
+    """
+    logger.debug(f"Agendando chamada em segundo plano: {getattr(fn, '__name__', fn)}")
+    return get_executor().submit(fn, *args, **kwargs)
+
+
+# Marca o fim das partes em submit_stream
+_END = object()
+
+
+def submit_stream(parts: Iterable[str]) -> Iterator[str]:
+    """
+    Consome `parts` (ex.: stream_api) numa thread do pool e repassa cada parte à thread chamadora.
+
+    A chamada à LLM segue em segundo plano enquanto a thread do script formata e exibe as
+    partes já recebidas; erros da geração são levantados novamente no chamador, depois das
+    partes entregues.
+    """
+    queue = SimpleQueue()
+
+    def pump():
+        try:
+            for part in parts:
+                queue.put((part, None))
+        except BaseException as e:
+            queue.put((_END, e))
+        else:
+            queue.put((_END, None))
+
+    submit(pump)
+    while True:
+        part, error = queue.get()
+        if part is _END:
+            if error is not None:
+                raise error
+            return
+        yield part
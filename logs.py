@@ -1,84 +1,159 @@
+import atexit
+import gzip
+import json
 import logging
-from datetime import datetime
+import logging.handlers
 import os
+import queue
+import shutil
+import time
+from groq_client import get_groq_client
+from metrics import record_llm_call, registry
+from text_utils import CHARS_PER_TOKEN
+
+# Configuração dos arquivos de log (rotacionados e comprimidos com gzip)
+LOG_DIR = 'logs'
+LOG_FILE = os.path.join(LOG_DIR, 'activity_generation.log')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+LOG_MAX_BYTES = 10 * 2**20  # Rotaciona ao atingir 10 MB...
+LOG_ROTATION_WHEN = None  # ...ou por tempo, se definido (ex.: 'midnight')
+LOG_BACKUP_COUNT = 14  # Arquivos .gz mantidos
+
+
+def _gzip_namer(name):
+    return name + '.gz'
+
+
+def _gzip_rotator(source, dest):
+    """Comprime o arquivo rotacionado e remove o original."""
+    with open(source, 'rb') as file_in, gzip.open(dest, 'wb') as file_out:
+        shutil.copyfileobj(file_in, file_out)
+    os.remove(source)
+
+
+def build_file_handler(path=LOG_FILE, max_bytes=LOG_MAX_BYTES, when=LOG_ROTATION_WHEN,
+                       backup_count=LOG_BACKUP_COUNT):
+    """
+    Cria o handler de arquivo com rotação e compressão gzip dos arquivos antigos.
+
+    Com `when` definido, a rotação é por tempo (TimedRotatingFileHandler); caso contrário,
+    por tamanho (max_bytes).
+    """
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def start_async_logging(target_logger, handlers, stop_at_exit=True):
+    """
+    Liga o logger a uma fila: a thread que registra o evento só o enfileira, e uma thread
+    de fundo (QueueListener) repassa os registros aos handlers (disco, console).
+
+    Retorna o QueueListener; com stop_at_exit, ele é parado (e a fila esvaziada) na saída
+    do processo.
+    """
+    log_queue = queue.SimpleQueue()
+    target_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    target_logger.propagate = False
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    if stop_at_exit:
+        atexit.register(listener.stop)
+    return listener
+
 
 class ActivityLogger:
     """Classe para gerenciar logs das atividades e requisições da API."""
     
     def __init__(self):
-        # Criar diretório de logs se não existir
-        log_dir = 'logs'
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
-        # Nome do arquivo de log com data
-        log_file = f'logs/activity_generation_{datetime.now().strftime("%Y%m%d")}.log'
-        
-        # Configuração básica do logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()  # Para mostrar logs no console também
-            ]
-        )
-        
         self.logger = logging.getLogger(__name__)
+        # O pipeline é montado uma única vez por processo (o Streamlit pode reimportar o módulo)
+        if self.logger.handlers:
+            return
+
+        # Criar diretório de logs se não existir
+        if not os.path.exists(LOG_DIR):
+            os.makedirs(LOG_DIR)
+
+        console = logging.StreamHandler()  # Para mostrar logs no console também
+        console.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.logger.setLevel(logging.INFO)
+        start_async_logging(self.logger, [build_file_handler(), console])
+
+    def _event(self, level, event, **fields):
+        """Registra um evento como uma única linha JSON (só formata se o nível estiver ativo)."""
+        if self.logger.isEnabledFor(level):
+            fields["event"] = event
+            # stacklevel=3: o arquivo/linha do log é o de quem chamou o método log_*
+            self.logger.log(level, json.dumps(fields, ensure_ascii=False, default=str), stacklevel=3)
 
     def log_api_request(self, api_name, prompt_length, component, theme):
         """Registra informações sobre a requisição à API."""
-        self.logger.info(f"""
-        ====== NOVA REQUISIÇÃO API {api_name} ======
-        Componente: {component}
-        Unidade Temática: {theme}
-        Tamanho do Prompt: {prompt_length} caracteres
-        Timestamp: {datetime.now().isoformat()}
-        =======================================
-        """)
+        self._event(logging.INFO, "api_request", api=api_name, component=component,
+                    theme=theme, prompt_chars=prompt_length)
 
     def log_api_response(self, api_name, status_code, response_length):
         """Registra informações sobre a resposta da API."""
-        self.logger.info(f"""
-        ====== RESPOSTA API {api_name} ======
-        Status Code: {status_code}
-        Tamanho da Resposta: {response_length} caracteres
-        Tempo de Resposta: {datetime.now().isoformat()}
-        =======================================
-        """)
+        self._event(logging.INFO, "api_response", api=api_name, status_code=status_code,
+                    response_chars=response_length)
 
     def log_error(self, error_type, error_message, additional_info=None):
         """Registra erros detalhados."""
-        self.logger.error(f"""
-        ====== ERRO DETECTADO ======
-        Tipo: {error_type}
-        Mensagem: {error_message}
-        Informações Adicionais: {additional_info if additional_info else 'N/A'}
-        Timestamp: {datetime.now().isoformat()}
-        ===========================
-        """)
+        registry.counter("activity_errors_total", error_type=error_type).inc()
+        self._event(logging.ERROR, "error", error_type=error_type, message=error_message,
+                    info=additional_info)
 
     def log_activity_generation(self, activity_type, success, details=None):
         """Registra informações sobre a geração de atividades."""
-        status = "SUCESSO" if success else "FALHA"
-        self.logger.info(f"""
-        ====== GERAÇÃO DE ATIVIDADE ======
-        Tipo: {activity_type}
-        Status: {status}
-        Detalhes: {details if details else 'N/A'}
-        Timestamp: {datetime.now().isoformat()}
-        ================================
-        """)
+        registry.counter("activity_generations_total", activity_type=activity_type,
+                         status="ok" if success else "erro").inc()
+        self._event(logging.INFO, "activity_generation", activity_type=activity_type,
+                    success=success, details=details)
 
     def log_performance_metrics(self, execution_time, memory_usage=None):
         """Registra métricas de performance."""
-        self.logger.info(f"""
-        ====== MÉTRICAS DE PERFORMANCE ======
-        Tempo de Execução: {execution_time:.2f} segundos
-        Uso de Memória: {memory_usage if memory_usage else 'N/A'}
-        Timestamp: {datetime.now().isoformat()}
-        ===================================
-        """)
+        registry.histogram("activity_execution_seconds").observe(execution_time)
+        self._event(logging.INFO, "performance", execution_s=round(execution_time, 3),
+                    memory=memory_usage)
+
+    def log_llm_call(self, source, latency, ttft=None, prompt_chars=0, completion_chars=0,
+                     cache_hit=False, fallback=False):
+        """
+        Registra uma chamada à LLM nos histogramas do processo (metrics.registry) e no log.
+
+        Parâmetros:
+        source (str): Origem da chamada.
+        latency (float): Duração total, em segundos.
+        ttft (float): Segundos até o primeiro token.
+        prompt_chars, completion_chars (int): Tamanhos do prompt e da resposta.
+        cache_hit, fallback (bool): Resposta do cache / plano genérico.
+        """
+        completion_tokens = completion_chars // CHARS_PER_TOKEN
+        record_llm_call(source, latency, ttft, prompt_chars, completion_chars,
+                        completion_tokens, cache_hit, fallback)
+        self._event(logging.INFO, "llm_call", source=source, latency_s=round(latency, 3),
+                    ttft_s=round(ttft, 3) if ttft is not None else None,
+                    prompt_chars=prompt_chars, completion_chars=completion_chars,
+                    completion_tokens=completion_tokens, cache_hit=cache_hit, fallback=fallback)
+
+    def metrics_snapshot(self):
+        """Retorna o estado atual das métricas do processo."""
+        return registry.snapshot()
+
+    def export_metrics(self, path):
+        """Acrescenta o estado atual das métricas a um arquivo JSON Lines."""
+        registry.export_jsonl(path)
+
+    def prometheus_metrics(self):
+        """Retorna as métricas do processo no formato de texto do Prometheus."""
+        return registry.to_prometheus()
 
 # Exemplo de uso:
 logger = ActivityLogger()
@@ -87,7 +162,8 @@ logger = ActivityLogger()
 def process_with_groq(groq_api_key, prompt, componente, unidade_tematica):
     """Processa o texto com a API Groq para gerar uma atividade detalhada."""
     try:
-        start_time = datetime.now()
+        start_time = time.perf_counter()
+        first_token_time = None
         
         # Log início da requisição
         logger.log_api_request(
@@ -97,7 +173,7 @@ def process_with_groq(groq_api_key, prompt, componente, unidade_tematica):
             theme=unidade_tematica
         )
 
-        client = Groq(api_key=groq_api_key)
+        client = get_groq_client(groq_api_key)
         completion = client.chat.completions.create(
             model="llama3-8b-8192",
             messages=[{"role": "user", "content": prompt}],
@@ -108,10 +184,13 @@ def process_with_groq(groq_api_key, prompt, componente, unidade_tematica):
             stop=None
         )
         
-        resposta_final = ""
+        partes = []
         for chunk in completion:
             if hasattr(chunk, 'choices') and chunk.choices[0].delta.content:
-                resposta_final += chunk.choices[0].delta.content
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start_time
+                partes.append(chunk.choices[0].delta.content)
+        resposta_final = "".join(partes)
 
         # Log sucesso da resposta
         logger.log_api_response(
@@ -121,8 +200,13 @@ def process_with_groq(groq_api_key, prompt, componente, unidade_tematica):
         )
 
         # Log métricas de performance
-        execution_time = (datetime.now() - start_time).total_seconds()
-        logger.log_performance_metrics(execution_time)
+        logger.log_llm_call(
+            source="process_with_groq",
+            latency=time.perf_counter() - start_time,
+            ttft=first_token_time,
+            prompt_chars=len(prompt),
+            completion_chars=len(resposta_final)
+        )
 
         return resposta_final
 
@@ -0,0 +1,134 @@
+import re
+
+# Marcadores de lista no início da linha ("- ", "* ", "+ ", "1. ", "1) ")
+_LIST_ITEM = re.compile(r"([-*+]|\d{1,3}[.)])\s+")
+# Tags de bloco HTML que o plano pode trazer (os quadros de estratégias do prompt_aula)
+_HTML_BLOCK_START = re.compile(r"</?(div|ul|ol|li|table|thead|tbody|tr|td|th|p|h[1-6]|details|summary|section|br|hr)\b", re.I)
+_HTML_NESTING = re.compile(r"<(/?)(div|ul|ol|table|details|section)\b[^>]*?(/?)>", re.I)
+# Recuo máximo mantido em listas aninhadas (mais que isso vira bloco de código no Markdown)
+MAX_LIST_INDENT = 8
+
+
+class StreamingMarkdownFormatter:
+    """
+    Formata a resposta da LLM em Markdown pronto para exibição, numa única passada,
+    à medida que as partes do streaming chegam.
+
+    Cada linha completa é normalizada uma vez: títulos e blocos HTML ganham linhas em
+    branco ao redor, o recuo comum da resposta é removido (um recuo de 4 espaços
+    transformaria o texto em bloco de código), listas mantêm o aninhamento e linhas em
+    branco repetidas são reduzidas a uma.
+
+    Uso:
+        formatter = StreamingMarkdownFormatter()
+        for part in stream_api(prompt):
+            formatter.feed(part)
+            placeholder.markdown(formatter.text)
+        plano = formatter.finish()
+    """
+
+    def __init__(self):
+        self._output = []
+        self._pending = ""
+        self._base_indent = None
+        self._html_depth = 0
+        # Tipo do último bloco emitido: None (início), "blank", "heading", "list", "text" ou "html"
+        self._last = None
+        self._finished = False
+
+    def feed(self, chunk: str) -> str:
+        """Consome uma parte da resposta e retorna o Markdown das linhas que ela completou."""
+        if "\n" not in chunk:
+            # Caso mais comum no streaming: a parte não completa nenhuma linha
+            self._pending += chunk
+            return ""
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        start = len(self._output)
+        for line in lines:
+            self._line(line)
+        return "".join(self._output[start:])
+
+    def finish(self) -> str:
+        """Processa a última linha e retorna o documento completo."""
+        if not self._finished:
+            if self._pending:
+                self._line(self._pending)
+                self._pending = ""
+            self._finished = True
+        return "".join(self._output).strip("\n")
+
+    @property
+    def text(self) -> str:
+        """Documento formatado até agora, incluindo a linha ainda incompleta (para exibição parcial)."""
+        partial = self._pending.strip()
+        return "".join(self._output) + (partial if self._html_depth == 0 else "")
+
+    def _emit(self, text: str, kind: str):
+        self._output.append(text + "\n")
+        self._last = kind
+
+    def _blank(self):
+        if self._last not in (None, "blank"):
+            self._emit("", "blank")
+
+    def _line(self, raw: str):
+        line = raw.rstrip().replace("\r", "")
+        stripped = line.lstrip()
+        if self._html_depth > 0:
+            self._html(stripped)
+            return
+        if not stripped:
+            self._blank()
+            return
+
+        indent = len(line) - len(stripped)
+        if self._base_indent is None:
+            self._base_indent = indent
+        indent = max(indent - self._base_indent, 0)
+
+        if stripped.startswith("#"):
+            level = len(stripped) - len(stripped.lstrip("#"))
+            if level <= 6 and stripped[level:level + 1] in (" ", ""):
+                self._blank()
+                self._emit("#" * level + " " + " ".join(stripped[level:].split()), "heading")
+                self._blank()
+                return
+
+        if _HTML_BLOCK_START.match(stripped):
+            self._blank()
+            self._html(stripped)
+            return
+
+        match = _LIST_ITEM.match(stripped)
+        if match:
+            if self._last not in ("list", "blank", None):
+                self._blank()
+            marker = match.group(1)
+            self._emit(" " * min(indent, MAX_LIST_INDENT) + marker + " " + " ".join(stripped[match.end():].split()), "list")
+            return
+
+        # Texto comum (ou continuação de um item de lista) sem recuo que vire bloco de código
+        if self._last == "list" and indent:
+            self._emit(" " * min(indent, MAX_LIST_INDENT) + " ".join(stripped.split()), "list")
+        else:
+            self._emit(" ".join(stripped.split()), "text")
+
+    def _html(self, stripped: str):
+        # Dentro do bloco HTML, linhas em branco encerrariam o bloco no Markdown: são omitidas
+        if stripped:
+            for closing, _, self_closing in _HTML_NESTING.findall(stripped):
+                if self_closing:
+                    continue
+                self._html_depth += -1 if closing else 1
+            self._html_depth = max(self._html_depth, 0)
+            self._emit(stripped, "html")
+        if self._html_depth == 0:
+            self._blank()
+
+
+def format_markdown(text: str) -> str:
+    """Formata uma resposta completa (atalho para alimentar o formatador de uma vez)."""
+    formatter = StreamingMarkdownFormatter()
+    formatter.feed(text)
+    return formatter.finish()
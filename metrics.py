@@ -0,0 +1,187 @@
+import collections
+import json
+import math
+import threading
+import time
+
+
+def percentile(values, q: float) -> float:
+    """Percentil q (0 a 100) com interpolação linear, sem depender do NumPy."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return float(ordered[lower])
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_latencies(latencies) -> dict:
+    """Resume uma lista de latências (em segundos) em média, p50 e p95."""
+    return {
+        "count": len(latencies),
+        "mean_s": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+    }
+
+
+# Amostras mantidas por histograma (janela das observações mais recentes)
+HISTOGRAM_WINDOW = 1024
+QUANTILES = (50, 95, 99)
+
+
+class Counter:
+    """Contador monotônico seguro entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """
+    Histograma em processo: total e soma de todas as observações, e percentis calculados
+    sobre as HISTOGRAM_WINDOW mais recentes.
+
+    observe() só acrescenta a amostra a uma deque; a ordenação fica para snapshot(),
+    fora do caminho da requisição.
+    """
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self._samples.append(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = list(self._samples)
+            count, total = self.count, self.sum
+        summary = {"count": count, "sum": total, "mean": total / count if count else 0.0}
+        for q in QUANTILES:
+            summary[f"p{q}"] = percentile(samples, q)
+        return summary
+
+
+class MetricsRegistry:
+    """Registro de contadores e histogramas, identificados por nome e rótulos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def _get(self, metrics: dict, factory, name: str, labels: dict):
+        key = self._key(name, labels)
+        metric = metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = metrics.setdefault(key, factory())
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(self._counters, Counter, name, labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._get(self._histograms, Histogram, name, labels)
+
+    def snapshot(self) -> dict:
+        """Retorna todas as métricas como {"nome{rótulos}": valor ou resumo do histograma}."""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+        snapshot = {}
+        for (name, labels), counter in counters:
+            snapshot[_series_name(name, labels)] = counter.value
+        for (name, labels), histogram in histograms:
+            snapshot[_series_name(name, labels)] = histogram.snapshot()
+        return snapshot
+
+    def export_jsonl(self, path: str):
+        """Acrescenta o estado atual das métricas como uma linha JSON ao arquivo."""
+        line = json.dumps({"timestamp": time.time(), "metrics": self.snapshot()}, ensure_ascii=False)
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+    def to_prometheus(self) -> str:
+        """Retorna as métricas no formato de texto do Prometheus (histogramas como summary)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), counter in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{_series_name(name, labels)} {counter.value}")
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            summary = histogram.snapshot()
+            for q in QUANTILES:
+                lines.append(f"{_series_name(name, labels + (('quantile', str(q / 100)),))} {summary[f'p{q}']}")
+            lines.append(f"{_series_name(name + '_sum', labels)} {summary['sum']}")
+            lines.append(f"{_series_name(name + '_count', labels)} {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _series_name(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{value}"' for key, value in labels)
+    return f"{name}{{{rendered}}}"
+
+
+registry = MetricsRegistry()
+
+
+def record_llm_call(source: str, latency: float, ttft: float = None, prompt_chars: int = 0,
+                    completion_chars: int = 0, completion_tokens: int = 0,
+                    cache_hit: bool = False, fallback: bool = False, interrupted: bool = False):
+    """
+    Registra uma chamada à LLM no registro de métricas do processo.
+
+    Parâmetros:
+    source (str): Origem da chamada (ex.: "stream_api", "process_with_groq").
+    latency (float): Duração total da chamada, em segundos.
+    ttft (float): Segundos até a primeira parte da resposta, se houve resposta da API.
+    cache_hit (bool): A resposta veio do cache persistente.
+    fallback (bool): A chamada terminou no plano genérico.
+    interrupted (bool): A resposta foi interrompida depois das primeiras partes.
+    """
+    outcome = "cache" if cache_hit else "fallback" if fallback else "interrupted" if interrupted else "api"
+    registry.counter("llm_requests_total", source=source, outcome=outcome).inc()
+    registry.histogram("llm_latency_seconds", source=source, outcome=outcome).observe(latency)
+    registry.histogram("llm_prompt_chars", source=source).observe(prompt_chars)
+    if outcome != "api":
+        return
+    registry.histogram("llm_completion_chars", source=source).observe(completion_chars)
+    if ttft is not None:
+        registry.histogram("llm_ttft_seconds", source=source).observe(ttft)
+        generation = latency - ttft
+        if completion_tokens and generation > 0:
+            registry.histogram("llm_tokens_per_second", source=source).observe(completion_tokens / generation)
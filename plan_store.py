@@ -0,0 +1,147 @@
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Banco dos planos de aula salvos (histórico completo, um registro por salvamento)
+STORE_PATH = "planos.sqlite3"
+# Espera máxima (ms) por outro escritor antes de falhar com "database is locked"
+BUSY_TIMEOUT_MS = 5000
+HISTORY_PAGE_SIZE = 20
+
+# Campos que identificam um plano além do conteúdo
+PLAN_FIELDS = ("professor", "turma", "componente", "unidade_tematica", "objetivo_conhecimento", "data_aula")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS planos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    professor TEXT NOT NULL DEFAULT '',
+    turma TEXT NOT NULL DEFAULT '',
+    componente TEXT NOT NULL DEFAULT '',
+    unidade_tematica TEXT NOT NULL DEFAULT '',
+    objetivo_conhecimento TEXT NOT NULL DEFAULT '',
+    data_aula TEXT NOT NULL DEFAULT '',
+    conteudo TEXT NOT NULL,
+    criado_em REAL NOT NULL
+);
+-- Os índices do SQLite terminam no rowid (id): "mais recentes primeiro" não exige ordenação
+CREATE INDEX IF NOT EXISTS idx_planos_turma ON planos (turma);
+CREATE INDEX IF NOT EXISTS idx_planos_turma_componente ON planos (turma, componente);
+CREATE INDEX IF NOT EXISTS idx_planos_professor ON planos (professor);
+"""
+
+
+class PlanStore:
+    """
+    Histórico de planos de aula em SQLite (modo WAL), somente acréscimo.
+
+    Cada thread usa a própria conexão; leituras não bloqueiam escritas e os escritores de
+    várias sessões do Streamlit são serializados pelo SQLite (BEGIN IMMEDIATE + busy_timeout).
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        store_dir = os.path.dirname(path)
+        if store_dir and not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # isolation_level=None: as transações são abertas explicitamente em save()
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def save(self, conteudo: str, created_at: float = None, **fields) -> int:
+        """
+        Acrescenta um plano ao histórico e retorna o seu id.
+
+        Parâmetros:
+        conteudo (str): Texto do plano de aula.
+        fields: professor, turma, componente, unidade_tematica, objetivo_conhecimento, data_aula.
+        """
+        unknown = set(fields) - set(PLAN_FIELDS)
+        if unknown:
+            raise ValueError(f"Campos desconhecidos: {', '.join(sorted(unknown))}")
+        values = [fields.get(field) or "" for field in PLAN_FIELDS]
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(
+                f"INSERT INTO planos ({', '.join(PLAN_FIELDS)}, conteudo, criado_em) "
+                f"VALUES ({', '.join('?' * len(PLAN_FIELDS))}, ?, ?)",
+                (*values, conteudo, created_at or time.time()),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor.lastrowid
+
+    @staticmethod
+    def _filters(turma=None, componente=None, professor=None) -> tuple:
+        clauses, params = [], []
+        for column, value in (("turma", turma), ("componente", componente), ("professor", professor)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def latest(self, turma: str = None, componente: str = None, professor: str = None) -> Optional[dict]:
+        """Retorna o plano mais recente que atende aos filtros, ou None."""
+        plans = self.history(turma, componente, professor, limit=1)
+        return plans[0] if plans else None
+
+    def history(self, turma: str = None, componente: str = None, professor: str = None,
+                limit: int = HISTORY_PAGE_SIZE, before_id: int = None) -> list:
+        """
+        Retorna uma página do histórico, do plano mais recente para o mais antigo.
+
+        A paginação é por cursor: para a próxima página, passe em before_id o id do último
+        plano da página atual (sem OFFSET, o custo não cresce com o número da página).
+        """
+        where, params = self._filters(turma, componente, professor)
+        if before_id is not None:
+            where += (" AND " if where else " WHERE ") + "id < ?"
+            params.append(before_id)
+        rows = self._connection().execute(
+            f"SELECT * FROM planos{where} ORDER BY id DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, turma: str = None, componente: str = None, professor: str = None) -> int:
+        where, params = self._filters(turma, componente, professor)
+        (total,) = self._connection().execute(f"SELECT COUNT(*) FROM planos{where}", params).fetchone()
+        return total
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_plan_store() -> PlanStore:
+    """Retorna o histórico de planos compartilhado por todas as sessões do processo."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PlanStore()
+    return _store
+
+
+def format_created_at(plan: dict) -> str:
+    """Data e hora de criação do plano, para exibição."""
+    return datetime.datetime.fromtimestamp(plan["criado_em"]).strftime("%d/%m/%Y %H:%M")
@@ -0,0 +1,196 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from hypotheses import HYPOTHESIS_CODES, HYPOTHESIS_ORDER
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de níveis da escala e código das hipóteses desconhecidas / meses sem sondagem
+LEVELS = len(HYPOTHESIS_ORDER)
+MISSING = -1
+# Sondagens consecutivas no mesmo nível (abaixo de Alfabética) para marcar estagnação
+STAGNATION_SONDAGENS = 3
+# Quantidade de versões dos dados mantidas em memória
+MAX_CACHED_VERSIONS = 4
+
+
+def encode_hypotheses(hypotheses: pd.Series) -> np.ndarray:
+    """
+    Converte os nomes das hipóteses nos códigos da escala (int8, MISSING se desconhecida).
+
+    Cada nome distinto é consultado uma única vez; as linhas usam só os códigos inteiros.
+    """
+    codes, names = pd.factorize(hypotheses)
+    lookup = np.array([HYPOTHESIS_CODES.get(name, MISSING) for name in names] + [MISSING], dtype=np.int8)
+    # factorize marca valores nulos com -1, que aponta para o MISSING do final da tabela
+    return lookup[codes]
+
+
+class Progression:
+    """
+    Trajetórias dos alunos ao longo das sondagens, como uma matriz aluno × mês de códigos.
+
+    Cada aluno é identificado por (turma, nome). Meses sem sondagem do aluno ficam com
+    MISSING; se houver mais de uma linha do aluno no mesmo mês, vale a última. Transições,
+    taxas e estagnação são calculadas sobre a matriz inteira com operações vetorizadas
+    (np.bincount), sem laços por aluno.
+    """
+
+    def __init__(self, classes: np.ndarray, student_class: np.ndarray, student_names: np.ndarray,
+                 months: np.ndarray, codes: np.ndarray):
+        self.classes = classes
+        self.student_class = student_class
+        self.student_names = student_names
+        self.months = months
+        self.codes = codes
+        self._class_positions = {class_name: position for position, class_name in enumerate(classes)}
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> "Progression":
+        """Constrói as trajetórias a partir de um DataFrame no formato de dados.csv."""
+        class_codes, classes = pd.factorize(data["class_name"], sort=True)
+        name_codes, names = pd.factorize(data["student_name"])
+        # Um aluno é o par (turma, nome): o mesmo nome em duas turmas são dois alunos
+        pairs = class_codes.astype(np.int64) * max(len(names), 1) + name_codes
+        students, student_index = np.unique(pairs, return_inverse=True)
+        months, month_index = np.unique(data["month"].to_numpy(), return_inverse=True)
+
+        codes = np.full((len(students), len(months)), MISSING, dtype=np.int8)
+        codes[student_index, month_index] = encode_hypotheses(data["hypothesis_name"])
+        return cls(
+            classes=np.asarray(classes),
+            student_class=(students // max(len(names), 1)).astype(np.int64),
+            student_names=np.asarray(names)[students % max(len(names), 1)],
+            months=months,
+            codes=codes,
+        )
+
+    @property
+    def students(self) -> int:
+        return len(self.codes)
+
+    def _month_column(self, month) -> np.ndarray:
+        position = np.searchsorted(self.months, month)
+        if position >= len(self.months) or self.months[position] != month:
+            raise ValueError(f"Mês sem sondagem: {month}")
+        return self.codes[:, position]
+
+    def _class_mask(self, class_name) -> np.ndarray:
+        position = self._class_positions.get(class_name)
+        if position is None:
+            return np.zeros(self.students, dtype=bool)
+        return self.student_class == position
+
+    def months_of(self, class_name) -> list:
+        """Meses em que a turma teve sondagem."""
+        observed = (self.codes[self._class_mask(class_name)] != MISSING).any(axis=0)
+        return self.months[observed].tolist()
+
+    def trajectories(self, class_name=None) -> pd.DataFrame:
+        """Hipótese de cada aluno em cada mês (linhas: alunos; colunas: meses; vazio se sem sondagem)."""
+        mask = self._class_mask(class_name) if class_name is not None else slice(None)
+        labels = np.array(HYPOTHESIS_ORDER + [None], dtype=object)
+        frame = pd.DataFrame(labels[self.codes[mask]], columns=self.months.tolist())
+        frame.insert(0, "student_name", self.student_names[mask])
+        if class_name is None:
+            frame.insert(0, "class_name", self.classes[self.student_class])
+        return frame
+
+    def _pairs(self, from_month, to_month, class_name=None):
+        before, after = self._month_column(from_month), self._month_column(to_month)
+        valid = (before != MISSING) & (after != MISSING)
+        if class_name is not None:
+            valid &= self._class_mask(class_name)
+        return before[valid].astype(np.int64), after[valid].astype(np.int64), self.student_class[valid]
+
+    def transition_matrix(self, from_month, to_month, class_name=None) -> pd.DataFrame:
+        """
+        Quantos alunos passaram de cada hipótese (linhas) para cada hipótese (colunas).
+
+        Considera só os alunos com sondagem nos dois meses; sem turma, soma todas as turmas.
+        """
+        before, after, _ = self._pairs(from_month, to_month, class_name)
+        counts = np.bincount(before * LEVELS + after, minlength=LEVELS * LEVELS).reshape(LEVELS, LEVELS)
+        return pd.DataFrame(counts, index=HYPOTHESIS_ORDER, columns=HYPOTHESIS_ORDER)
+
+    def transition_matrices(self, from_month, to_month) -> np.ndarray:
+        """Matrizes de transição de todas as turmas de uma vez: array turmas × hipótese × hipótese."""
+        before, after, classes = self._pairs(from_month, to_month)
+        cells = (classes * LEVELS + before) * LEVELS + after
+        counts = np.bincount(cells, minlength=len(self.classes) * LEVELS * LEVELS)
+        return counts.reshape(len(self.classes), LEVELS, LEVELS)
+
+    def progression_rates(self, from_month, to_month) -> pd.DataFrame:
+        """
+        Por turma: alunos comparados, quantos avançaram, mantiveram ou regrediram na escala,
+        a taxa de progressão (fração que avançou) e o avanço médio em níveis.
+        """
+        before, after, classes = self._pairs(from_month, to_month)
+        delta = after - before
+        size = len(self.classes)
+        compared = np.bincount(classes, minlength=size)
+        advanced = np.bincount(classes, weights=delta > 0, minlength=size).astype(np.int64)
+        regressed = np.bincount(classes, weights=delta < 0, minlength=size).astype(np.int64)
+        levels = np.bincount(classes, weights=delta, minlength=size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = pd.DataFrame({
+                "alunos": compared,
+                "avancaram": advanced,
+                "mantiveram": compared - advanced - regressed,
+                "regrediram": regressed,
+                "taxa_progressao": advanced / compared,
+                "avanco_medio": levels / compared,
+            }, index=pd.Index(self.classes, name="class_name"))
+        return rates[rates["alunos"] > 0]
+
+    def stagnation_flags(self, sondagens: int = STAGNATION_SONDAGENS) -> np.ndarray:
+        """
+        Marca os alunos cujas últimas `sondagens` sondagens ficaram no mesmo nível, abaixo
+        de Alfabética. Meses sem sondagem são ignorados; alunos com menos sondagens não são marcados.
+        """
+        valid = self.codes != MISSING
+        # Posição de cada sondagem contada a partir da mais recente (1 = última)
+        rank_from_end = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+        recent = valid & (rank_from_end <= sondagens)
+        lowest = np.where(recent, self.codes, LEVELS).min(axis=1)
+        highest = np.where(recent, self.codes, MISSING).max(axis=1)
+        return (valid.sum(axis=1) >= sondagens) & (lowest == highest) & (highest < LEVELS - 1)
+
+    def stagnant_students(self, class_name=None, sondagens: int = STAGNATION_SONDAGENS) -> pd.DataFrame:
+        """Alunos estagnados (turma, nome e hipótese atual)."""
+        flags = self.stagnation_flags(sondagens)
+        if class_name is not None:
+            flags &= self._class_mask(class_name)
+        codes = self.codes[flags]
+        # Última sondagem de cada aluno: maior posição com código válido
+        last = codes.shape[1] - 1 - np.argmax((codes != MISSING)[:, ::-1], axis=1)
+        return pd.DataFrame({
+            "class_name": self.classes[self.student_class[flags]],
+            "student_name": self.student_names[flags],
+            "hypothesis_name": np.asarray(HYPOTHESIS_ORDER, dtype=object)[codes[np.arange(len(codes)), last]],
+        })
+
+
+_progressions = {}
+_progressions_lock = threading.Lock()
+
+
+def get_progression(data: pd.DataFrame, version: str) -> Progression:
+    """
+    Retorna as trajetórias da versão informada dos dados, construídas uma única vez por versão.
+
+    Compartilhadas entre as sessões do Streamlit; não devem ser alteradas pelos chamadores.
+    """
+    progression = _progressions.get(version)
+    if progression is not None:
+        return progression
+    with _progressions_lock:
+        progression = _progressions.get(version)
+        if progression is None:
+            progression = Progression.from_frame(data)
+            _progressions[version] = progression
+            while len(_progressions) > MAX_CACHED_VERSIONS:
+                _progressions.pop(next(iter(_progressions)))
+            logger.info(f"Trajetórias construídas para a versão {version} ({progression.students} alunos).")
+    return progression
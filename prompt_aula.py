@@ -1,7 +1,20 @@
+import logging
 import streamlit as st
 from api_requests import call_api
+from retrieval_index import retrieve_references
 
-def generate_prompt_for_activity(componente, unidade_tematica, objetivo_de_conhecimento, data="", perfis_turma=""):
+logger = logging.getLogger(__name__)
+
+# Opções de plano de aula oferecidas na barra lateral do app (e geradas em lote)
+COMPONENTES = ["Língua Portuguesa", "Matemática"]
+OBJETIVOS_POR_UNIDADE = {
+    "Leitura": ["Compreensão em Leitura"],
+    "Escrita": ["Produção de Textos"],
+    "Produção de Texto": ["Produção de Textos"],
+}
+UNIDADES_TEMATICAS = list(OBJETIVOS_POR_UNIDADE)
+
+def generate_prompt_for_activity(componente, unidade_tematica, objetivo_de_conhecimento, data="", perfis_turma="", usar_referencias=True):
     """
     Gera um roteiro de aula detalhado para facilitar o planejamento docente.
 
@@ -11,6 +24,7 @@ def generate_prompt_for_activity(componente, unidade_tematica, objetivo_de_conhe
     objetivo_de_conhecimento (str): O objetivo de conhecimento.
     data (str, opcional): Data do plano de aula.
     perfis_turma (str, opcional): Perfis da turma.
+    usar_referencias (bool, opcional): Inclui trechos relevantes da base de referências.
 
     Retorna:
     str: Prompt gerado para o planejamento da aula.
@@ -95,6 +109,19 @@ def generate_prompt_for_activity(componente, unidade_tematica, objetivo_de_conhe
     4. Personalize as estratégias de acordo com os níveis de aprendizagem
     5. Mantenha a formatação visual com as divs estilizadas
     """
+    if perfis_turma:
+        prompt += f"""
+    Perfil da turma: {perfis_turma}
+    """
+    if usar_referencias:
+        try:
+            referencias = retrieve_references(componente, unidade_tematica, objetivo_de_conhecimento, perfis_turma)
+        except Exception as e:
+            logger.warning(f"Não foi possível consultar as referências pedagógicas: {e}")
+            referencias = []
+        if referencias:
+            prompt += "\n    Referências pedagógicas (use como inspiração para as atividades e estratégias):\n"
+            prompt += "".join(f"    - {referencia['titulo']}: {referencia['trecho']}\n" for referencia in referencias)
     return prompt
 
 def create_lesson_plan(componente, unidade_tematica, objetivo_de_conhecimento, data="", perfis_turma=""):
@@ -0,0 +1,170 @@
+import math
+import logging
+import pandas as pd
+from hypotheses import HYPOTHESIS_CODES
+from hypothesis_cube import HypothesisCube
+from text_utils import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Orçamento máximo (em tokens) para a representação dos dados dentro do prompt
+TOKEN_BUDGET = 1200
+# Quantidade inicial de alunos citados nominalmente (reduzida se o orçamento estourar)
+MAX_NAMED_STUDENTS = 10
+
+
+def estimate_table_tokens(data: pd.DataFrame) -> int:
+    """
+    Estima os tokens que data.to_string(index=False) ocuparia, sem montar a string.
+
+    Cada coluna é impressa com a largura do seu maior valor, separada por dois espaços.
+    """
+    if data.empty:
+        return 0
+    widths = [
+        max(len(str(column)), int(data[column].astype(str).str.len().max()))
+        for column in data.columns
+    ]
+    line_length = sum(widths) + 2 * (len(widths) - 1) + 1
+    return math.ceil(line_length * (len(data) + 1) / CHARS_PER_TOKEN)
+
+
+def _latest_snapshot(data: pd.DataFrame) -> pd.DataFrame:
+    """Filtra, para cada turma, apenas as linhas do mês mais recente de sondagem."""
+    latest_month = data.groupby('class_name', observed=True)['month'].transform('max')
+    return data[data['month'] == latest_month]
+
+
+def _class_names(data: pd.DataFrame) -> list:
+    """Turmas presentes nos dados (ignora categorias sem linhas)."""
+    return sorted(data['class_name'].unique().tolist())
+
+
+def summarize_distributions(data: pd.DataFrame, cube: HypothesisCube = None) -> list:
+    """Gera as linhas com a distribuição de hipóteses de cada turma no mês mais recente."""
+    cube = cube or HypothesisCube.from_frame(data)
+
+    lines = []
+    for class_name in _class_names(data):
+        months = cube.months(class_name)
+        if not months:
+            continue
+        class_counts = cube.counts(class_name, months[-1])
+        total = sum(class_counts.values())
+        lines.append(f"Turma {class_name} (mês {months[-1]}, {total} alunos):")
+        for hypothesis, count in class_counts.items():
+            lines.append(f"- {hypothesis}: {count} alunos ({count / total * 100:.1f}%)")
+    return lines
+
+
+def summarize_deltas(data: pd.DataFrame, cube: HypothesisCube = None) -> list:
+    """Gera as linhas com a variação (em pontos percentuais) de cada hipótese entre meses consecutivos."""
+    cube = cube or HypothesisCube.from_frame(data)
+
+    lines = []
+    for class_name in _class_names(data):
+        months = cube.months(class_name)
+        for previous_month, month in zip(months, months[1:]):
+            before = cube.distribution(class_name, previous_month)
+            after = cube.distribution(class_name, month)
+            changes = []
+            for hypothesis in sorted(set(before) | set(after), key=lambda name: HYPOTHESIS_CODES.get(name, len(HYPOTHESIS_CODES))):
+                delta = after.get(hypothesis, 0) - before.get(hypothesis, 0)
+                if abs(delta) >= 0.05:
+                    changes.append(f"{hypothesis} {delta:+.1f} pp")
+            if changes:
+                lines.append(f"- {class_name}, mês {previous_month} → {month}: " + ", ".join(changes))
+    return lines
+
+
+def select_students(data: pd.DataFrame, limit: int) -> list:
+    """
+    Seleciona os alunos mais distantes do padrão da própria turma no mês mais recente.
+
+    A distância é medida na escala das hipóteses, em relação à mediana da turma.
+    """
+    if limit <= 0:
+        return []
+    snapshot = _latest_snapshot(data)
+    codes = snapshot['hypothesis_name'].map(HYPOTHESIS_CODES).astype(float)
+    medians = codes.groupby(snapshot['class_name'], observed=True).transform('median')
+    distance = codes - medians
+
+    outliers = snapshot.assign(distance=distance, gap=distance.abs())
+    outliers = outliers[outliers['gap'] >= 1].sort_values('gap', ascending=False, kind='stable')
+
+    lines = []
+    for row in outliers.head(limit).itertuples(index=False):
+        direction = "acima" if row.distance > 0 else "abaixo"
+        lines.append(f"- {row.student_name} ({row.class_name}): {row.hypothesis_name}, {direction} do padrão da turma")
+    return lines
+
+
+def _render(distributions, deltas, students, omitted_classes=0) -> str:
+    sections = ["Distribuição das hipóteses de escrita:"] + distributions
+    if omitted_classes:
+        sections.append(f"(+{omitted_classes} turmas omitidas por limite de tamanho)")
+    if deltas:
+        sections += ["", "Evolução entre sondagens (pontos percentuais):"] + deltas
+    if students:
+        sections += ["", "Alunos em destaque (fora do padrão da turma):"] + students
+    return "\n".join(sections)
+
+
+def compact_class_data(data: pd.DataFrame, max_tokens: int = TOKEN_BUDGET, cube: HypothesisCube = None):
+    """
+    Gera uma representação compacta dos dados da turma que respeita o orçamento de tokens.
+
+    Envia distribuições por turma, variações mês a mês e apenas os alunos fora do padrão.
+    Se o orçamento estourar, reduz primeiro os alunos citados, depois as variações e por
+    fim a quantidade de turmas. Se o cubo de hipóteses já materializado for informado, as
+    distribuições e variações são consultadas nele em vez de reagregar os dados.
+
+    Retorna:
+    tuple: (texto compacto, dicionário com tokens antes e depois da compactação)
+    """
+    tokens_before = estimate_table_tokens(data)
+    cube = cube or HypothesisCube.from_frame(data)
+    distributions = summarize_distributions(data, cube)
+    deltas = summarize_deltas(data, cube)
+
+    limit = MAX_NAMED_STUDENTS
+    students = select_students(data, limit)
+    text = _render(distributions, deltas, students)
+    while estimate_tokens(text) > max_tokens and limit > 0:
+        limit //= 2
+        students = students[:limit]
+        text = _render(distributions, deltas, students)
+
+    if estimate_tokens(text) > max_tokens:
+        deltas = []
+        text = _render(distributions, deltas, students)
+
+    # Último recurso: mantém só as turmas (cabeçalho + hipóteses) que cabem no orçamento
+    omitted = 0
+    if estimate_tokens(text) > max_tokens:
+        headers = [i for i, line in enumerate(distributions) if line.startswith("Turma ")]
+        blocks = [distributions[start:end] for start, end in zip(headers, headers[1:] + [len(distributions)])]
+        available = max_tokens * CHARS_PER_TOKEN - len(_render([], deltas, students, len(blocks)))
+        kept = []
+        for block in blocks:
+            block_length = sum(len(line) + 1 for line in block)
+            if block_length > available:
+                break
+            kept += block
+            available -= block_length
+        omitted = len(blocks) - sum(1 for line in kept if line.startswith("Turma "))
+        distributions = kept
+        text = _render(distributions, deltas, students, omitted)
+
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": estimate_tokens(text),
+        "named_students": len(students),
+        "omitted_classes": omitted,
+    }
+    logger.info(
+        f"Dados compactados para o prompt: {stats['tokens_before']} → {stats['tokens_after']} tokens "
+        f"(orçamento: {max_tokens})."
+    )
+    return text, stats
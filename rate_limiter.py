@@ -0,0 +1,206 @@
+import collections
+import logging
+import random
+import threading
+import time
+import groq
+
+logger = logging.getLogger(__name__)
+
+# Limites da conta na API Groq (requisições e tokens por minuto)
+REQUESTS_PER_MINUTE = 30
+TOKENS_PER_MINUTE = 30_000
+# Orçamento total de uma chamada: espera na fila + tentativas + backoff
+DEADLINE_SECONDS = 60.0
+MAX_RETRIES = 4
+BASE_BACKOFF = 0.5  # Segundos antes da primeira nova tentativa
+MAX_BACKOFF = 8.0
+# Amostras de atraso de fila mantidas para as métricas
+QUEUE_DELAY_SAMPLES = 1000
+
+
+class DeadlineExceeded(Exception):
+    """O orçamento de tempo da chamada acabou antes de ela ser concluída."""
+
+
+class TokenBucket:
+    """
+    Balde de tokens com reposição contínua.
+
+    Reservas que excedem o saldo deixam o balde negativo: quem chega depois espera a
+    dívida ser paga, o que mantém a ordem de chegada sem uma fila explícita.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Reserva `amount` tokens e retorna quantos segundos é preciso esperar para usá-los."""
+        with self._lock:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+            return max(-self._tokens / self.refill_per_second, 0.0)
+
+    def refund(self, amount: float):
+        """Devolve tokens reservados e não utilizados."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+    def consume(self, amount: float):
+        """Debita um consumo já realizado (pode deixar o balde negativo)."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class LimiterMetrics:
+    """Atrasos de fila, novas tentativas e uso do plano genérico nas chamadas à LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queue_delays = collections.deque(maxlen=QUEUE_DELAY_SAMPLES)
+        self.requests = 0
+        self.retries = 0
+        self.deadline_exceeded = 0
+        self.fallbacks = 0
+
+    def record_queue_delay(self, delay: float):
+        with self._lock:
+            self.requests += 1
+            self.queue_delays.append(delay)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_deadline_exceeded(self):
+        with self._lock:
+            self.deadline_exceeded += 1
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def snapshot(self) -> dict:
+        """Retorna os contadores e o atraso médio/máximo de fila das últimas requisições."""
+        with self._lock:
+            delays = list(self.queue_delays)
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "deadline_exceeded": self.deadline_exceeded,
+                "fallbacks": self.fallbacks,
+                "queue_delay_mean_s": sum(delays) / len(delays) if delays else 0.0,
+                "queue_delay_max_s": max(delays) if delays else 0.0,
+            }
+
+
+limiter_metrics = LimiterMetrics()
+
+
+class RateLimiter:
+    """Limita requisições/minuto e tokens/minuto com dois baldes de tokens."""
+
+    def __init__(self, requests_per_minute: float = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+    def acquire(self, tokens: int, deadline: float = None) -> float:
+        """
+        Aguarda até haver capacidade para uma requisição de `tokens` tokens.
+
+        Retorna o tempo de espera. Se a espera ultrapassar o prazo (time.monotonic()),
+        devolve a reserva e lança DeadlineExceeded sem esperar.
+        """
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if deadline is not None and time.monotonic() + wait > deadline:
+            self.requests.refund(1)
+            self.tokens.refund(tokens)
+            limiter_metrics.record_deadline_exceeded()
+            raise DeadlineExceeded(f"Espera de {wait:.1f} s na fila excede o prazo da chamada.")
+        if wait > 0:
+            logger.debug(f"Limite de taxa atingido; aguardando {wait:.2f} s.")
+            time.sleep(wait)
+        limiter_metrics.record_queue_delay(wait)
+        return wait
+
+    def record_usage(self, tokens: int):
+        """Debita tokens consumidos além dos reservados (ex.: tokens da resposta)."""
+        if tokens > 0:
+            self.tokens.consume(tokens)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Retorna o limitador compartilhado por todas as sessões do processo."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def configure_rate_limiter(requests_per_minute: float, tokens_per_minute: float) -> RateLimiter:
+    """Substitui o limitador compartilhado por um com outros limites (ex.: outra conta ou benchmarks)."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    return _limiter
+
+
+def is_transient(error: Exception) -> bool:
+    """Indica se o erro é passageiro (limite de taxa, timeout, conexão, erro 5xx)."""
+    if isinstance(error, (groq.APITimeoutError, groq.APIConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code in (408, 409, 429) or (status_code is not None and status_code >= 500)
+
+
+def _retry_after(error: Exception):
+    """Lê o cabeçalho Retry-After da resposta de erro, se houver."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def call_with_retry(fn, deadline: float, max_retries: int = MAX_RETRIES):
+    """
+    Executa fn() repetindo erros passageiros com backoff exponencial e jitter.
+
+    Respeita Retry-After quando a API o informa. Erros permanentes, o fim das tentativas
+    ou um backoff que ultrapassaria o prazo propagam o último erro.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if not is_transient(e) or attempt >= max_retries:
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+            if time.monotonic() + delay > deadline:
+                limiter_metrics.record_deadline_exceeded()
+                raise
+            attempt += 1
+            limiter_metrics.record_retry()
+            logger.warning(f"Erro passageiro na API ({e}); nova tentativa {attempt}/{max_retries} em {delay:.2f} s.")
+            time.sleep(delay)
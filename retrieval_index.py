@@ -0,0 +1,237 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import numpy as np
+from scipy import sparse
+from text_utils import tokenize
+
+logger = logging.getLogger(__name__)
+
+FONTE_PATH = "fonte.json"
+# Diretório do índice construído offline (python retrieval_index.py)
+INDEX_DIR = os.path.join(".cache", "indice_referencias")
+# Tamanho máximo de cada trecho injetado no prompt
+SNIPPET_CHARS = 400
+
+
+class BM25Index:
+    """
+    Índice BM25 sobre matrizes esparsas (documentos × termos).
+
+    As frequências ficam numa matriz CSR; os pesos BM25 são mantidos em CSC para que a
+    consulta leia apenas as colunas dos termos pesquisados.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self.documents = []
+        self._tf = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._doc_lengths = np.zeros(0, dtype=np.float32)
+        self._doc_freq = np.zeros(0, dtype=np.int64)
+        self._weights = sparse.csc_matrix((0, 0), dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add_documents(self, documents: list):
+        """
+        Adiciona documentos ao índice (atualização incremental).
+
+        Cada documento é um dicionário com ao menos "texto"; os demais campos (titulo,
+        trecho, url...) são devolvidos nas buscas.
+        """
+        if not documents:
+            return
+        rows, cols, counts = [], [], []
+        lengths = []
+        for row, document in enumerate(documents):
+            tokens = tokenize(document["texto"])
+            lengths.append(len(tokens))
+            term_counts = {}
+            for token in tokens:
+                column = self.vocabulary.setdefault(token, len(self.vocabulary))
+                term_counts[column] = term_counts.get(column, 0) + 1
+            rows.extend([row] * len(term_counts))
+            cols.extend(term_counts)
+            counts.extend(term_counts.values())
+
+        n_terms = len(self.vocabulary)
+        block = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), (rows, cols)),
+            shape=(len(documents), n_terms),
+        )
+        # Amplia as colunas da matriz existente para o vocabulário novo, sem copiar os dados
+        tf = sparse.csr_matrix((self._tf.data, self._tf.indices, self._tf.indptr), shape=(self._tf.shape[0], n_terms))
+        self._tf = sparse.vstack([tf, block], format="csr")
+
+        self._doc_lengths = np.concatenate([self._doc_lengths, np.asarray(lengths, dtype=np.float32)])
+        doc_freq = np.zeros(n_terms, dtype=np.int64)
+        doc_freq[:len(self._doc_freq)] = self._doc_freq
+        doc_freq += np.bincount(block.indices, minlength=n_terms)
+        self._doc_freq = doc_freq
+
+        self.documents.extend(
+            {key: value for key, value in document.items() if key != "texto"} for document in documents
+        )
+        self._update_weights()
+
+    def _update_weights(self):
+        """Recalcula os pesos BM25 (dependem do tamanho médio dos documentos) e o IDF."""
+        n_docs = len(self.documents)
+        avg_length = self._doc_lengths.mean() if n_docs else 1.0
+        tf = self._tf
+        row_lengths = np.repeat(self._doc_lengths, np.diff(tf.indptr))
+        norm = self.k1 * (1 - self.b + self.b * row_lengths / max(avg_length, 1e-9))
+        weights = tf.data * (self.k1 + 1) / (tf.data + norm)
+        self._weights = sparse.csr_matrix((weights.astype(np.float32), tf.indices, tf.indptr), shape=tf.shape).tocsc()
+        self._idf = np.log1p((n_docs - self._doc_freq + 0.5) / (self._doc_freq + 0.5)).astype(np.float32)
+
+    def search(self, query: str, k: int = 3) -> list:
+        """Retorna até k documentos como (pontuação, documento), do mais relevante ao menos."""
+        columns = sorted({self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary})
+        if not columns or not self.documents:
+            return []
+        scores = self._weights[:, columns] @ self._idf[columns]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.documents[i]) for i in top if scores[i] > 0]
+
+    def save(self, directory: str = INDEX_DIR):
+        """Grava o índice em disco (matriz de frequências + metadados)."""
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        sparse.save_npz(os.path.join(directory, "frequencias.npz"), self._tf)
+        np.save(os.path.join(directory, "tamanhos.npy"), self._doc_lengths)
+        with open(os.path.join(directory, "metadados.json"), "w", encoding="utf-8") as file:
+            json.dump(
+                {"k1": self.k1, "b": self.b, "vocabulario": self.vocabulary, "documentos": self.documents},
+                file,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, directory: str = INDEX_DIR) -> "BM25Index":
+        """Carrega um índice gravado com save()."""
+        with open(os.path.join(directory, "metadados.json"), encoding="utf-8") as file:
+            metadata = json.load(file)
+        index = cls(k1=metadata["k1"], b=metadata["b"])
+        index.vocabulary = metadata["vocabulario"]
+        index.documents = metadata["documentos"]
+        index._tf = sparse.load_npz(os.path.join(directory, "frequencias.npz")).tocsr()
+        index._doc_lengths = np.load(os.path.join(directory, "tamanhos.npy"))
+        index._doc_freq = np.bincount(index._tf.indices, minlength=len(index.vocabulary)).astype(np.int64)
+        index._update_weights()
+        return index
+
+
+def _snippet(*parts) -> str:
+    text = " ".join(part for part in parts if part)
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+
+
+def load_fonte_documents(path: str = FONTE_PATH) -> list:
+    """Converte os conteúdos da Nova Escola e as hipóteses de escrita de fonte.json em documentos."""
+    with open(path, encoding="utf-8") as file:
+        fonte = json.load(file)
+
+    documents = []
+    for conteudo in fonte.get("conteudos", []):
+        exemplos = conteudo.get("exemplos", [])
+        documents.append({
+            "titulo": conteudo.get("titulo", ""),
+            "url": conteudo.get("url", ""),
+            "trecho": _snippet(conteudo.get("resumo", ""), "Exemplos: " + " ".join(exemplos) if exemplos else ""),
+            "texto": " ".join([conteudo.get("titulo", ""), conteudo.get("resumo", "")] + conteudo.get("temas", []) + exemplos),
+        })
+    for hipotese in fonte.get("hipoteses_de_escrita", []):
+        dicas = hipotese.get("dicas", [])
+        documents.append({
+            "titulo": f"Hipótese {hipotese.get('nivel', '')}",
+            "url": "",
+            "trecho": _snippet(hipotese.get("descricao", ""), "Dicas: " + " ".join(dicas) if dicas else ""),
+            "texto": " ".join([hipotese.get("nivel", ""), hipotese.get("descricao", "")] + dicas),
+        })
+    return documents
+
+
+def load_lesson_plan_documents(path: str) -> list:
+    """
+    Lê a base de planos de aula em JSON Lines (um plano por linha).
+
+    Campos esperados: titulo e conteudo; componente e unidade_tematica são opcionais.
+    """
+    documents = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            plano = json.loads(line)
+            conteudo = plano.get("conteudo", "")
+            documents.append({
+                "titulo": plano.get("titulo", ""),
+                "url": plano.get("url", ""),
+                "trecho": _snippet(conteudo),
+                "texto": " ".join([
+                    plano.get("titulo", ""), plano.get("componente", ""), plano.get("unidade_tematica", ""), conteudo
+                ]),
+            })
+    return documents
+
+
+def build_index(fonte_path: str = FONTE_PATH, lesson_plan_paths=()) -> BM25Index:
+    """Constrói o índice sobre fonte.json e as bases de planos de aula informadas."""
+    index = BM25Index()
+    index.add_documents(load_fonte_documents(fonte_path))
+    for path in lesson_plan_paths:
+        index.add_documents(load_lesson_plan_documents(path))
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_retrieval_index() -> BM25Index:
+    """
+    Retorna o índice compartilhado: o construído offline, se existir, ou um índice em
+    memória apenas sobre fonte.json.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if os.path.exists(os.path.join(INDEX_DIR, "metadados.json")):
+                    _index = BM25Index.load(INDEX_DIR)
+                    logger.info(f"Índice de referências carregado ({len(_index)} documentos).")
+                else:
+                    _index = build_index()
+                    logger.info(f"Índice de referências construído a partir de {FONTE_PATH} ({len(_index)} documentos).")
+    return _index
+
+
+def retrieve_references(componente, unidade_tematica, objetivo_de_conhecimento, perfis_turma="", k=3) -> list:
+    """Retorna os k trechos mais relevantes para o plano de aula solicitado."""
+    query = " ".join([componente, unidade_tematica, objetivo_de_conhecimento, perfis_turma])
+    return [document for _, document in get_retrieval_index().search(query, k=k)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constrói o índice de referências para os planos de aula.")
+    parser.add_argument("bases", nargs="*", help="Arquivos JSON Lines com a base de planos de aula.")
+    parser.add_argument("--fonte", default=FONTE_PATH, help="Arquivo com os conteúdos curados (fonte.json).")
+    parser.add_argument("--saida", default=INDEX_DIR, help="Diretório onde gravar o índice.")
+    args = parser.parse_args()
+
+    index = build_index(args.fonte, args.bases)
+    index.save(args.saida)
+    print(f"✅ Índice com {len(index)} documentos e {len(index.vocabulary)} termos gravado em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import threading
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class StreamFlight:
+    """
+    Uma geração em andamento, compartilhada por todos que pediram a mesma chave.
+
+    As partes ficam num buffer; cada inscrito lê desde o início e espera pelas próximas,
+    então quem chega depois recebe a resposta inteira, não só o que falta.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.meta = {}  # Informações da geração definidas pelo produtor (ex.: plano genérico)
+        self.done = False
+        self.error = None
+        self._condition = threading.Condition()
+
+    def publish(self, part: str):
+        with self._condition:
+            self.parts.append(part)
+            self._condition.notify_all()
+
+    def finish(self, error: Exception = None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    def subscribe(self):
+        """Gera as partes da resposta, esperando as que ainda não chegaram."""
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self.parts) and not self.done:
+                    self._condition.wait()
+                new_parts = self.parts[index:]
+                finished = self.done and index + len(new_parts) >= len(self.parts)
+            index += len(new_parts)
+            yield from new_parts
+            if finished:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas idênticas em andamento: enquanto uma geração para a chave estiver em
+    curso, novas chamadas se inscrevem nela em vez de repetir a chamada à API.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    def join_stream(self, key, factory) -> StreamFlight:
+        """
+        Retorna a geração em andamento para a chave ou inicia uma nova.
+
+        factory(flight) deve retornar um iterador com as partes da resposta; ele é consumido
+        numa thread própria, então a geração continua mesmo se um inscrito desistir.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced_calls += 1
+                registry.counter("singleflight_coalesced_total", group=self.name).inc()
+                return flight
+            flight = StreamFlight()
+            self._flights[key] = flight
+            self.upstream_calls += 1
+        registry.counter("singleflight_upstream_total", group=self.name).inc()
+        threading.Thread(target=self._pump, args=(key, flight, factory), daemon=True,
+                         name=f"singleflight-{self.name}").start()
+        return flight
+
+    def _pump(self, key, flight: StreamFlight, factory):
+        error = None
+        try:
+            for part in factory(flight):
+                flight.publish(part)
+        except Exception as e:
+            logger.error(f"Erro na geração compartilhada ({self.name}): {e}")
+            error = e
+        finally:
+            # Sai do registro antes de encerrar: pedidos posteriores geram uma resposta nova
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.finish(error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._flights)
+        return {"upstream_calls": self.upstream_calls, "coalesced_calls": self.coalesced_calls,
+                "in_flight": in_flight}
+
+
+class AsyncStreamFlight:
+    """Versão asyncio de StreamFlight, para o gateway."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def publish(self, part: str):
+        self.parts.append(part)
+        self._changed.set()
+
+    def finish(self, error: Exception = None):
+        self.done = True
+        self.error = error
+        self._changed.set()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            while index < len(self.parts):
+                part = self.parts[index]
+                index += 1
+                yield part
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._changed.clear()
+            # Pode ter chegado algo entre o último teste e o clear()
+            if index >= len(self.parts) and not self.done:
+                await self._changed.wait()
+
+
+class AsyncSingleFlight:
+    """Versão asyncio de SingleFlight: a geração roda numa task própria do event loop."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights = {}
+        self._tasks = set()
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+
+    def join_stream(self, key, factory) -> AsyncStreamFlight:
+        """factory() deve retornar um iterador assíncrono com as partes da resposta."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced_calls += 1
+            registry.counter("singleflight_coalesced_total", group=self.name).inc()
+            return flight
+        flight = AsyncStreamFlight()
+        self._flights[key] = flight
+        self.upstream_calls += 1
+        registry.counter("singleflight_upstream_total", group=self.name).inc()
+        task = asyncio.get_running_loop().create_task(self._pump(key, flight, factory))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return flight
+
+    async def _pump(self, key, flight: AsyncStreamFlight, factory):
+        error = None
+        try:
+            async for part in factory():
+                flight.publish(part)
+        except Exception as e:
+            logger.error(f"Erro na geração compartilhada ({self.name}): {e}")
+            error = e
+        finally:
+            self._flights.pop(key, None)
+            flight.finish(error)
+
+    def stats(self) -> dict:
+        return {"upstream_calls": self.upstream_calls, "coalesced_calls": self.coalesced_calls,
+                "in_flight": len(self._flights)}
@@ -0,0 +1,157 @@
+import bisect
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Versões dos dados com índice de busca mantido em memória
+MAX_CACHED_VERSIONS = 4
+# Fração mínima dos trigramas da consulta presentes no nome, na busca aproximada
+FUZZY_THRESHOLD = 0.5
+MAX_FUZZY_RESULTS = 20
+# Nomes avaliados na busca aproximada, escolhidos pelos trigramas mais raros da consulta
+MAX_FUZZY_CANDIDATES = 100
+# Trigramas presentes em mais que esta fração dos nomes não servem para gerar candidatos
+COMMON_TRIGRAM_SHARE = 0.05
+# Com poucos candidatos, é mais barato conferir o texto do que intersectar listas longas
+VERIFY_BELOW = 256
+
+
+def trigrams(text: str) -> set:
+    """Trigramas do texto, com espaços nas bordas para valorizar inícios e fins de palavra."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StudentSearchIndex:
+    """
+    Índice de busca de nomes de alunos, sem diferenciar maiúsculas nem acentos.
+
+    - Prefixo: lista ordenada de (sufixo do nome a partir de cada palavra), consultada com bisect.
+    - Substring: índice invertido de trigramas; a interseção das listas dá os candidatos.
+      Consultas com menos de três letras conferem os nomes normalizados um a um.
+    - Aproximada: candidatos vindos dos trigramas raros da consulta, ordenados pela fração
+      de trigramas em comum.
+    """
+
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(name for name in names if isinstance(name, str)))
+        self.normalized = [" ".join(normalize_text(name).split()) for name in self.names]
+
+        # Um item por palavra: "maria joao silva", "joao silva", "silva"
+        entries = []
+        for name_id, normalized in enumerate(self.normalized):
+            words = normalized.split(" ")
+            for position in range(len(words)):
+                entries.append((" ".join(words[position:]), name_id))
+        entries.sort()
+        self._prefix_keys = [key for key, _ in entries]
+        self._prefix_ids = [name_id for _, name_id in entries]
+
+        postings = {}
+        for name_id, normalized in enumerate(self.normalized):
+            for trigram in trigrams(normalized):
+                postings.setdefault(trigram, []).append(name_id)
+        self._postings = {trigram: np.asarray(ids, dtype=np.int32) for trigram, ids in postings.items()}
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> "StudentSearchIndex":
+        names = data["student_name"]
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            # Só as categorias em uso (a coluna pode ter sido filtrada)
+            names = names.cat.remove_unused_categories().cat.categories
+        else:
+            names = names.dropna().unique()
+        return cls(names)
+
+    def prefix(self, query: str) -> list:
+        """Nomes com alguma palavra iniciada pela consulta (ex.: "jo" encontra "MARIA JOÃO")."""
+        query = " ".join(normalize_text(query).split())
+        start = bisect.bisect_left(self._prefix_keys, query)
+        end = bisect.bisect_left(self._prefix_keys, query + "￿")
+        return self._names(dict.fromkeys(self._prefix_ids[start:end]))
+
+    def substring(self, query: str) -> list:
+        """Nomes que contêm a consulta em qualquer posição."""
+        query = " ".join(normalize_text(query).split())
+        if not query:
+            return []
+        # Trigramas internos da consulta (sem as bordas, que exigiriam início/fim de palavra)
+        query_trigrams = {query[i:i + 3] for i in range(len(query) - 2)}
+        if not query_trigrams:
+            # Uma ou duas letras não formam trigrama: confere todos os nomes (ex.: "ao" em "JOÃO")
+            return self._names(name_id for name_id, normalized in enumerate(self.normalized) if query in normalized)
+        postings = sorted((self._postings.get(trigram) for trigram in query_trigrams),
+                          key=lambda ids: -1 if ids is None else len(ids))
+        if postings[0] is None:
+            return []
+        candidates = postings[0]
+        for ids in postings[1:]:
+            if len(candidates) <= VERIFY_BELOW:
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        return self._names(name_id for name_id in candidates if query in self.normalized[name_id])
+
+    def fuzzy(self, query: str, threshold: float = FUZZY_THRESHOLD, limit: int = MAX_FUZZY_RESULTS) -> list:
+        """Nomes parecidos com a consulta (erros de digitação), do mais ao menos parecido."""
+        query_trigrams = trigrams(" ".join(normalize_text(query).split()))
+        postings = sorted((self._postings[trigram] for trigram in query_trigrams if trigram in self._postings), key=len)
+        if not postings:
+            return []
+        common = max(COMMON_TRIGRAM_SHARE * len(self.names), 1)
+        rare = [ids for ids in postings if len(ids) <= common] or postings[:1]
+        candidates, counts = np.unique(np.concatenate(rare), return_counts=True)
+        if len(candidates) > MAX_FUZZY_CANDIDATES:
+            candidates = candidates[np.argsort(-counts, kind="stable")[:MAX_FUZZY_CANDIDATES]]
+
+        scored = []
+        for name_id in candidates:
+            name_trigrams = trigrams(self.normalized[name_id])
+            shared = len(query_trigrams & name_trigrams)
+            coverage = shared / len(query_trigrams)
+            if coverage >= threshold:
+                # Desempate: nomes sem muitos trigramas além dos da consulta
+                scored.append((-coverage, -shared / len(query_trigrams | name_trigrams), name_id))
+        scored.sort()
+        return self._names(name_id for _, _, name_id in scored[:limit])
+
+    def search(self, query: str, limit: int = None) -> list:
+        """Correspondências por substring; se não houver nenhuma, as aproximadas."""
+        matches = self.substring(query) or self.fuzzy(query)
+        return matches[:limit] if limit else matches
+
+    def _names(self, name_ids) -> list:
+        return [self.names[name_id] for name_id in name_ids]
+
+
+# versão -> {turma: índice}
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(data: pd.DataFrame, version: str, turma: str = None) -> StudentSearchIndex:
+    """
+    Retorna o índice de busca da turma (ou de todos os alunos, sem turma) na versão informada
+    dos dados, construindo-o uma única vez e compartilhando-o entre as sessões do Streamlit.
+
+    O índice por turma faz a busca aproximada e o limite de resultados valerem só para os
+    alunos da turma, sem correspondências de outras turmas.
+    """
+    index = _indexes.get(version, {}).get(turma)
+    if index is not None:
+        return index
+    with _indexes_lock:
+        indexes = _indexes.setdefault(version, {})
+        index = indexes.get(turma)
+        if index is None:
+            rows = data if turma is None else data[data["class_name"] == turma]
+            index = StudentSearchIndex.from_frame(rows)
+            indexes[turma] = index
+            while len(_indexes) > MAX_CACHED_VERSIONS:
+                _indexes.pop(next(iter(_indexes)))
+            logger.info(f"Índice de busca de alunos construído para a versão {version}, turma {turma} "
+                         f"({len(index.names)} nomes).")
+    return index
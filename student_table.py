@@ -0,0 +1,62 @@
+import math
+import numpy as np
+import pandas as pd
+import streamlit as st
+from hypotheses import DEFAULT_COLOR, HYPOTHESIS_COLORS
+
+# Alunos exibidos por página da tabela
+PAGE_SIZE = 50
+
+
+def hypothesis_colors(hypotheses: pd.Series) -> np.ndarray:
+    """
+    Retorna a cor de fundo de cada linha a partir da hipótese, sem uma chamada Python por célula.
+
+    A consulta é feita uma vez por categoria; as linhas recebem a cor pelo código categórico.
+    """
+    categorical = hypotheses.astype("category")
+    palette = np.array(
+        [HYPOTHESIS_COLORS.get(category, DEFAULT_COLOR) for category in categorical.cat.categories] + [DEFAULT_COLOR],
+        dtype=object,
+    )
+    # Código -1 (valor ausente) aponta para a última posição da paleta: a cor padrão
+    return palette[categorical.cat.codes.to_numpy()]
+
+
+def page_count(total_rows: int, page_size: int = PAGE_SIZE) -> int:
+    return max(math.ceil(total_rows / page_size), 1)
+
+
+def get_page(data: pd.DataFrame, page: int, page_size: int = PAGE_SIZE) -> pd.DataFrame:
+    """Retorna as linhas da página (a partir de 1), limitada ao intervalo válido."""
+    page = min(max(page, 1), page_count(len(data), page_size))
+    start = (page - 1) * page_size
+    return data.iloc[start:start + page_size]
+
+
+def style_page(page_data: pd.DataFrame):
+    """Aplica as cores das hipóteses à coluna hypothesis_name de uma página da tabela."""
+    return page_data.style.apply(
+        lambda column: "background-color: " + pd.Series(hypothesis_colors(column), index=column.index),
+        subset=['hypothesis_name'],
+    )
+
+
+def render_student_table(data: pd.DataFrame, key: str, page_size: int = PAGE_SIZE):
+    """
+    Exibe a tabela de alunos paginada no servidor.
+
+    Só a página atual é estilizada e enviada ao navegador, então o custo não cresce com o
+    número de alunos.
+    """
+    total = len(data)
+    pages = page_count(total, page_size)
+    page = 1
+    if pages > 1:
+        page = int(st.number_input("Página", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_pagina"))
+
+    page_data = get_page(data, page, page_size)
+    if total:
+        start = (page - 1) * page_size
+        st.caption(f"Mostrando alunos {start + 1}–{start + len(page_data)} de {total} (página {page} de {pages})")
+    st.dataframe(style_page(page_data), width=1500)
@@ -0,0 +1,31 @@
+import math
+import re
+import unicodedata
+
+# Aproximação usada para estimar tokens sem depender do tokenizador do modelo
+CHARS_PER_TOKEN = 4
+
+# Palavras muito frequentes em português que não ajudam a diferenciar documentos
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos", "e", "em",
+    "na", "nas", "no", "nos", "o", "os", "ou", "para", "pela", "pelas", "pelo", "pelos",
+    "por", "que", "se", "sem", "um", "uma", "umas", "uns",
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estima a quantidade de tokens de um texto."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def normalize_text(text: str) -> str:
+    """Converte o texto para minúsculas e remove acentos (JOÃO -> joao)."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> list:
+    """Divide o texto normalizado em termos, descartando stopwords."""
+    return [token for token in _TOKEN_PATTERN.findall(normalize_text(text)) if token not in STOPWORDS]
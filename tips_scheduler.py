@@ -0,0 +1,256 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+import pandas as pd
+from api_requests import call_api
+from change_detection import ChangeDetector, row_hashes
+from data_loader import CSV_PATH, data_version, load_versioned_class_data
+from hypothesis_cube import HypothesisCube, get_cube
+from prompt_dicas import PROMPT_VERSION, generate_prompt_for_analysis
+
+logger = logging.getLogger(__name__)
+
+# Banco das dicas já geradas (uma por turma e versão dos dados da turma)
+STORE_PATH = os.path.join(".cache", "dicas.sqlite3")
+TIPS_MODEL = "llama3-8b-8192"
+# Segundos entre duas verificações da versão de dados.csv
+POLL_SECONDS = 60.0
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dicas (
+    impressao TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    turma TEXT NOT NULL,
+    conteudo TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    PRIMARY KEY (impressao, modelo)
+);
+CREATE INDEX IF NOT EXISTS idx_dicas_turma ON dicas (turma);
+"""
+
+
+def class_fingerprint(rows: pd.DataFrame) -> str:
+    """
+    Impressão digital das dicas de uma turma: muda sempre que um aluno, mês ou hipótese muda
+    e quando o prompt de dicas muda (PROMPT_VERSION).
+
+    Soma os hashes das linhas (módulo 2**64), então não depende da ordem das linhas nem de a
+    turma vir de um recorte ou do arquivo inteiro.
+    """
+    return f"{int(row_hashes(rows).sum()):016x}-{len(rows):x}-{PROMPT_VERSION}"
+
+
+def class_fingerprints(data: pd.DataFrame) -> dict:
+    """Retorna {turma: impressão digital} para todas as turmas, numa única passada."""
+    grouped = row_hashes(data).groupby(data["class_name"], observed=True)
+    sums, sizes = grouped.sum(), grouped.size()
+    return {class_name: f"{int(sums[class_name]):016x}-{int(sizes[class_name]):x}-{PROMPT_VERSION}"
+            for class_name in sums.index}
+
+
+class TipsStore:
+    """Dicas geradas pela IA em SQLite (modo WAL), por impressão digital da turma e modelo."""
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        store_dir = os.path.dirname(path)
+        if store_dir and not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            connection.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, fingerprint: str, model: str = TIPS_MODEL) -> Optional[str]:
+        """Retorna as dicas guardadas para a impressão digital, ou None."""
+        row = self._connection().execute(
+            "SELECT conteudo FROM dicas WHERE impressao = ? AND modelo = ?", (fingerprint, model)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, fingerprint: str, turma: str, conteudo: str, model: str = TIPS_MODEL):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO dicas (impressao, modelo, turma, conteudo, criado_em) VALUES (?, ?, ?, ?, ?)",
+            (fingerprint, model, turma, conteudo, time.time()),
+        )
+
+    def prune(self, turma: str, keep: str, model: str = TIPS_MODEL) -> int:
+        """Remove as dicas de versões anteriores dos dados da turma e retorna quantas removeu."""
+        cursor = self._connection().execute(
+            "DELETE FROM dicas WHERE turma = ? AND modelo = ? AND impressao != ?", (turma, model, keep)
+        )
+        return cursor.rowcount
+
+    def count(self) -> int:
+        (total,) = self._connection().execute("SELECT COUNT(*) FROM dicas").fetchone()
+        return total
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_tips_store() -> TipsStore:
+    """Retorna o banco de dicas compartilhado por todas as sessões do processo."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TipsStore()
+    return _store
+
+
+def generate_tips(rows: pd.DataFrame, cube: HypothesisCube = None, fingerprint: str = None,
+                  store: TipsStore = None) -> str:
+    """
+    Gera as dicas da turma com a IA e as guarda no banco.
+
+    Retorna o texto da resposta (sem formatação). Só respostas completas são guardadas: se a
+    API falhar ou a resposta for interrompida, levanta IncompleteResponseError e a próxima
+    página ou verificação tenta de novo.
+    """
+    store = store or get_tips_store()
+    fingerprint = fingerprint or class_fingerprint(rows)
+    prompt = generate_prompt_for_analysis(rows, cube=cube)
+    tips = call_api(prompt, model=TIPS_MODEL, strict=True)
+    turma = str(rows["class_name"].iloc[0]) if len(rows) else ""
+    store.put(fingerprint, turma, tips)
+    store.prune(turma, fingerprint)
+    return tips
+
+
+def precompute_tips(data: pd.DataFrame, cube: HypothesisCube = None, store: TipsStore = None,
+                    classes: set = None) -> dict:
+    """
+    Gera as dicas de cada turma cuja impressão digital ainda não está no banco.
+
+    Com `classes`, considera apenas essas turmas (ex.: as que tiveram partições alteradas).
+    Retorna quantas turmas foram geradas, puladas (já atualizadas) e quantas falharam.
+    """
+    store = store or get_tips_store()
+    cube = cube or HypothesisCube.from_frame(data)
+    report = {"generated": 0, "skipped": 0, "failed": 0}
+    subset = data if classes is None else data[data["class_name"].isin(classes)]
+    for class_name, fingerprint in class_fingerprints(subset).items():
+        if store.get(fingerprint) is not None:
+            report["skipped"] += 1
+            continue
+        try:
+            rows = subset[subset["class_name"] == class_name]
+            generate_tips(rows, cube, fingerprint, store)
+        except Exception as e:
+            logger.error(f"Erro ao gerar as dicas da turma {class_name}: {e}")
+            report["failed"] += 1
+            continue
+        report["generated"] += 1
+    return report
+
+
+class TipsScheduler:
+    """
+    Thread que acompanha a versão de dados.csv e gera as dicas das turmas quando ela muda.
+
+    Só as turmas com partições (turma, mês) novas, alteradas ou removidas desde a última
+    execução são reprocessadas. As páginas apenas leem o banco de dicas; a geração sob
+    demanda fica para as turmas que a thread ainda não alcançou.
+    """
+
+    def __init__(self, path: str = CSV_PATH, poll_seconds: float = POLL_SECONDS, store: TipsStore = None):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.store = store or get_tips_store()
+        # Um manifesto por versão do prompt: com um prompt novo, todas as turmas são refeitas
+        self.detector = ChangeDetector(f"dicas_{PROMPT_VERSION}")
+        self.version = None
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> Optional[dict]:
+        """Gera as dicas se a versão dos dados mudou desde a última verificação."""
+        if data_version(self.path) == self.version:
+            return None
+        # A versão registrada é a do DataFrame lido (o arquivo pode ter mudado desde a verificação)
+        version, data = load_versioned_class_data(self.path)
+        start = time.perf_counter()
+        changes = self.detector.detect(data)
+        classes = changes.dirty_classes()
+        report = precompute_tips(data, get_cube(data, version), self.store, classes)
+        # Turmas que saíram dos dados não precisam mais das suas dicas
+        for class_name in classes - {class_name for class_name, _ in changes.current}:
+            self.store.prune(str(class_name), keep="")
+        logger.info(
+            f"Dicas pré-calculadas para a versão {version}: {report['generated']} geradas, "
+            f"{report['skipped']} já atualizadas, {report['failed']} falhas "
+            f"({time.perf_counter() - start:.1f} s)."
+        )
+        # Com falhas, nem a versão nem o manifesto são atualizados: a próxima verificação
+        # tenta essas turmas de novo
+        if not report["failed"]:
+            self.detector.commit(changes)
+            self.version = version
+        report["partitions"] = changes.summary()
+        self.last_report = report
+        return report
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erro no pré-cálculo das dicas: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self) -> "TipsScheduler":
+        self._thread = threading.Thread(target=self._run, daemon=True, name="tips-scheduler")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_tips_scheduler(path: str = CSV_PATH) -> TipsScheduler:
+    """Inicia a thread de pré-cálculo das dicas uma única vez por processo."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = TipsScheduler(path).start()
+    return _scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-calcula as dicas da IA de todas as turmas.")
+    parser.add_argument("--dados", default=CSV_PATH, help="CSV de sondagens.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, force=True)
+
+    report = TipsScheduler(args.dados).run_once()
+    partitions = report["partitions"]
+    print(f"🔍 Partições (turma × mês): {partitions['recomputed']} alteradas, {partitions['skipped']} inalteradas.")
+    print(f"✅ Dicas: {report['generated']} geradas, {report['skipped']} já atualizadas, {report['failed']} falhas.")
+
+
+if __name__ == "__main__":
+    main()